@@ -0,0 +1,66 @@
+from typing import Optional
+from fastapi import Depends, Request
+from app.services.gemini_service import GeminiService
+from app.services.health_monitor import HealthMonitor
+from app.services.chat_service import ChatService
+from app.services.context_builder import ConversationContextBuilder
+from app.services.image_preprocessor import ImagePreprocessor
+from app.services.image_service import ImageService
+from app.services.single_flight import SingleFlight
+from app.services.text_service import TextService
+from app.storage.base import AsyncConversationStore
+from app.storage.response_cache import ResponseCache
+from app.core.tracing import TraceBuffer
+
+def get_gemini_service(request: Request) -> GeminiService:
+    """Shared Gemini client created in the application lifespan"""
+    return request.app.state.gemini_service
+
+def get_health_monitor(request: Request) -> HealthMonitor:
+    """Background dependency checker started in the application lifespan"""
+    return request.app.state.health_monitor
+
+def get_conversation_store(request: Request) -> AsyncConversationStore:
+    """Process-wide conversation store created in the application lifespan"""
+    return request.app.state.conversation_store
+
+def get_response_cache(request: Request) -> Optional[ResponseCache]:
+    """Shared analysis cache, None when RESPONSE_CACHE_ENABLED is off"""
+    return request.app.state.response_cache
+
+def get_image_preprocessor(request: Request) -> Optional[ImagePreprocessor]:
+    """Shared preprocessing pool, None when IMAGE_PREPROCESS_ENABLED is off"""
+    return request.app.state.image_preprocessor
+
+def get_single_flight(request: Request) -> SingleFlight:
+    """Process-wide coalescing of identical in-flight analyses"""
+    return request.app.state.single_flight
+
+def get_trace_buffer(request: Request) -> Optional[TraceBuffer]:
+    """Recent and slowest request traces, None when TRACING_ENABLED is off"""
+    return request.app.state.trace_buffer
+
+def get_context_builder(request: Request) -> ConversationContextBuilder:
+    return request.app.state.context_builder
+
+def get_chat_service(
+    gemini_service: GeminiService = Depends(get_gemini_service),
+    conversation_store: AsyncConversationStore = Depends(get_conversation_store),
+    context_builder: ConversationContextBuilder = Depends(get_context_builder)
+) -> ChatService:
+    return ChatService(gemini_service, conversation_store, context_builder)
+
+def get_image_service(
+    gemini_service: GeminiService = Depends(get_gemini_service),
+    response_cache: Optional[ResponseCache] = Depends(get_response_cache),
+    image_preprocessor: Optional[ImagePreprocessor] = Depends(get_image_preprocessor),
+    single_flight: SingleFlight = Depends(get_single_flight)
+) -> ImageService:
+    return ImageService(gemini_service, response_cache, image_preprocessor, single_flight)
+
+def get_text_service(
+    gemini_service: GeminiService = Depends(get_gemini_service),
+    response_cache: Optional[ResponseCache] = Depends(get_response_cache),
+    single_flight: SingleFlight = Depends(get_single_flight)
+) -> TextService:
+    return TextService(gemini_service, response_cache, single_flight)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import health, images, text, chat
+from app.api.v1.endpoints import health, images, text, chat, debug
 
 api_router = APIRouter()
 
@@ -8,3 +8,4 @@ api_router.include_router(health.router, tags=["health"])
 api_router.include_router(images.router, prefix="/images", tags=["images"])
 api_router.include_router(text.router, prefix="/text", tags=["text"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
+api_router.include_router(debug.router, prefix="/debug", tags=["debug"])
@@ -1,16 +1,23 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from app.api.deps import get_chat_service
 from app.services.chat_service import ChatService
 from app.models.requests import ChatRequest
 from app.models.responses import ChatResponse
 from app.models.chat import Conversation, ConversationSummary
 from app.core.logging import get_logger
+from app.core.tracing import TracedRoute
+from app.core.metrics import metrics
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 logger = get_logger(__name__)
 
 @router.post("/message", response_model=ChatResponse)
-async def chat_message(request: ChatRequest):
+async def chat_message(
+    request: ChatRequest,
+    chat_service: ChatService = Depends(get_chat_service)
+):
     """
     Send a message to the AI chat system
     
@@ -22,30 +29,69 @@ async def chat_message(request: ChatRequest):
     """
     try:
         logger.info(f"Processing chat message for conversation: {request.conversation_id}")
-        chat_service = ChatService()
         return await chat_service.process_chat_message(request)
         
+    except HTTPException:
+        # Keep upstream status codes (503 circuit open, 504 timeout, 400 validation)
+        raise
     except Exception as e:
         logger.error(f"Chat processing failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/message/stream")
+async def chat_message_stream(
+    request: ChatRequest,
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """
+    Send a message to the AI chat system and stream the reply
+    
+    Same body as `/message`. Returns `text/event-stream` with:
+    - **chunk** events carrying `{"text": ...}` as tokens arrive
+    - a final **done** event carrying the full `ChatResponse`
+    - an **error** event if generation fails mid-stream
+    """
+    logger.info(f"Streaming chat message for conversation: {request.conversation_id}")
+    return StreamingResponse(
+        chat_service.stream_chat_message(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/conversations", response_model=List[ConversationSummary])
-async def list_conversations():
+async def list_conversations(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    chat_service: ChatService = Depends(get_chat_service)
+):
     """
-    Get list of all conversations with summaries
+    Get a page of conversations with summaries
+    
+    - **limit**: Page size (1-200, default 50)
+    - **cursor**: Value of a previous response's `X-Next-Cursor` header
     
-    Returns list of conversation summaries ordered by most recent activity
+    Returns conversation summaries ordered by most recent activity. When more
+    conversations remain, the `X-Next-Cursor` response header holds the cursor
+    for the next page.
     """
     try:
-        chat_service = ChatService()
-        return chat_service.conversation_store.list_conversations()
+        summaries, next_cursor = await chat_service.conversation_store.list_conversations_page(limit, cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return summaries
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to list conversations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/conversations/{conversation_id}", response_model=Conversation)
-async def get_conversation(conversation_id: str):
+async def get_conversation(
+    conversation_id: str,
+    chat_service: ChatService = Depends(get_chat_service)
+):
     """
     Get full conversation history by ID
     
@@ -54,8 +100,7 @@ async def get_conversation(conversation_id: str):
     Returns complete conversation with all messages
     """
     try:
-        chat_service = ChatService()
-        conversation = chat_service.get_conversation_history(conversation_id)
+        conversation = await chat_service.get_conversation_history(conversation_id)
         
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
@@ -69,7 +114,10 @@ async def get_conversation(conversation_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/conversations/{conversation_id}")
-async def delete_conversation(conversation_id: str):
+async def delete_conversation(
+    conversation_id: str,
+    chat_service: ChatService = Depends(get_chat_service)
+):
     """
     Delete a conversation and all its messages
     
@@ -78,8 +126,7 @@ async def delete_conversation(conversation_id: str):
     Returns success confirmation
     """
     try:
-        chat_service = ChatService()
-        deleted = chat_service.conversation_store.delete_conversation(conversation_id)
+        deleted = await chat_service.conversation_store.delete_conversation(conversation_id)
         
         if not deleted:
             raise HTTPException(status_code=404, detail="Conversation not found")
@@ -93,15 +140,22 @@ async def delete_conversation(conversation_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/stats")
-async def get_chat_stats():
+async def get_chat_stats(chat_service: ChatService = Depends(get_chat_service)):
     """
     Get chat system statistics
     
-    Returns statistics about conversations and messages
+    Returns statistics about conversations and messages, activity windows
+    and per-endpoint latency
     """
     try:
-        chat_service = ChatService()
-        return chat_service.conversation_store.get_stats()
+        stats = await chat_service.conversation_store.get_stats()
+        stats["stream_ttfb_seconds"] = metrics.histogram("chat_stream_ttfb_seconds").snapshot()
+        stats["hedging"] = chat_service.gemini_service.hedge_stats()
+        stats["latency"] = {
+            f"{h.labels['method']} {h.labels['route']}": h.snapshot()
+            for h in metrics.histograms("http_request_duration_seconds")
+        }
+        return stats
         
     except Exception as e:
         logger.error(f"Failed to get chat stats: {e}")
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from typing import Optional
+import secrets
+from app.api.deps import get_trace_buffer
+from app.core.config import settings
+from app.core.tracing import TraceBuffer
+
+def require_debug_token(authorization: str = Header("")) -> None:
+    """Traces show timings and errors of every request, so they are for operators only"""
+    if not settings.DEBUG_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), settings.DEBUG_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid debug token", headers={"WWW-Authenticate": "Bearer"})
+
+router = APIRouter(dependencies=[Depends(require_debug_token)])
+
+def require_trace_buffer(trace_buffer: Optional[TraceBuffer] = Depends(get_trace_buffer)) -> TraceBuffer:
+    if trace_buffer is None:
+        raise HTTPException(status_code=404, detail="Tracing is disabled")
+    return trace_buffer
+
+@router.get("/traces")
+async def list_traces(
+    limit: int = Query(50, ge=1, le=1000),
+    min_duration_ms: float = Query(0, ge=0, description="Only traces at least this slow"),
+    trace_buffer: TraceBuffer = Depends(require_trace_buffer)
+):
+    """
+    Most recent request traces, newest first
+    
+    Each entry carries the request ID (also returned in the `X-Request-ID`
+    response header), route, duration and span count. Fetch one by ID for its spans.
+    """
+    traces = [
+        trace.summary() for trace in trace_buffer.recent(settings.TRACE_BUFFER_SIZE)
+        if trace.duration * 1000 >= min_duration_ms
+    ]
+    return {**trace_buffer.stats(), "traces": traces[:limit]}
+
+@router.get("/traces/slowest")
+async def slowest_traces(trace_buffer: TraceBuffer = Depends(require_trace_buffer)):
+    """The slowest traces seen since startup (TRACE_SLOWEST_KEPT of them), slowest first"""
+    return {"traces": [trace.summary() for trace in trace_buffer.slowest()]}
+
+@router.get("/traces/{trace_id}")
+async def get_trace(
+    trace_id: str,
+    format: str = Query("json", pattern="^(json|zipkin)$", description="json, or Zipkin v2 spans"),
+    trace_buffer: TraceBuffer = Depends(require_trace_buffer)
+):
+    """One trace by trace ID or request ID, with every span's offset and duration"""
+    trace = trace_buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    if format == "zipkin":
+        return trace.to_zipkin(settings.TRACE_SERVICE_NAME)
+    return trace.to_dict()
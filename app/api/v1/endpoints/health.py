@@ -1,26 +1,55 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from typing import Optional
+from app.api.deps import get_health_monitor, get_response_cache, get_single_flight
 from app.models.responses import HealthResponse
-from app.services.gemini_service import GeminiService
+from app.services.health_monitor import HealthMonitor
+from app.services.single_flight import SingleFlight
+from app.storage.response_cache import ResponseCache
 from app.core.config import settings
 from app.utils.time_utils import get_current_timestamp
 
 router = APIRouter()
 
 @router.get("/health", response_model=HealthResponse)
-async def health_check():
-    """Health check endpoint"""
-    gemini_service = GeminiService()
-    
-    # Test Gemini connection
-    gemini_status = "connected" if await gemini_service.test_connection() else "disconnected"
+async def health_check(health_monitor: HealthMonitor = Depends(get_health_monitor)):
+    """Health check endpoint (served from the background checker's cached status)"""
+    snapshot = health_monitor.snapshot()
     
     return HealthResponse(
-        status="healthy" if gemini_status == "connected" else "unhealthy",
-        gemini_api=gemini_status,
+        status="healthy" if snapshot["ready"] else "unhealthy",
+        gemini_api=snapshot["gemini_api"],
         timestamp=get_current_timestamp(),
         version=settings.VERSION
     )
 
+@router.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness(health_monitor: HealthMonitor = Depends(get_health_monitor)):
+    """
+    Readiness probe
+    
+    Returns 200 when the last background check found Gemini and the conversation
+    store healthy and is no older than HEALTH_MAX_STALENESS_SECONDS, 503 otherwise.
+    Also reports event-loop lag and upstream executor queue depth.
+    """
+    snapshot = health_monitor.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+@router.get("/cache/stats")
+async def cache_stats(
+    response_cache: Optional[ResponseCache] = Depends(get_response_cache),
+    single_flight: SingleFlight = Depends(get_single_flight)
+):
+    """Analysis response cache hit/miss counters and request coalescing"""
+    if response_cache is None:
+        return {"enabled": False, "single_flight": single_flight.stats()}
+    return {"enabled": True, **response_cache.stats(), "single_flight": single_flight.stats()}
+
 @router.get("/")
 async def root():
     """API root endpoint"""
@@ -35,4 +64,4 @@ async def root():
             "chat": "/api/v1/chat/message",
             "conversations": "/api/v1/chat/conversations"
         }
-    }
+    }
\ No newline at end of file
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, File, Query, UploadFile, HTTPException
+from typing import List
+from app.api.deps import get_image_service
 from app.services.image_service import ImageService
 from app.models.responses import ImageAnalysisResponse
+from app.core.config import settings
 from app.core.logging import get_logger
+from app.core.tracing import TracedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 logger = get_logger(__name__)
 
 @router.post("/analyze", response_model=ImageAnalysisResponse)
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(
+    file: UploadFile = File(...),
+    image_service: ImageService = Depends(get_image_service)
+):
     """
     Analyze uploaded image using Google Gemini Vision
     
@@ -22,9 +29,41 @@ async def analyze_image(file: UploadFile = File(...)):
     """
     try:
         logger.info(f"Analyzing image: {file.filename}")
-        image_service = ImageService()
         return await image_service.analyze_uploaded_image(file)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Image analysis failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/analyze/batch", response_model=List[ImageAnalysisResponse])
+async def analyze_images_batch(
+    files: List[UploadFile] = File(...),
+    pack_small: bool = Query(False, description="Allow small images to share a single vision prompt"),
+    image_service: ImageService = Depends(get_image_service)
+):
+    """
+    Analyze several uploaded images in one request
+    
+    - **files**: Image files (JPEG, PNG, WebP, max 10MB each)
+    - **pack_small**: Send small images together in one multi-image prompt
+    
+    All files are validated before any analysis starts. Returns one analysis per file, in upload order.
+    
+    At most `IMAGE_BATCH_MAX_FILES` files, lowered with rate limiting on to what the smallest
+    rate limit bucket can pay for, since every uncached image or pack is paid for up front.
+    A pack that the model answers incompletely is retried one image at a time, and those
+    extra calls are charged as they are made.
+    """
+    try:
+        logger.info(f"Analyzing batch of {len(files)} images")
+        return await image_service.analyze_uploaded_images(
+            files, settings.BATCH_MAX_CONCURRENCY, pack_small=pack_small
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch image analysis failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,19 +1,29 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.api.deps import get_text_service
 from app.services.text_service import TextService
-from app.models.requests import TextAnalysisRequest
-from app.models.responses import TextAnalysisResponse
+from app.models.requests import TextAnalysisRequest, LongTextAnalysisRequest, BatchTextAnalysisRequest
+from app.models.responses import TextAnalysisResponse, LongTextAnalysisResponse, BatchTextAnalysisResponse
+from app.core.config import settings
 from app.core.logging import get_logger
+from app.core.tracing import TracedRoute
+import time
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 logger = get_logger(__name__)
 
 @router.post("/analyze", response_model=TextAnalysisResponse)
-async def analyze_text(request: TextAnalysisRequest):
+async def analyze_text(
+    request: TextAnalysisRequest,
+    text_service: TextService = Depends(get_text_service)
+):
     """
     Analyze text using Google Gemini
     
     - **text**: Text content to analyze (max 10,000 characters)
     - **analysis_type**: Type of analysis (sentiment, summary, comprehensive)
+    - **analysis_types**: Optional list of several types, answered in one upstream call;
+      `analysis` is then keyed by type
     
     Returns detailed analysis based on the selected type:
     - **Sentiment**: Emotion analysis, tone, subjectivity
@@ -21,10 +31,86 @@ async def analyze_text(request: TextAnalysisRequest):
     - **Comprehensive**: Full analysis including all aspects
     """
     try:
-        logger.info(f"Analyzing text: {request.analysis_type} analysis")
-        text_service = TextService()
+        logger.info(f"Analyzing text: {'+'.join(t.value for t in request.requested_types())} analysis")
         return await text_service.analyze_text(request)
         
+    except HTTPException:
+        # Keep upstream status codes (503 circuit open, 504 timeout, 400 validation)
+        raise
     except Exception as e:
         logger.error(f"Text analysis failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/analyze/long", response_model=LongTextAnalysisResponse)
+async def analyze_long_text(
+    request: LongTextAnalysisRequest,
+    text_service: TextService = Depends(get_text_service)
+):
+    """
+    Analyze a long document (contracts, transcripts) by map-reduce
+    
+    - **text**: Document to analyze (up to `LONG_TEXT_MAX_CHARS` characters)
+    
+    The document is split on sentence boundaries into chunks that are analyzed
+    concurrently and cached individually, then reduced into one summary, key
+    points, themes, overall sentiment and entities. Re-submitting an edited
+    document only re-analyzes the chunks around the edit.
+    
+    Every uncached chunk is an upstream call paid for up front, so with rate
+    limiting on `LONG_TEXT_MAX_CHARS` is lowered to what the smallest rate limit
+    bucket can pay for. A document that still splits into more chunks than that
+    (very long sentences) is rejected with 413; one the buckets cannot pay for
+    yet gets 429 with Retry-After.
+    """
+    try:
+        logger.info(f"Analyzing long text of {len(request.text)} characters")
+        return await text_service.analyze_long_text(request)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Long text analysis failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/analyze/batch", response_model=BatchTextAnalysisResponse)
+async def analyze_text_batch(
+    request: BatchTextAnalysisRequest,
+    stream: bool = Query(False, description="Stream results as NDJSON as each item completes"),
+    text_service: TextService = Depends(get_text_service)
+):
+    """
+    Analyze many texts in one request
+    
+    - **items**: List of `{text, analysis_type}` objects
+    - **stream**: When true, returns `application/x-ndjson` with one result per line in completion order
+    
+    Identical items are analyzed once. Each result carries the `index` of its item
+    and either the analysis `result` or an `error`.
+    
+    At most `TEXT_BATCH_MAX_ITEMS` items, lowered with rate limiting on to what the
+    smallest rate limit bucket can pay for. Every distinct uncached item is paid for
+    before any is analyzed, so a batch the buckets cannot cover yet is rejected whole
+    with 429 and Retry-After.
+    """
+    logger.info(f"Analyzing text batch of {len(request.items)} items")
+    results = await text_service.analyze_batch(request.items, settings.BATCH_MAX_CONCURRENCY)
+    
+    if stream:
+        async def ndjson():
+            async for item in results:
+                yield item.model_dump_json() + "\n"
+        
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    
+    start_time = time.time()
+    collected = [item async for item in results]
+    collected.sort(key=lambda item: item.index)
+    succeeded = sum(1 for item in collected if item.success)
+    
+    return BatchTextAnalysisResponse(
+        results=collected,
+        total=len(collected),
+        succeeded=succeeded,
+        failed=len(collected) - succeeded,
+        processing_time=f"{time.time() - start_time:.2f}s"
+    )
\ No newline at end of file
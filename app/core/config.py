@@ -1,5 +1,6 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 from pathlib import Path
 
 class Settings(BaseSettings):
@@ -10,11 +11,81 @@ class Settings(BaseSettings):
     
     # Google Gemini
     GOOGLE_API_KEY: str
+    GEMINI_MAX_WORKERS: int = 8  # Concurrent upstream calls per worker
+    GEMINI_TIMEOUT_SECONDS: float = 30.0  # Per attempt
+    # Total time budget per operation, retries included
+    GEMINI_DEADLINES: Dict[str, float] = {"chat": 20.0, "text": 30.0, "image": 45.0, "summary": 60.0}
+    GEMINI_RETRY_MAX_ATTEMPTS: int = 3
+    GEMINI_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    GEMINI_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    GEMINI_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive retryable failures before failing fast
+    GEMINI_BREAKER_RESET_SECONDS: float = 30.0
+    # Hedged chat calls: a duplicate request when the first is slower than the rolling percentile
+    CHAT_HEDGING_ENABLED: bool = False
+    CHAT_HEDGE_PERCENTILE: float = 90.0
+    CHAT_HEDGE_MIN_SAMPLES: int = 20  # Use CHAT_HEDGE_DEFAULT_DELAY_SECONDS until this many calls are seen
+    CHAT_HEDGE_DEFAULT_DELAY_SECONDS: float = 2.0
+    CHAT_HEDGE_MIN_DELAY_SECONDS: float = 0.2
+    CHAT_HEDGE_BUDGET_RATIO: float = 0.05  # At most ~5% extra upstream calls
+    CHAT_HEDGE_BUDGET_BURST: float = 5.0
     
     # File Upload Settings
     MAX_FILE_SIZE: int = 10485760  # 10MB
     UPLOAD_DIR: str = "./uploads"
     ALLOWED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/png", "image/webp"]
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    MULTIPART_OVERHEAD_BYTES: int = 16 * 1024  # Allowance per file for boundaries and part headers
+    
+    # Image Preprocessing
+    IMAGE_PREPROCESS_ENABLED: bool = True
+    IMAGE_PREPROCESS_WORKERS: int = 2
+    IMAGE_MAX_DIMENSION: int = 1024
+    IMAGE_OUTPUT_FORMAT: str = "JPEG"  # JPEG | WEBP | PNG
+    IMAGE_OUTPUT_QUALITY: int = 85
+    
+    # Batch Analysis
+    TEXT_BATCH_MAX_ITEMS: int = 1000  # Lowered to fit the rate limits, see fit_request_sizes_to_rate_limits
+    BATCH_MAX_CONCURRENCY: int = 8
+    IMAGE_BATCH_MAX_FILES: int = 20  # Lowered to fit the rate limits, see fit_request_sizes_to_rate_limits
+    IMAGE_PACK_MAX_BYTES: int = 200 * 1024  # Images at most this size (after preprocessing) may share a prompt
+    IMAGE_PACK_MAX_IMAGES: int = 4
+    
+    # Long Documents (chunked map-reduce)
+    LONG_TEXT_MAX_CHARS: int = 500000  # Lowered to fit the rate limits, see fit_request_sizes_to_rate_limits
+    LONG_TEXT_CHUNK_CHARS: int = 6000  # Target chunk size; chunks end on sentence boundaries
+    LONG_TEXT_MAX_CONCURRENCY: int = 4
+    LONG_TEXT_MAX_ENTITIES: int = 25
+    
+    # Response Cache
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: float = 3600.0
+    RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    RESPONSE_CACHE_DISK_ENABLED: bool = False  # Stored under UPLOAD_DIR/cache
+    RESPONSE_CACHE_DISK_MAX_BYTES: int = 256 * 1024 * 1024  # 0 disables the size cap (expiry still applies)
+    RESPONSE_CACHE_DISK_SWEEP_INTERVAL_SECONDS: float = 300.0
+    
+    # Conversation Storage
+    CONVERSATION_STORE_BACKEND: str = "memory"  # memory | sqlite | redis
+    CONVERSATION_DB_PATH: str = "./data/conversations.db"
+    # In-memory store limits (0 disables a limit); the least recently active conversation goes first
+    CONVERSATION_MAX_COUNT: int = 10000
+    CONVERSATION_MAX_MESSAGES: int = 200  # Oldest turns are dropped beyond this
+    CONVERSATION_MAX_BYTES: int = 64 * 1024 * 1024
+    CONVERSATION_IDLE_TTL_SECONDS: float = 24 * 3600
+    CONVERSATION_SWEEP_INTERVAL_SECONDS: float = 60.0
+    CONVERSATION_SPILL_ENABLED: bool = False  # Evicted conversations go to CONVERSATION_DB_PATH
+    CONVERSATION_COMPRESS_MIN_BYTES: int = 1024  # AI replies this long are stored compressed (0 disables)
+    
+    # Redis (shared state across workers and instances)
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 20
+    REDIS_KEY_PREFIX: str = "multimodal:"
+    
+    # Chat Context
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 2000
+    CHAT_ADDITIONAL_CONTEXT_MAX_TOKENS: int = 800
+    CHAT_SUMMARY_MAX_TOKENS: int = 300
+    CHAT_SUMMARY_REFRESH_MESSAGES: int = 4  # Unsummarized turns outside the window before re-summarizing
     
     # CORS Settings
     CORS_ORIGINS: List[str] = [
@@ -24,9 +95,58 @@ class Settings(BaseSettings):
         "https://*.onrender.com"
     ]
     
+    # Health Checks
+    HEALTH_CHECK_INTERVAL_SECONDS: float = 30.0
+    HEALTH_MAX_STALENESS_SECONDS: float = 90.0  # Readiness fails if the last check is older
+    
+    # Tracing
+    TRACING_ENABLED: bool = False
+    TRACE_MAX_SPANS: int = 256  # Per trace; spans beyond it are counted as dropped_spans
+    TRACE_BUFFER_SIZE: int = 500  # Most recent traces kept for /api/v1/debug/traces
+    TRACE_SLOWEST_KEPT: int = 20
+    TRACE_EXCLUDED_PATHS: List[str] = ["/api/v1/health", "/api/v1/debug", "/metrics"]
+    TRACE_EXPORT_URL: str = ""  # Zipkin v2 collector, e.g. http://localhost:9411/api/v2/spans; empty disables export
+    TRACE_EXPORT_INTERVAL_SECONDS: float = 5.0
+    TRACE_SERVICE_NAME: str = "multimodal-ai-api"
+    DEBUG_API_TOKEN: str = ""  # Bearer token required by /api/v1/debug; empty disables those endpoints
+    
     # Rate Limiting
     REQUESTS_PER_MINUTE: int = 15
     REQUESTS_PER_DAY: int = 1500
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # memory | redis
+    RATE_LIMIT_CLIENT_PER_MINUTE: int = 10
+    RATE_LIMIT_MAX_WAIT_SECONDS: float = 5.0  # Queue this long before failing fast
+    # Reverse proxies (IPs or CIDR ranges) whose X-Forwarded-For is trusted to identify clients;
+    # with none, clients are identified by the connecting address
+    RATE_LIMIT_TRUSTED_PROXIES: List[str] = []
+    RATE_LIMITED_PATHS: List[str] = [
+        "/api/v1/images",
+        "/api/v1/text",
+        "/api/v1/chat/message"
+    ]
+    
+    @model_validator(mode="after")
+    def fit_request_sizes_to_rate_limits(self) -> "Settings":
+        """
+        Lower the request size limits to what one request can be granted.
+        
+        A request pays for all of its upstream calls at once, and no bucket
+        holds more than its capacity, so a request needing more calls than the
+        smallest bucket would be rejected however long the client waited.
+        """
+        if not self.RATE_LIMIT_ENABLED:
+            return self
+        max_calls = min(self.RATE_LIMIT_CLIENT_PER_MINUTE, self.REQUESTS_PER_MINUTE, self.REQUESTS_PER_DAY)
+        # At most one call per batch item or image (small images may also share one)
+        self.TEXT_BATCH_MAX_ITEMS = min(self.TEXT_BATCH_MAX_ITEMS, max_calls)
+        self.IMAGE_BATCH_MAX_FILES = min(self.IMAGE_BATCH_MAX_FILES, max_calls)
+        # One call per chunk plus the reduce step. Every chunk but the last holds at least half the
+        # target when no sentence is longer than a chunk, so this many characters fit the calls
+        self.LONG_TEXT_MAX_CHARS = min(
+            self.LONG_TEXT_MAX_CHARS, (max_calls - 1) * max(1, self.LONG_TEXT_CHUNK_CHARS // 2)
+        )
+        return self
     
     class Config:
         env_file = ".env"
@@ -1,3 +1,5 @@
+import math
+from typing import Optional
 from fastapi import HTTPException
 
 class AIServiceException(HTTPException):
@@ -8,6 +10,11 @@ class FileValidationException(HTTPException):
     def __init__(self, detail: str):
         super().__init__(status_code=400, detail=detail)
 
+class PayloadTooLargeException(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=413, detail=detail)
+
 class RateLimitException(HTTPException):
-    def __init__(self, detail: str = "Rate limit exceeded"):
-        super().__init__(status_code=429, detail=detail)
\ No newline at end of file
+    def __init__(self, detail: str = "Rate limit exceeded", retry_after: Optional[float] = None):
+        headers = {"Retry-After": str(math.ceil(retry_after))} if retry_after is not None else None
+        super().__init__(status_code=429, detail=detail, headers=headers)
\ No newline at end of file
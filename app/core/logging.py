@@ -1,13 +1,23 @@
 import logging
 import sys
 from typing import Any
+from app.core.tracing import current_request_id
+
+class RequestIdFilter(logging.Filter):
+    """Adds the traced request's ID (or "-") to every record"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id() or "-"
+        return True
 
 def setup_logging() -> None:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.addFilter(RequestIdFilter())
     logging.basicConfig(
         level=logging.INFO,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        format="%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s",
         handlers=[
-            logging.StreamHandler(sys.stdout)
+            handler
         ]
     )
 
@@ -0,0 +1,288 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import (
+    Any, Callable, Deque, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+)
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Cumulative bucketed latency histogram with a rolling window for percentiles"""
+    
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        labels: Optional[Dict[str, str]] = None,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        window: int = 1024
+    ):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._recent: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self._recent.append(value)
+    
+    def percentile(self, q: float) -> Optional[float]:
+        """Percentile (0-100) over the most recent observations"""
+        return self.percentiles(q)[0]
+    
+    def percentiles(self, *qs: float) -> List[Optional[float]]:
+        """Several percentiles from one sort of the bounded window"""
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return [None] * len(qs)
+        return [recent[min(len(recent) - 1, int(len(recent) * q / 100))] for q in qs]
+    
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+    
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        p50, p90, p99 = self.percentiles(50, 90, 99)
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": p50,
+            "p90": p90,
+            "p99": p99
+        }
+
+class Counter:
+    """Monotonic count of events"""
+    
+    def __init__(self, name: str, description: str = "", labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.value = 0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+class Gauge:
+    """Value that goes up and down, e.g. requests in flight"""
+    
+    def __init__(self, name: str, description: str = "", labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+    
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+    
+    def set(self, value: float) -> None:
+        self.value = value
+
+class Sample(NamedTuple):
+    """One value reported by a collector at scrape time"""
+    name: str
+    kind: str  # counter | gauge
+    description: str
+    labels: Dict[str, str]
+    value: float
+
+class MetricsRegistry:
+    """Process-wide collection of named, labelled metrics"""
+    
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, FrozenSet[Tuple[str, str]]], Histogram] = {}
+        self._counters: Dict[Tuple[str, FrozenSet[Tuple[str, str]]], Counter] = {}
+        self._gauges: Dict[Tuple[str, FrozenSet[Tuple[str, str]]], Gauge] = {}
+        # Callbacks reading state other components already keep (cache, store, executor)
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+    
+    def histogram(self, name: str, description: str = "", **labels: str) -> Histogram:
+        """Get or create the histogram for this name and label set"""
+        key = (name, frozenset(labels.items()))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(name, description, labels))
+        return histogram
+    
+    def histograms(self, name: str) -> List[Histogram]:
+        """All label sets recorded for a histogram name"""
+        return [h for (metric_name, _), h in list(self._histograms.items()) if metric_name == name]
+    
+    def counter(self, name: str, description: str = "", **labels: str) -> Counter:
+        """Get or create the counter for this name and label set"""
+        key = (name, frozenset(labels.items()))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, Counter(name, description, labels))
+        return counter
+    
+    def counters(self, name: str) -> List[Counter]:
+        """All label sets recorded for a counter name"""
+        return [c for (metric_name, _), c in list(self._counters.items()) if metric_name == name]
+    
+    def gauge(self, name: str, description: str = "", **labels: str) -> Gauge:
+        """Get or create the gauge for this name and label set"""
+        key = (name, frozenset(labels.items()))
+        gauge = self._gauges.get(key)
+        if gauge is None:
+            with self._lock:
+                gauge = self._gauges.setdefault(key, Gauge(name, description, labels))
+        return gauge
+    
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        self._collectors.append(collector)
+    
+    def clear_collectors(self) -> None:
+        """Drop collectors bound to services that are shutting down"""
+        self._collectors.clear()
+    
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        families: Dict[str, Tuple[str, str, List[str]]] = {}
+        
+        def family(name: str, kind: str, description: str) -> List[str]:
+            return families.setdefault(name, (kind, description, []))[2]
+        
+        for histogram in list(self._histograms.values()):
+            lines = family(histogram.name, "histogram", histogram.description)
+            with histogram._lock:
+                bucket_counts = list(histogram.bucket_counts)
+                count, total = histogram.count, histogram.sum
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{histogram.name}_bucket{_format_labels(histogram.labels, le=le)} {cumulative}")
+            lines.append(f"{histogram.name}_sum{_format_labels(histogram.labels)} {total}")
+            lines.append(f"{histogram.name}_count{_format_labels(histogram.labels)} {count}")
+        for kind, metrics_by_key in (("counter", self._counters), ("gauge", self._gauges)):
+            for metric in list(metrics_by_key.values()):
+                family(metric.name, kind, metric.description).append(
+                    f"{metric.name}{_format_labels(metric.labels)} {metric.value}"
+                )
+        for collector in list(self._collectors):
+            for sample in collector():
+                family(sample.name, sample.kind, sample.description).append(
+                    f"{sample.name}{_format_labels(sample.labels)} {sample.value}"
+                )
+        
+        output = []
+        for name, (kind, description, lines) in families.items():
+            if description:
+                output.append(f"# HELP {name} {_escape(description, help_text=True)}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+def _escape(value: str, help_text: bool = False) -> str:
+    value = value.replace("\\", "\\\\").replace("\n", "\\n")
+    return value if help_text else value.replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str], **extra: str) -> str:
+    pairs = {**labels, **extra}
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in pairs.items()) + "}"
+
+metrics = MetricsRegistry()
+
+def stage_histogram(operation: str, stage: str) -> Histogram:
+    """Latency of one stage (preprocessing, upstream, parsing, serialization) of an analysis operation"""
+    return metrics.histogram(
+        "analysis_stage_duration_seconds", "Time spent per analysis stage", operation=operation, stage=stage
+    )
+
+def timed(name: str, description: str = "", **labels: str) -> Callable:
+    """
+    Decorator recording each call's duration in a histogram, for sync and async functions.
+    
+    The histogram is resolved once at decoration, so a call costs two clock
+    reads and one observe. Failed calls are timed too.
+    """
+    histogram = metrics.histogram(name, description, **labels)
+    
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    
+    return decorator
+
+class RequestMetricsMiddleware(BaseHTTPMiddleware):
+    """Records per-endpoint latency, labelled by route template rather than raw path"""
+    
+    async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        in_flight = metrics.gauge("http_requests_in_flight", "Requests being handled")
+        in_flight.inc()
+        try:
+            response = await call_next(request)
+        finally:
+            in_flight.dec()
+        # Routing stores the matched route in the shared scope; unmatched paths share one label
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.histogram(
+            "http_request_duration_seconds",
+            "Time until response headers are sent",
+            method=request.method,
+            route=route
+        ).observe(time.perf_counter() - start)
+        # Declared sizes only: streamed bodies have no Content-Length and are not counted
+        request_bytes = request.headers.get("content-length")
+        if request_bytes and request_bytes.isdigit():
+            metrics.counter(
+                "http_request_bytes_total", "Request body bytes received", route=route
+            ).inc(int(request_bytes))
+        response_bytes = response.headers.get("content-length")
+        if response_bytes and response_bytes.isdigit():
+            metrics.counter(
+                "http_response_bytes_total", "Response body bytes sent", route=route
+            ).inc(int(response_bytes))
+        return response
@@ -0,0 +1,328 @@
+import asyncio
+import ipaddress
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+import redis.asyncio as aioredis
+from redis.exceptions import WatchError
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.core.exceptions import PayloadTooLargeException, RateLimitException
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+@dataclass(frozen=True)
+class BucketLimit:
+    """Token bucket holding `capacity` tokens that refills over `period_seconds`"""
+    name: str
+    capacity: int
+    period_seconds: float
+    per_client: bool = False
+    
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period_seconds
+
+class RateLimitBackend(ABC):
+    """Storage for token bucket state, swappable for a shared backend across workers"""
+    
+    @abstractmethod
+    async def reserve(self, key: str, limit: BucketLimit, max_wait: float, count: int = 1) -> Tuple[bool, float]:
+        """
+        Take `count` tokens from the bucket.
+        
+        Returns (granted, wait). When granted, the caller must wait `wait`
+        seconds before proceeding. When the wait would exceed `max_wait`
+        nothing is taken and `wait` is the time until enough tokens free up.
+        """
+    
+    @abstractmethod
+    async def refund(self, key: str, limit: BucketLimit, count: int = 1) -> None:
+        """Return previously reserved tokens"""
+    
+    async def close(self) -> None:
+        """Release backend resources"""
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Per-process bucket state"""
+    
+    def __init__(self, max_keys: int = 10000):
+        # key -> (tokens, updated_at, full_at)
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self.max_keys = max_keys
+    
+    async def reserve(self, key: str, limit: BucketLimit, max_wait: float, count: int = 1) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens = self._refill(key, limit, now)
+        # Tokens may go negative: each reservation queues behind earlier ones
+        wait = max(0.0, (count - tokens) / limit.refill_per_second)
+        if wait > max_wait:
+            return False, wait
+        
+        self._store(key, limit, tokens - count, now)
+        if len(self._buckets) > self.max_keys:
+            self._prune(now)
+        return True, wait
+    
+    async def refund(self, key: str, limit: BucketLimit, count: int = 1) -> None:
+        now = time.monotonic()
+        tokens = self._refill(key, limit, now)
+        self._store(key, limit, min(limit.capacity, tokens + count), now)
+    
+    def _refill(self, key: str, limit: BucketLimit, now: float) -> float:
+        tokens, updated_at, _ = self._buckets.get(key, (limit.capacity, now, now))
+        return min(limit.capacity, tokens + (now - updated_at) * limit.refill_per_second)
+    
+    def _store(self, key: str, limit: BucketLimit, tokens: float, now: float) -> None:
+        full_at = now + (limit.capacity - tokens) / limit.refill_per_second
+        self._buckets[key] = (tokens, now, full_at)
+    
+    def _prune(self, now: float) -> None:
+        """Drop buckets that have refilled, a missing bucket reads as full"""
+        full = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in full:
+            del self._buckets[key]
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Bucket state in Redis so every worker draws from the same buckets.
+    
+    Each bucket is a hash of (tokens, updated_at) updated under WATCH/MULTI, so
+    concurrent reservations from different workers retry instead of double
+    spending. Wall-clock time is used because monotonic clocks differ per host.
+    """
+    
+    def __init__(self, client: aioredis.Redis, prefix: str = "", max_retries: int = 10):
+        self._redis = client
+        self._prefix = prefix
+        self.max_retries = max_retries
+    
+    @classmethod
+    def from_url(cls, url: str, max_connections: int, prefix: str = "") -> "RedisRateLimitBackend":
+        pool = aioredis.ConnectionPool.from_url(url, max_connections=max_connections, decode_responses=True)
+        return cls(aioredis.Redis(connection_pool=pool), prefix)
+    
+    async def reserve(self, key: str, limit: BucketLimit, max_wait: float, count: int = 1) -> Tuple[bool, float]:
+        result: Tuple[bool, float] = (False, 0.0)
+        
+        def take(tokens: float) -> Optional[float]:
+            nonlocal result
+            wait = max(0.0, (count - tokens) / limit.refill_per_second)
+            if wait > max_wait:
+                result = (False, wait)
+                return None
+            result = (True, wait)
+            return tokens - count
+        
+        await self._update(key, limit, take)
+        return result
+    
+    async def refund(self, key: str, limit: BucketLimit, count: int = 1) -> None:
+        await self._update(key, limit, lambda tokens: min(limit.capacity, tokens + count))
+    
+    async def close(self) -> None:
+        await self._redis.connection_pool.disconnect()
+    
+    async def _update(self, key: str, limit: BucketLimit, apply: Callable[[float], Optional[float]]) -> None:
+        """Read-modify-write one bucket; `apply` returns the new token count or None to leave it"""
+        redis_key = f"{self._prefix}{key}"
+        async with self._redis.pipeline() as pipe:
+            for _ in range(self.max_retries):
+                try:
+                    await pipe.watch(redis_key)
+                    tokens, updated_at = await pipe.hmget(redis_key, "tokens", "updated_at")
+                    now = time.time()
+                    if tokens is None:
+                        current = float(limit.capacity)
+                    else:
+                        elapsed = max(0.0, now - float(updated_at))
+                        current = min(limit.capacity, float(tokens) + elapsed * limit.refill_per_second)
+                    
+                    new_tokens = apply(current)
+                    if new_tokens is None:
+                        await pipe.unwatch()
+                        return
+                    pipe.multi()
+                    pipe.hset(redis_key, mapping={"tokens": new_tokens, "updated_at": now})
+                    # A missing bucket reads as full, so let Redis drop it once it has refilled
+                    full_in = (limit.capacity - new_tokens) / limit.refill_per_second
+                    pipe.pexpire(redis_key, max(1, int(full_in * 1000)))
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    continue
+        raise RuntimeError(f"Rate limit bucket {key} stayed contended after {self.max_retries} attempts")
+
+class RateLimiter:
+    """Admission control over per-client and global token buckets"""
+    
+    def __init__(self, backend: RateLimitBackend, limits: Sequence[BucketLimit], max_wait_seconds: float):
+        self.backend = backend
+        self.limits: List[BucketLimit] = list(limits)
+        self.max_wait_seconds = max_wait_seconds
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+    
+    @property
+    def max_calls(self) -> int:
+        """Most upstream calls one request can ever be granted: a bucket never holds more than its capacity"""
+        return min(limit.capacity for limit in self.limits)
+    
+    async def acquire(self, client_id: str, count: int = 1) -> None:
+        """Wait for `count` slots in every bucket, or raise RateLimitException"""
+        for limit in self.limits:
+            if count > limit.capacity:
+                # Retrying cannot help, so this is not a 429
+                self.rejected += 1
+                raise PayloadTooLargeException(
+                    f"Request needs {count} upstream calls, more than the {limit.name} limit of {limit.capacity} allows"
+                )
+        
+        reserved: List[Tuple[str, BucketLimit]] = []
+        wait = 0.0
+        for limit in self.limits:
+            key = f"ratelimit:{limit.name}:{client_id}" if limit.per_client else f"ratelimit:{limit.name}"
+            granted, bucket_wait = await self.backend.reserve(key, limit, self.max_wait_seconds, count)
+            if not granted:
+                for reserved_key, reserved_limit in reserved:
+                    await self.backend.refund(reserved_key, reserved_limit, count)
+                self.rejected += 1
+                raise RateLimitException(
+                    f"Rate limit exceeded ({limit.name}). Retry in {bucket_wait:.0f}s",
+                    retry_after=bucket_wait
+                )
+            reserved.append((key, limit))
+            wait = max(wait, bucket_wait)
+        
+        if wait > 0:
+            self.queued += 1
+            await asyncio.sleep(wait)
+        self.admitted += 1
+    
+    def stats(self) -> Dict[str, int]:
+        return {"admitted": self.admitted, "queued": self.queued, "rejected": self.rejected}
+
+class RequestQuota:
+    """
+    Upstream calls a request has paid for.
+    
+    Admission pays for one, which covers single-call requests. Requests that
+    fan out (batches, packed images, long documents) pay for every further
+    call from the same buckets, so one request cannot spend more quota than
+    the calls it makes.
+    """
+    
+    def __init__(self, limiter: RateLimiter, client_id: str, available: int = 1):
+        self.limiter = limiter
+        self.client_id = client_id
+        self.available = available
+    
+    async def reserve(self, calls: int) -> None:
+        """
+        Make sure `calls` upstream calls are paid for, buying any shortfall at once.
+        
+        Raises PayloadTooLargeException when no bucket state could ever cover
+        them, and RateLimitException when the buckets cannot cover them yet.
+        """
+        if calls > self.limiter.max_calls:
+            self.limiter.rejected += 1
+            raise PayloadTooLargeException(
+                f"Request needs {calls} upstream calls; the rate limits allow at most "
+                f"{self.limiter.max_calls} per request"
+            )
+        shortfall = calls - self.available
+        if shortfall > 0:
+            await self.limiter.acquire(self.client_id, shortfall)
+            self.available += shortfall
+    
+    async def spend(self) -> None:
+        await self.reserve(1)
+        self.available -= 1
+
+_request_quota: ContextVar[Optional[RequestQuota]] = ContextVar("request_quota", default=None)
+
+async def reserve_upstream_calls(calls: int) -> None:
+    """Pay for `calls` upstream calls ahead of making them; a no-op outside a rate-limited request"""
+    quota = _request_quota.get()
+    if quota is not None:
+        await quota.reserve(calls)
+
+async def charge_upstream_call() -> None:
+    """Spend one paid-for upstream call, paying for another if none are left"""
+    quota = _request_quota.get()
+    if quota is not None:
+        await quota.spend()
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+def parse_networks(addresses: Sequence[str]) -> List[Network]:
+    """IP addresses or CIDR ranges, e.g. ["10.0.0.0/8", "127.0.0.1"]"""
+    return [ipaddress.ip_network(address.strip(), strict=False) for address in addresses]
+
+def _is_trusted(address: str, trusted_proxies: Sequence[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+def get_client_id(request: Request, trusted_proxies: Sequence[Network] = ()) -> str:
+    """
+    Identify the caller by the address that connected to us.
+    
+    X-Forwarded-For is client-controlled, so it is only consulted when that
+    address is a trusted proxy. Each proxy appends the address it received the
+    request from, so the caller is the rightmost hop that is not itself a
+    trusted proxy; anything left of it may be forged.
+    """
+    peer = request.client.host if request.client else "unknown"
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if not forwarded_for or not _is_trusted(peer, trusted_proxies):
+        return peer
+    
+    client = peer
+    for hop in reversed([hop.strip() for hop in forwarded_for.split(",") if hop.strip()]):
+        client = hop
+        if not _is_trusted(hop, trusted_proxies):
+            break
+    return client
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """Apply the application's RateLimiter to upstream-bound routes"""
+    
+    def __init__(self, app, path_prefixes: Sequence[str], trusted_proxies: Sequence[str] = ()):
+        super().__init__(app)
+        self.path_prefixes = tuple(path_prefixes)
+        self.trusted_proxies = parse_networks(trusted_proxies)
+    
+    async def dispatch(self, request: Request, call_next):
+        limiter = getattr(request.app.state, "rate_limiter", None)
+        if not limiter or request.method == "OPTIONS" or not request.url.path.startswith(self.path_prefixes):
+            return await call_next(request)
+        
+        client_id = get_client_id(request, self.trusted_proxies)
+        try:
+            await limiter.acquire(client_id)
+        except RateLimitException as e:
+            logger.warning(f"Rejected {request.url.path}: {e.detail}")
+            return JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+        
+        # Upstream calls beyond the first are charged as they are made
+        token = _request_quota.set(RequestQuota(limiter, client_id))
+        try:
+            return await call_next(request)
+        finally:
+            _request_quota.reset(token)
+
+def build_limits(requests_per_minute: int, requests_per_day: int, client_requests_per_minute: int) -> List[BucketLimit]:
+    """Per-client limit first so a noisy client is rejected before touching global quota"""
+    return [
+        BucketLimit("client_minute", client_requests_per_minute, 60, per_client=True),
+        BucketLimit("global_minute", requests_per_minute, 60),
+        BucketLimit("global_day", requests_per_day, 86400)
+    ]
@@ -0,0 +1,348 @@
+import functools
+import heapq
+import inspect
+import itertools
+import re
+import secrets
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from fastapi.routing import APIRoute
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+# Client-supplied request IDs are echoed back and logged, so only plain tokens are accepted
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_HEX_TRACE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+class Span:
+    """One timed operation within a trace"""
+    
+    __slots__ = ("name", "span_id", "parent_id", "start_time", "start", "duration", "attributes", "error")
+    
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_time = time.time()  # Wall clock, for export
+        self.start = time.perf_counter()  # Monotonic, for durations
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+    
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+    
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.start
+
+class Trace:
+    """
+    All spans recorded while handling one request.
+    
+    At most `max_spans` are kept, so a request that fans out widely cannot grow
+    its trace without bound; later spans still run but are only counted.
+    """
+    
+    __slots__ = ("trace_id", "request_id", "root", "spans", "max_spans", "dropped_spans")
+    
+    def __init__(self, name: str, request_id: str, max_spans: Optional[int] = None):
+        self.request_id = request_id
+        # Zipkin wants a 128-bit hex trace ID; reuse the request ID when it already is one
+        self.trace_id = request_id if _HEX_TRACE_ID.match(request_id) else uuid.uuid4().hex
+        self.root = Span(name, None, {})
+        self.spans: List[Span] = [self.root]
+        self.max_spans = max_spans
+        self.dropped_spans = 0
+    
+    @property
+    def duration(self) -> float:
+        return self.root.duration if self.root.duration is not None else time.perf_counter() - self.root.start
+    
+    def last_span(self, name: str) -> Optional[Span]:
+        for span in reversed(self.spans):
+            if span.name == name:
+                return span
+        return None
+    
+    def append(self, span: Span) -> None:
+        if self.max_spans is not None and len(self.spans) >= self.max_spans:
+            self.dropped_spans += 1
+        else:
+            self.spans.append(span)
+    
+    def add_span(self, name: str, parent_id: Optional[str], start: float, end: float, **attributes: Any) -> Span:
+        """Record a span measured after the fact, from perf_counter readings"""
+        span = Span(name, parent_id, attributes)
+        span.start_time -= span.start - start
+        span.start = start
+        span.duration = end - start
+        self.append(span)
+        return span
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "request_id": self.request_id,
+            "name": self.root.name,
+            "start_time": self.root.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "spans": len(self.spans),
+            "dropped_spans": self.dropped_spans,
+            "error": self.root.error
+        }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Summary plus every span, with offsets from the start of the request"""
+        return {
+            **self.summary(),
+            "span_details": [
+                {
+                    "span_id": span.span_id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "offset_ms": round((span.start - self.root.start) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3) if span.duration is not None else None,
+                    "attributes": span.attributes,
+                    "error": span.error
+                }
+                for span in sorted(self.spans, key=lambda span: span.start)
+            ]
+        }
+    
+    def to_zipkin(self, service_name: str) -> List[Dict[str, Any]]:
+        """Spans in Zipkin v2 JSON, the format accepted at a collector's /api/v2/spans"""
+        encoded = []
+        for span in self.spans:
+            if span.duration is None:
+                continue  # Still running (e.g. a detached background task)
+            tags = {key: str(value) for key, value in span.attributes.items()}
+            if span.error:
+                tags["error"] = span.error
+            if span is self.root and self.dropped_spans:
+                tags["dropped_spans"] = str(self.dropped_spans)
+            zipkin_span = {
+                "traceId": self.trace_id,
+                "id": span.span_id,
+                "name": span.name,
+                "timestamp": int(span.start_time * 1_000_000),
+                "duration": max(1, int(span.duration * 1_000_000)),
+                "localEndpoint": {"serviceName": service_name},
+                "tags": tags
+            }
+            if span.parent_id:
+                zipkin_span["parentId"] = span.parent_id
+            else:
+                zipkin_span["kind"] = "SERVER"
+            encoded.append(zipkin_span)
+        return encoded
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+@contextmanager
+def trace_request(name: str, request_id: str, max_spans: Optional[int] = None) -> Iterator[Trace]:
+    """Start a trace whose root span covers the with-block"""
+    trace = Trace(name, request_id, max_spans)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.error = type(e).__name__
+        raise
+    finally:
+        trace.root.finish()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Child span of the current one; a no-op outside a traced request"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    
+    parent = _current_span.get()
+    current = Span(name, parent.span_id if parent else None, attributes)
+    trace.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator running a sync or async function in a span named after it (its qualified name by default)"""
+    
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs) -> Any:
+                if _current_trace.get() is None:
+                    return await func(*args, **kwargs)
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    
+    return decorator
+
+class TraceBuffer:
+    """
+    Finished traces kept for the debug endpoint.
+    
+    The most recent `capacity` traces sit in a ring buffer; the slowest
+    `slowest_kept` ever seen are held separately so outliers survive after
+    the ring has moved on. Traces to export queue up until drained.
+    """
+    
+    def __init__(self, capacity: int, slowest_kept: int, export: bool = False):
+        self._recent: Deque[Trace] = deque(maxlen=capacity)
+        self._slowest: List[Tuple[float, int, Trace]] = []  # Min-heap on duration
+        self._slowest_kept = slowest_kept
+        self._sequence = itertools.count()
+        self._export_queue: Optional[Deque[Trace]] = deque(maxlen=capacity) if export else None
+        self.recorded = 0
+    
+    def record(self, trace: Trace) -> None:
+        self.recorded += 1
+        self._recent.append(trace)
+        entry = (trace.duration, next(self._sequence), trace)
+        if len(self._slowest) < self._slowest_kept:
+            heapq.heappush(self._slowest, entry)
+        elif self._slowest and entry[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+        if self._export_queue is not None:
+            self._export_queue.append(trace)
+    
+    def recent(self, limit: int) -> List[Trace]:
+        """Newest first"""
+        return list(itertools.islice(reversed(self._recent), limit))
+    
+    def slowest(self) -> List[Trace]:
+        """Slowest first"""
+        return [trace for _, _, trace in sorted(self._slowest, reverse=True)]
+    
+    def get(self, trace_id: str) -> Optional[Trace]:
+        """Look up by trace ID or request ID"""
+        for trace in itertools.chain(reversed(self._recent), (trace for _, _, trace in self._slowest)):
+            if trace_id in (trace.trace_id, trace.request_id):
+                return trace
+        return None
+    
+    def drain_export(self) -> List[Trace]:
+        if not self._export_queue:
+            return []
+        traces = list(self._export_queue)
+        self._export_queue.clear()
+        return traces
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "recorded": self.recorded,
+            "buffered": len(self._recent),
+            "slowest_kept": len(self._slowest),
+            "pending_export": len(self._export_queue) if self._export_queue is not None else 0
+        }
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    Traces each request under a request ID taken from X-Request-ID or generated.
+    
+    The ID is carried in a context variable to every layer the request reaches
+    and echoed in the response's X-Request-ID header. Streamed bodies finish
+    after the trace is recorded, so their root span ends at the response headers.
+    Requests are named by route template, never by raw path: paths carry
+    conversation IDs, which are the only credential for a conversation.
+    """
+    
+    def __init__(self, app, excluded_prefixes: Optional[List[str]] = None, max_spans: Optional[int] = None):
+        super().__init__(app)
+        self.excluded_prefixes = tuple(excluded_prefixes or ())
+        self.max_spans = max_spans
+    
+    async def dispatch(self, request: Request, call_next):
+        buffer: Optional[TraceBuffer] = getattr(request.app.state, "trace_buffer", None)
+        if buffer is None or request.url.path.startswith(self.excluded_prefixes):
+            return await call_next(request)
+        
+        request_id = request.headers.get("x-request-id", "")
+        if not _REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        
+        with trace_request(request.method, request_id, self.max_spans) as trace:
+            try:
+                response = await call_next(request)
+            finally:
+                # Name by route template so traces of one endpoint group together
+                route = request.scope.get("route")
+                trace.root.set(**{"http.method": request.method})
+                if route is not None:
+                    trace.root.name = f"{request.method} {route.path}"
+                    trace.root.set(**{"http.route": route.path})
+            trace.root.set(**{"http.status_code": response.status_code})
+            if response.status_code >= 500:
+                trace.root.error = f"HTTP {response.status_code}"
+        
+        buffer.record(trace)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+class TracedRoute(APIRoute):
+    """
+    Route whose endpoint call is a span, with the time around it split into
+    request parsing/validation before and response validation/serialization after.
+    """
+    
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any):
+        self.endpoint_span_name = f"endpoint {endpoint.__name__}"
+        # include_router rebuilds routes from the already wrapped endpoint; wrap only once
+        if not getattr(endpoint, "_traced_endpoint", False):
+            endpoint = traced(self.endpoint_span_name)(endpoint)
+            endpoint._traced_endpoint = True
+        super().__init__(path, endpoint, **kwargs)
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        endpoint_span_name = self.endpoint_span_name
+        
+        async def traced_handler(request: Request):
+            trace = _current_trace.get()
+            if trace is None:
+                return await handler(request)
+            
+            started = time.perf_counter()
+            response = await handler(request)
+            finished = time.perf_counter()
+            
+            endpoint = trace.last_span(endpoint_span_name)
+            if endpoint is not None and endpoint.duration is not None and endpoint.start >= started:
+                trace.add_span("parse_request", endpoint.parent_id, started, endpoint.start)
+                trace.add_span("serialize_response", endpoint.parent_id, endpoint.start + endpoint.duration, finished)
+            return response
+        
+        return traced_handler
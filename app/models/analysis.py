@@ -0,0 +1,74 @@
+from pydantic import BaseModel, Field, create_model
+from typing import Dict, List, Literal, Optional, Sequence, Type
+
+# Structured output requested from the model. Field descriptions double as
+# instructions in the response schema; defaults let a repaired, truncated
+# reply still validate.
+
+class ImageAnalysis(BaseModel):
+    description: str = Field("", description="Detailed description of what is in the image")
+    objects: List[str] = Field(default_factory=list, description="Detected objects")
+    colors: List[str] = Field(default_factory=list, description="Dominant colors")
+    text_detected: str = Field("", description="Any visible text in the image")
+    mood: str = Field("", description="Overall mood or atmosphere")
+    composition: str = Field("", description="Description of the visual composition")
+    suggestions: str = Field("", description="Insights or potential improvements")
+    confidence: float = Field(0.0, description="Confidence in the analysis, 0 to 1")
+
+class SentimentAnalysis(BaseModel):
+    overall_sentiment: Literal["positive", "negative", "neutral"] = "neutral"
+    confidence_score: float = Field(0.0, description="Confidence in the sentiment, 0 to 1")
+    emotions: List[str] = Field(default_factory=list, description="Emotions expressed")
+    key_phrases: List[str] = Field(default_factory=list, description="Important phrases from the text")
+    tone: str = Field("", description="Tone, e.g. formal, informal or conversational")
+    subjectivity: Literal["objective", "subjective"] = "objective"
+    intensity: Literal["low", "medium", "high"] = "medium"
+
+class TextSummary(BaseModel):
+    summary: str = Field("", description="Concise summary of the main points")
+    key_points: List[str] = Field(default_factory=list, description="Main points")
+    themes: List[str] = Field(default_factory=list, description="Central themes")
+    reading_time_minutes: int = Field(0, description="Estimated reading time of the original text")
+    complexity: Literal["simple", "moderate", "complex"] = "moderate"
+
+class SentimentOverview(BaseModel):
+    overall: Literal["positive", "negative", "neutral"] = "neutral"
+    confidence: float = Field(0.0, description="Confidence in the sentiment, 0 to 1")
+    emotions: List[str] = Field(default_factory=list, description="Emotions expressed")
+
+class ComprehensiveAnalysis(BaseModel):
+    sentiment: SentimentOverview = Field(default_factory=SentimentOverview)
+    summary: str = Field("", description="Brief but comprehensive summary")
+    key_topics: List[str] = Field(default_factory=list, description="Main topics discussed")
+    writing_style: str = Field("", description="Writing style and approach")
+    readability: Literal["easy", "moderate", "difficult"] = "moderate"
+    target_audience: str = Field("", description="Who the text seems written for")
+    intent: str = Field("", description="What the author seems to want to achieve")
+    entities: List[str] = Field(default_factory=list, description="People, places and organizations mentioned")
+    suggestions: str = Field("", description="Potential improvements or insights")
+
+class ChunkAnalysis(BaseModel):
+    summary: str = Field("", description="Summary of this part of a longer document")
+    key_points: List[str] = Field(default_factory=list, description="Main points in this part")
+    sentiment: Literal["positive", "negative", "neutral"] = "neutral"
+    sentiment_confidence: float = Field(0.0, description="Confidence in the sentiment, 0 to 1")
+    entities: List[str] = Field(default_factory=list, description="People, places and organizations mentioned")
+
+class DocumentSummary(BaseModel):
+    summary: str = Field("", description="Summary of the whole document")
+    key_points: List[str] = Field(default_factory=list, description="Main points of the whole document")
+    themes: List[str] = Field(default_factory=list, description="Central themes")
+
+# Text analysis shapes by analysis type, in canonical order
+TEXT_ANALYSES: Dict[str, Type[BaseModel]] = {
+    "sentiment": SentimentAnalysis,
+    "summary": TextSummary,
+    "comprehensive": ComprehensiveAnalysis
+}
+
+def combined_text_analysis(analysis_types: Sequence[str]) -> Type[BaseModel]:
+    """One section per analysis type; a section left out of the reply validates as None"""
+    return create_model(
+        "CombinedTextAnalysis",
+        **{analysis_type: (Optional[TEXT_ANALYSES[analysis_type]], None) for analysis_type in analysis_types}
+    )
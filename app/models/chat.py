@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 class ChatMessage(BaseModel):
@@ -12,6 +12,8 @@ class Conversation(BaseModel):
     messages: List[ChatMessage]
     created_at: str
     last_activity: str
+    summary: Optional[str] = None  # Rolling summary of turns older than the context window
+    summary_message_count: int = 0  # Number of oldest messages the summary covers
 
 class ConversationSummary(BaseModel):
     conversation_id: str
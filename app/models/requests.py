@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from enum import Enum
+from app.core.config import settings
 
 class AnalysisType(str, Enum):
     SENTIMENT = "sentiment"
@@ -10,6 +11,19 @@ class AnalysisType(str, Enum):
 class TextAnalysisRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=10000)
     analysis_type: AnalysisType = AnalysisType.COMPREHENSIVE
+    # Several types answered together in one upstream call; overrides analysis_type
+    analysis_types: Optional[List[AnalysisType]] = Field(None, min_length=1)
+    
+    def requested_types(self) -> List[AnalysisType]:
+        """Requested analysis types, deduplicated in canonical order"""
+        requested = set(self.analysis_types or [self.analysis_type])
+        return [analysis_type for analysis_type in AnalysisType if analysis_type in requested]
+
+class LongTextAnalysisRequest(BaseModel):
+    text: str = Field(..., min_length=1, max_length=settings.LONG_TEXT_MAX_CHARS)
+
+class BatchTextAnalysisRequest(BaseModel):
+    items: List[TextAnalysisRequest] = Field(..., min_length=1, max_length=settings.TEXT_BATCH_MAX_ITEMS)
 
 class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=1000)
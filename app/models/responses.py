@@ -8,14 +8,43 @@ class ImageAnalysisResponse(BaseModel):
     analysis: Dict[str, Any]
     processing_time: str
     file_size: Optional[int] = None
+    cached: bool = False
+    original_size: Optional[int] = None  # Bytes uploaded by the client
+    sent_size: Optional[int] = None  # Bytes sent to the vision model after preprocessing
 
 class TextAnalysisResponse(BaseModel):
     success: bool
-    analysis_type: str
+    analysis_type: str  # "multi" when analysis_types was requested
+    analysis: Dict[str, Any]  # Keyed by analysis type for multi requests
+    analysis_types: Optional[List[str]] = None
+    word_count: int
+    character_count: int
+    processing_time: str
+    cached: bool = False
+
+class LongTextAnalysisResponse(BaseModel):
+    success: bool
     analysis: Dict[str, Any]
+    chunk_count: int
+    chunks_cached: int  # Chunks served from the cache, e.g. unchanged sections of an edited document
+    chunks_failed: int  # Chunks whose analysis could not be parsed; left out of the reduction
     word_count: int
     character_count: int
     processing_time: str
+    cached: bool = False
+
+class BatchTextAnalysisItemResult(BaseModel):
+    index: int  # Position in the request's items list
+    success: bool
+    result: Optional[TextAnalysisResponse] = None
+    error: Optional[str] = None
+
+class BatchTextAnalysisResponse(BaseModel):
+    results: List[BatchTextAnalysisItemResult]
+    total: int
+    succeeded: int
+    failed: int
+    processing_time: str
 
 class ChatResponse(BaseModel):
     response: str
@@ -1,19 +1,33 @@
 from app.services.gemini_service import GeminiService
-from app.storage.memory_store import ConversationStore
+from app.services.context_builder import ConversationContextBuilder
+from app.storage.base import AsyncConversationStore
+from app.storage.records import ConversationRecord, MessageRecord
 from app.models.requests import ChatRequest
 from app.models.responses import ChatResponse
 from app.models.chat import ChatMessage, Conversation
-from app.utils.time_utils import get_current_timestamp
+from app.utils.time_utils import get_current_timestamp, timestamp_to_micros
 from app.core.logging import get_logger
+from app.core.metrics import metrics
+from app.core.tracing import traced
+from typing import AsyncIterator, Optional
+import json
+import time
 import uuid
 
 logger = get_logger(__name__)
 
 class ChatService:
-    def __init__(self):
-        self.gemini_service = GeminiService()
-        self.conversation_store = ConversationStore()
+    def __init__(
+        self,
+        gemini_service: GeminiService,
+        conversation_store: AsyncConversationStore,
+        context_builder: ConversationContextBuilder
+    ):
+        self.gemini_service = gemini_service
+        self.conversation_store = conversation_store
+        self.context_builder = context_builder
     
+    @traced()
     async def process_chat_message(self, request: ChatRequest) -> ChatResponse:
         """Process chat message and return AI response"""
         try:
@@ -21,7 +35,7 @@ class ChatService:
             conversation_id = request.conversation_id or str(uuid.uuid4())
             
             # Get conversation history for context
-            conversation = self.conversation_store.get_conversation(conversation_id)
+            conversation = await self.conversation_store.get_record(conversation_id)
             
             # Build context for AI
             context = self._build_conversation_context(conversation, request.context)
@@ -41,7 +55,10 @@ class ChatService:
             )
             
             # Store in conversation
-            self.conversation_store.add_message(conversation_id, chat_message)
+            await self.conversation_store.add_message(conversation_id, chat_message)
+            self.context_builder.schedule_summary_refresh(
+                self._with_turn(conversation_id, conversation, chat_message)
+            )
             
             return ChatResponse(
                 response=ai_response,
@@ -53,23 +70,77 @@ class ChatService:
             logger.error(f"Chat processing failed: {e}")
             raise
     
-    def get_conversation_history(self, conversation_id: str) -> Conversation:
+    async def stream_chat_message(self, request: ChatRequest) -> AsyncIterator[str]:
+        """Stream the AI response as Server-Sent Events, persisting it once complete"""
+        start_time = time.perf_counter()
+        conversation_id = request.conversation_id or str(uuid.uuid4())
+        
+        try:
+            conversation = await self.conversation_store.get_record(conversation_id)
+            context = self._build_conversation_context(conversation, request.context)
+            
+            chunks = []
+            async for chunk in self.gemini_service.stream_chat_response(
+                message=request.message,
+                context=context
+            ):
+                if not chunks:
+                    metrics.histogram(
+                        "chat_stream_ttfb_seconds", "Time to first streamed chat token"
+                    ).observe(time.perf_counter() - start_time)
+                chunks.append(chunk)
+                yield self._sse_event("chunk", {"text": chunk})
+            
+            ai_response = "".join(chunks)
+            timestamp = get_current_timestamp()
+            chat_message = ChatMessage(
+                user=request.message,
+                ai=ai_response,
+                timestamp=timestamp
+            )
+            await self.conversation_store.add_message(conversation_id, chat_message)
+            self.context_builder.schedule_summary_refresh(
+                self._with_turn(conversation_id, conversation, chat_message)
+            )
+            
+            response = ChatResponse(
+                response=ai_response,
+                conversation_id=conversation_id,
+                timestamp=timestamp
+            )
+            yield self._sse_event("done", response.model_dump())
+            
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-band
+            logger.error(f"Chat streaming failed: {e}")
+            yield self._sse_event("error", {"detail": str(e), "conversation_id": conversation_id})
+    
+    async def get_conversation_history(self, conversation_id: str) -> Conversation:
         """Get full conversation history"""
-        return self.conversation_store.get_conversation(conversation_id)
+        return await self.conversation_store.get_conversation(conversation_id)
     
-    def _build_conversation_context(self, conversation: Conversation, additional_context: str = "") -> str:
-        """Build context string for AI from conversation history"""
-        context_parts = []
-        
-        # Add additional context if provided
-        if additional_context:
-            context_parts.append(f"Additional context: {additional_context}")
-        
-        # Add recent conversation history (last 5 messages)
-        if conversation and conversation.messages:
-            context_parts.append("Recent conversation:")
-            for message in conversation.messages[-5:]:
-                context_parts.append(f"User: {message.user}")
-                context_parts.append(f"AI: {message.ai}")
-        
-        return "\n".join(context_parts)
+    def _build_conversation_context(
+        self,
+        conversation: Optional[ConversationRecord],
+        additional_context: str = ""
+    ) -> str:
+        """Build token-budgeted context string for AI from conversation history"""
+        return self.context_builder.build(conversation, additional_context)
+    
+    @staticmethod
+    def _with_turn(
+        conversation_id: str,
+        conversation: Optional[ConversationRecord],
+        message: ChatMessage
+    ) -> ConversationRecord:
+        """The history read for this turn plus the turn itself, so it need not be read back"""
+        timestamp = timestamp_to_micros(message.timestamp)
+        if conversation is None:
+            conversation = ConversationRecord(conversation_id, created_at=timestamp, last_activity=timestamp)
+        conversation.messages.append(MessageRecord.from_message(message))
+        conversation.last_activity = timestamp
+        return conversation
+    
+    @staticmethod
+    def _sse_event(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
\ No newline at end of file
@@ -0,0 +1,129 @@
+import asyncio
+from typing import List, Optional, Set
+from app.services.gemini_service import GeminiService
+from app.storage.base import AsyncConversationStore
+from app.storage.records import ConversationRecord, MessageRecord
+from app.utils.tokens import count_tokens, truncate_to_tokens
+from app.core.logging import get_logger
+from app.core.tracing import traced
+
+logger = get_logger(__name__)
+
+class ConversationContextBuilder:
+    """Fits conversation history into a fixed token budget, summarizing what falls outside it"""
+    
+    def __init__(
+        self,
+        gemini_service: GeminiService,
+        conversation_store: AsyncConversationStore,
+        token_budget: int,
+        additional_context_max_tokens: int,
+        summary_max_tokens: int,
+        summary_refresh_messages: int
+    ):
+        self.gemini_service = gemini_service
+        self.conversation_store = conversation_store
+        self.token_budget = token_budget
+        self.additional_context_max_tokens = additional_context_max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summary_refresh_messages = summary_refresh_messages
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+    
+    @traced()
+    def build(self, conversation: Optional[ConversationRecord], additional_context: Optional[str] = "") -> str:
+        """Build context string for AI from conversation history, decompressing only the turns it uses"""
+        context_parts = []
+        remaining = self.token_budget
+        
+        # Add additional context if provided
+        if additional_context:
+            trimmed = truncate_to_tokens(additional_context, min(remaining, self.additional_context_max_tokens))
+            context_parts.append(f"Additional context: {trimmed}")
+            remaining -= count_tokens(context_parts[-1])
+        
+        if not conversation or not conversation.messages:
+            return "\n".join(context_parts)
+        
+        if conversation.summary:
+            summary = truncate_to_tokens(conversation.summary, min(remaining, self.summary_max_tokens))
+            context_parts.append(f"Earlier conversation summary: {summary}")
+            remaining -= count_tokens(context_parts[-1])
+        
+        # Newest turns first until the budget is spent, never repeating summarized turns
+        window_start = max(
+            self._window_start(conversation.messages, remaining),
+            conversation.summary_message_count
+        )
+        recent = [(message.user, message.ai_text()) for message in conversation.messages[window_start:]]
+        if not recent:
+            # Even the newest turn is over budget: keep a trimmed copy of it
+            newest = conversation.messages[-1]
+            recent = [(
+                truncate_to_tokens(newest.user, remaining // 2),
+                truncate_to_tokens(newest.ai_text(), remaining // 2)
+            )]
+        
+        context_parts.append("Recent conversation:")
+        for user, ai in recent:
+            context_parts.append(f"User: {user}")
+            context_parts.append(f"AI: {ai}")
+        
+        return "\n".join(context_parts)
+    
+    def schedule_summary_refresh(self, conversation: ConversationRecord) -> None:
+        """Fold turns that no longer fit the window into the summary, off the request path"""
+        if conversation.conversation_id in self._refreshing:
+            return
+        
+        window_start = self._window_start(conversation.messages, self._history_budget())
+        unsummarized = window_start - conversation.summary_message_count
+        # Regenerate in batches rather than every turn
+        if unsummarized < self.summary_refresh_messages:
+            return
+        
+        # Render the turns now, as the record's messages may be trimmed before the task runs
+        turns = "\n".join(
+            f"User: {message.user}\nAI: {message.ai_text()}"
+            for message in conversation.messages[conversation.summary_message_count:window_start]
+        )
+        self._refreshing.add(conversation.conversation_id)
+        task = asyncio.create_task(
+            self._refresh_summary(conversation.conversation_id, conversation.summary or "", turns, window_start)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def close(self) -> None:
+        """Wait for in-flight summary refreshes"""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def _refresh_summary(self, conversation_id: str, previous: str, turns: str, window_start: int) -> None:
+        try:
+            summary = await self.gemini_service.summarize_conversation(previous, turns)
+            await self.conversation_store.update_summary(
+                conversation_id,
+                truncate_to_tokens(summary, self.summary_max_tokens),
+                window_start
+            )
+            logger.info(f"Summarized {window_start} messages of conversation {conversation_id}")
+        except Exception as e:
+            logger.warning(f"Summary refresh failed for {conversation_id}: {e}")
+        finally:
+            self._refreshing.discard(conversation_id)
+    
+    def _history_budget(self) -> int:
+        """Budget left for recent turns when context and summary use their full share"""
+        return self.token_budget - self.additional_context_max_tokens - self.summary_max_tokens
+    
+    @staticmethod
+    def _window_start(messages: List[MessageRecord], budget: int) -> int:
+        """Index of the oldest message that fits when filling the budget newest-first"""
+        used = 0
+        for index in range(len(messages) - 1, -1, -1):
+            message = messages[index]
+            # +4 for the "User: " / "AI: " labels
+            used += count_tokens(message.user) + count_tokens(message.ai_text()) + 4
+            if used > budget:
+                return index + 1
+        return 0
\ No newline at end of file
@@ -1,33 +1,129 @@
 import google.generativeai as genai
+from google.generativeai import client as genai_client
+import asyncio
+import functools
 import json
-from typing import Dict, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
 from app.core.config import settings
-from app.core.exceptions import AIServiceException
+from app.core.exceptions import AIServiceException, RateLimitException
 from app.core.logging import get_logger
+from app.core.metrics import Histogram, metrics, stage_histogram, timed
+from app.core.rate_limit import charge_upstream_call
+from app.core.tracing import span, traced
+from app.models.analysis import (
+    TEXT_ANALYSES, ChunkAnalysis, ComprehensiveAnalysis, DocumentSummary, ImageAnalysis, SentimentAnalysis,
+    TextSummary, combined_text_analysis
+)
+from app.services.resilience import CircuitBreaker, HedgeBudget, RetryPolicy, is_retryable
+from app.utils.structured_output import repair_truncated_json, response_schema
 
 logger = get_logger(__name__)
 
+def _timed_method(func: Callable) -> Callable:
+    """Record a public method's end-to-end latency, labelled by its name, and trace it as a span"""
+    timed_func = timed("gemini_method_duration_seconds", "GeminiService method latency", method=func.__name__)(func)
+    return traced()(timed_func)
+
+def _payload_bytes(contents: Any) -> int:
+    """Approximate request payload: prompt characters plus inline image bytes"""
+    parts = contents if isinstance(contents, list) else [contents]
+    return sum(len(part["data"]) if isinstance(part, dict) else len(str(part)) for part in parts)
+
+def _structured_output(model, many: bool = False) -> Tuple[TypeAdapter, genai.GenerationConfig]:
+    """Validator and JSON-mode generation config for one response shape"""
+    adapter = TypeAdapter(List[model] if many else model)
+    config = genai.GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=response_schema(model, many=many)
+    )
+    return adapter, config
+
 class GeminiService:
+    MODEL_NAME = "gemini-1.5-flash"
+    # Bump whenever a prompt changes so cached analyses are not reused
+    PROMPT_VERSION = "2"
+    # Response shapes requested in JSON mode, validated in one pass on receipt
+    STRUCTURED_OUTPUTS = {
+        "image": _structured_output(ImageAnalysis),
+        "images": _structured_output(ImageAnalysis, many=True),
+        "sentiment": _structured_output(SentimentAnalysis),
+        "summary": _structured_output(TextSummary),
+        "comprehensive": _structured_output(ComprehensiveAnalysis),
+        "chunk": _structured_output(ChunkAnalysis),
+        "document": _structured_output(DocumentSummary)
+    }
+    # Combined text analyses, keyed like "sentiment+summary" in canonical type order
+    STRUCTURED_OUTPUTS.update({
+        "+".join(analysis_types): _structured_output(combined_text_analysis(analysis_types))
+        for size in range(2, len(TEXT_ANALYSES) + 1)
+        for analysis_types in combinations(TEXT_ANALYSES, size)
+    })
+    # What each section of a combined text analysis should contain
+    TEXT_SECTION_INSTRUCTIONS = {
+        "sentiment": "the sentiment and characteristics of the text",
+        "summary": "a summary of the text with its key points and themes",
+        "comprehensive": "a comprehensive analysis of the text"
+    }
+    
     def __init__(self):
         """Initialize Gemini service"""
         try:
             genai.configure(api_key=settings.GOOGLE_API_KEY)
-            self.text_model = genai.GenerativeModel('gemini-1.5-flash')
-            self.vision_model = genai.GenerativeModel('gemini-1.5-flash')
+            self.text_model = genai.GenerativeModel(self.MODEL_NAME)
+            self.vision_model = genai.GenerativeModel(self.MODEL_NAME)
+            self.timeout = settings.GEMINI_TIMEOUT_SECONDS
+            self.max_workers = settings.GEMINI_MAX_WORKERS
+            self.pending_calls = 0
+            self.last_success_at: Optional[float] = None
+            self.retries = 0
+            self.retry_policy = RetryPolicy(
+                max_attempts=settings.GEMINI_RETRY_MAX_ATTEMPTS,
+                base_delay=settings.GEMINI_RETRY_BASE_DELAY_SECONDS,
+                max_delay=settings.GEMINI_RETRY_MAX_DELAY_SECONDS
+            )
+            self.circuit_breaker = CircuitBreaker(
+                failure_threshold=settings.GEMINI_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout_seconds=settings.GEMINI_BREAKER_RESET_SECONDS
+            )
+            self.hedge_budget = HedgeBudget(
+                ratio=settings.CHAT_HEDGE_BUDGET_RATIO,
+                burst=settings.CHAT_HEDGE_BUDGET_BURST
+            )
+            self.hedge_calls = 0
+            self.hedges_sent = 0
+            self.hedge_wins = 0
+            # generate_content is blocking, so calls run on a dedicated pool
+            # sized to cap concurrent upstream requests per worker
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="gemini"
+            )
             logger.info("Gemini service initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Gemini service: {e}")
             raise AIServiceException("Failed to initialize AI service")
     
     async def test_connection(self) -> bool:
-        """Test Gemini API connection"""
+        """Test Gemini API connection with a model metadata lookup (uses no generation quota)"""
         try:
-            response = self.text_model.generate_content("Test connection")
+            await asyncio.wait_for(
+                self._run_in_executor(functools.partial(
+                    genai.get_model,
+                    f"models/{self.MODEL_NAME}",
+                    request_options={"timeout": self.timeout}
+                )),
+                timeout=self.timeout
+            )
             return True
         except Exception as e:
             logger.error(f"Gemini connection test failed: {e}")
             return False
     
+    @_timed_method
     async def analyze_image_with_vision(self, image_data: bytes, content_type: str) -> Dict[str, Any]:
         """Analyze image using Gemini Vision"""
         try:
@@ -37,24 +133,14 @@ class GeminiService:
             }
             
             prompt = """
-            Analyze this image comprehensively and provide a detailed JSON response:
-            {
-                "description": "Detailed description of what you see in the image",
-                "objects": ["list", "of", "detected", "objects"],
-                "colors": ["dominant", "colors", "present"],
-                "text_detected": "any visible text in the image",
-                "mood": "overall mood or atmosphere",
-                "composition": "description of visual composition",
-                "suggestions": "insights or potential improvements",
-                "confidence": 0.95
-            }
-            
-            Ensure the response is valid JSON format.
+            Analyze this image comprehensively. Respond with JSON matching the response schema.
             """
             
-            response = self.vision_model.generate_content([prompt, image_part])
-            return self._parse_json_response(response.text)
-            
+            return await self._generate_structured(self.vision_model, [prompt, image_part], "image", "image")
+        
+        except (AIServiceException, RateLimitException):
+            # Open breaker, deadline and exhausted retries keep their status codes
+            raise
         except Exception as e:
             logger.error(f"Image analysis failed: {e}")
             # Return a structured error response
@@ -70,6 +156,35 @@ class GeminiService:
                 "error": str(e)
             }
     
+    @_timed_method
+    async def analyze_images_with_vision(self, images: List[Tuple[bytes, str]]) -> Optional[List[Dict[str, Any]]]:
+        """Analyze several images in one request, or return None if the reply cannot be split per image"""
+        try:
+            prompt = f"""
+            You are given {len(images)} images, each preceded by its label.
+            Analyze each image comprehensively and respond with a JSON array containing
+            exactly {len(images)} objects, one per image in the same order.
+            """
+            
+            contents: List[Any] = [prompt]
+            for number, (image_data, content_type) in enumerate(images, start=1):
+                contents.append(f"Image {number}:")
+                contents.append({"mime_type": content_type, "data": image_data})
+            
+            results = await self._generate_structured(self.vision_model, contents, "images", "image")
+            if results is None or len(results) != len(images):
+                logger.warning(f"Packed analysis of {len(images)} images could not be split")
+                return None
+            return results
+        
+        except (AIServiceException, RateLimitException):
+            # Falling back to one call per image would only spend more quota on an unavailable upstream
+            raise
+        except Exception as e:
+            logger.error(f"Packed image analysis failed: {e}")
+            return None
+    
+    @_timed_method
     async def analyze_text_sentiment(self, text: str) -> Dict[str, Any]:
         """Analyze text sentiment"""
         try:
@@ -78,25 +193,18 @@ class GeminiService:
             
             Text: "{text}"
             
-            Provide a JSON response with:
-            {{
-                "overall_sentiment": "positive/negative/neutral",
-                "confidence_score": 0.85,
-                "emotions": ["joy", "excitement", "concern"],
-                "key_phrases": ["important phrases from the text"],
-                "tone": "formal/informal/conversational/etc",
-                "subjectivity": "objective/subjective",
-                "intensity": "low/medium/high"
-            }}
+            Respond with JSON matching the response schema.
             """
             
-            response = self.text_model.generate_content(prompt)
-            return self._parse_json_response(response.text)
-            
+            return await self._generate_structured(self.text_model, prompt, "sentiment", "text")
+        
+        except (AIServiceException, RateLimitException):
+            raise
         except Exception as e:
             logger.error(f"Sentiment analysis failed: {e}")
             raise AIServiceException(f"Sentiment analysis failed: {str(e)}")
     
+    @_timed_method
     async def summarize_text(self, text: str) -> Dict[str, Any]:
         """Summarize text content"""
         try:
@@ -105,24 +213,21 @@ class GeminiService:
             
             Text: "{text}"
             
-            Provide a JSON response with:
-            {{
-                "summary": "Concise summary of the main points",
-                "key_points": ["main", "points", "extracted"],
-                "themes": ["central", "themes", "identified"],
-                "word_count_original": {len(text.split())},
-                "reading_time_minutes": 2,
-                "complexity": "simple/moderate/complex"
-            }}
+            Respond with JSON matching the response schema.
             """
             
-            response = self.text_model.generate_content(prompt)
-            return self._parse_json_response(response.text)
-            
+            result = await self._generate_structured(self.text_model, prompt, "summary", "text")
+            # Counted locally rather than asking the model to echo it back
+            result["word_count_original"] = len(text.split())
+            return result
+        
+        except (AIServiceException, RateLimitException):
+            raise
         except Exception as e:
             logger.error(f"Text summarization failed: {e}")
             raise AIServiceException(f"Text summarization failed: {str(e)}")
     
+    @_timed_method
     async def comprehensive_text_analysis(self, text: str) -> Dict[str, Any]:
         """Comprehensive text analysis"""
         try:
@@ -131,48 +236,481 @@ class GeminiService:
             
             Text: "{text}"
             
-            Analyze and provide JSON response with:
-            {{
-                "sentiment": {{
-                    "overall": "positive/negative/neutral",
-                    "confidence": 0.85,
-                    "emotions": ["detected", "emotions"]
-                }},
-                "summary": "Brief but comprehensive summary",
-                "key_topics": ["main", "topics", "discussed"],
-                "writing_style": "Description of writing style and approach",
-                "readability": "easy/moderate/difficult",
-                "target_audience": "Who this seems written for",
-                "intent": "What the author seems to want to achieve",
-                "entities": ["people", "places", "organizations", "mentioned"],
-                "suggestions": "Potential improvements or insights"
-            }}
+            Respond with JSON matching the response schema.
             """
             
-            response = self.text_model.generate_content(prompt)
-            return self._parse_json_response(response.text)
-            
+            return await self._generate_structured(self.text_model, prompt, "comprehensive", "text")
+        
+        except (AIServiceException, RateLimitException):
+            raise
         except Exception as e:
             logger.error(f"Comprehensive analysis failed: {e}")
             raise AIServiceException(f"Text analysis failed: {str(e)}")
     
+    @_timed_method
+    async def multi_text_analysis(self, text: str, analysis_types: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Several text analyses from one prompt, so the text is sent only once.
+        
+        `analysis_types` must be in canonical order. Returns the sections that
+        came back usable; callers fill any others individually.
+        """
+        try:
+            sections = "\n".join(
+                f"            - {analysis_type}: {self.TEXT_SECTION_INSTRUCTIONS[analysis_type]}"
+                for analysis_type in analysis_types
+            )
+            prompt = f"""
+            Analyze this text:
+            
+            Text: "{text}"
+            
+            Respond with JSON matching the response schema, filling every section:
+{sections}
+            """
+            
+            result = await self._generate_structured(
+                self.text_model, prompt, "+".join(analysis_types), "text"
+            )
+        
+        except (AIServiceException, RateLimitException):
+            raise
+        except Exception as e:
+            logger.error(f"Combined text analysis failed: {e}")
+            raise AIServiceException(f"Text analysis failed: {str(e)}")
+        
+        results = {
+            analysis_type: result[analysis_type]
+            for analysis_type in analysis_types
+            if isinstance(result.get(analysis_type), dict)
+        }
+        if result.get("schema_valid") is False:
+            for section in results.values():
+                section["schema_valid"] = False
+        if "summary" in results:
+            results["summary"]["word_count_original"] = len(text.split())
+        return results
+    
+    @_timed_method
+    async def analyze_text_chunk(self, chunk: str) -> Dict[str, Any]:
+        """Map step of a long-document analysis: one chunk, analyzed on its own"""
+        try:
+            # No chunk position in the prompt, so an unchanged chunk is cacheable wherever it moves
+            prompt = f"""
+            Analyze this part of a longer document:
+            
+            Text: "{chunk}"
+            
+            Respond with JSON matching the response schema.
+            """
+            
+            return await self._generate_structured(self.text_model, prompt, "chunk", "text")
+        
+        except (AIServiceException, RateLimitException):
+            raise
+        except Exception as e:
+            logger.error(f"Chunk analysis failed: {e}")
+            raise AIServiceException(f"Text analysis failed: {str(e)}")
+    
+    @_timed_method
+    async def summarize_chunk_analyses(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Reduce step of a long-document analysis: one summary from the per-chunk summaries"""
+        try:
+            parts = "\n\n".join(
+                f"Part {number}: {chunk.get('summary', '')}\n"
+                f"Key points: {'; '.join(map(str, chunk.get('key_points') or []))}"
+                for number, chunk in enumerate(chunks, start=1)
+            )
+            prompt = f"""
+            These are summaries of consecutive parts of one document:
+            
+            {parts}
+            
+            Combine them into a summary of the whole document. Respond with JSON matching the response schema.
+            """
+            
+            return await self._generate_structured(self.text_model, prompt, "document", "text")
+        
+        except (AIServiceException, RateLimitException):
+            raise
+        except Exception as e:
+            logger.error(f"Document summary failed: {e}")
+            raise AIServiceException(f"Text analysis failed: {str(e)}")
+    
+    @_timed_method
     async def chat_response(self, message: str, context: str = "") -> str:
         """Generate chat response"""
         try:
-            context_prompt = f"Context: {context}\n\n" if context else ""
+            prompt = self._build_chat_prompt(message, context)
+            if settings.CHAT_HEDGING_ENABLED:
+                response = await self._generate_hedged(self.text_model, prompt, operation="chat")
+            else:
+                response = await self._generate(self.text_model, prompt, operation="chat")
+            return response.text
+        
+        except (AIServiceException, RateLimitException):
+            raise
+        except Exception as e:
+            logger.error(f"Chat response failed: {e}")
+            raise AIServiceException(f"Chat response failed: {str(e)}")
+    
+    @_timed_method
+    async def summarize_conversation(self, previous_summary: str, turns: str) -> str:
+        """Fold older conversation turns into a running summary"""
+        try:
+            previous = f"Summary so far:\n{previous_summary}\n\n" if previous_summary else ""
             
             prompt = f"""
+            {previous}Conversation turns to add:
+            {turns}
+            
+            Rewrite the summary so it covers everything above in at most 150 words.
+            Keep names, facts, decisions and open questions. Respond with the summary text only.
+            """
+            
+            response = await self._generate(self.text_model, prompt, operation="summary")
+            return response.text.strip()
+        
+        except (AIServiceException, RateLimitException):
+            raise
+        except Exception as e:
+            logger.error(f"Conversation summary failed: {e}")
+            raise AIServiceException(f"Conversation summary failed: {str(e)}")
+    
+    async def stream_chat_response(self, message: str, context: str = "") -> AsyncIterator[str]:
+        """Generate chat response, yielding text chunks as the model produces them"""
+        prompt = self._build_chat_prompt(message, context)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        cancelled = False
+        
+        def produce() -> None:
+            # Runs on the executor: iterating the stream blocks on the network
+            try:
+                stream = self.text_model.generate_content(
+                    prompt, stream=True, request_options={"timeout": self.timeout}
+                )
+                for chunk in stream:
+                    if cancelled:
+                        return
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks without text parts (e.g. finish metadata)
+                        continue
+                    loop.call_soon_threadsafe(queue.put_nowait, text)
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+        
+        # Paid for like every other call, see _generate
+        await charge_upstream_call()
+        # Chunks may already be on the client, so streams are not retried; they still
+        # respect and feed the circuit breaker
+        self._check_circuit()
+        self._run_in_executor(produce)
+        outcome_recorded = False
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    self.circuit_breaker.record_failure()
+                    outcome_recorded = True
+                    raise AIServiceException(
+                        f"AI service timed out after {self.timeout:.0f}s", status_code=504
+                    )
+                if item is finished:
+                    self.circuit_breaker.record_success()
+                    self.last_success_at = time.monotonic()
+                    outcome_recorded = True
+                    return
+                if isinstance(item, Exception):
+                    self._record_failure(item)
+                    outcome_recorded = True
+                    logger.error(f"Chat stream failed: {item}")
+                    raise AIServiceException(
+                        f"Chat response failed: {str(item)}", status_code=503 if is_retryable(item) else 500
+                    )
+                yield item
+        finally:
+            # Stop the producer if the client went away mid-stream
+            cancelled = True
+            if not outcome_recorded:
+                self.circuit_breaker.release()
+    
+    async def warm_up(self) -> None:
+        """Start executor threads and build the shared gRPC client ahead of traffic"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self._executor, genai_client.get_default_generative_client)
+            for _ in range(self.max_workers)
+        ])
+        logger.info("Gemini service warmed up")
+    
+    def _build_chat_prompt(self, message: str, context: str) -> str:
+        context_prompt = f"Context: {context}\n\n" if context else ""
+        
+        return f"""
             {context_prompt}User message: {message}
             
             Please provide a helpful, conversational response. If there's context about previously analyzed content, refer to it naturally in your response. Be engaging and informative.
             """
+    
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Retry and circuit breaker state for health reporting"""
+        return {
+            "retries": self.retries,
+            "circuit_breaker": self.circuit_breaker.snapshot(),
+            "hedging": self.hedge_stats()
+        }
+    
+    def hedge_stats(self) -> Dict[str, Any]:
+        """How often chat calls were hedged and how often the hedge answered first"""
+        return {
+            "enabled": settings.CHAT_HEDGING_ENABLED,
+            "calls": self.hedge_calls,
+            "hedged": self.hedges_sent,
+            "hedge_rate": round(self.hedges_sent / self.hedge_calls, 4) if self.hedge_calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "win_rate": round(self.hedge_wins / self.hedges_sent, 4) if self.hedges_sent else 0.0,
+            "delay_seconds": round(self._hedge_delay("chat"), 3),
+            "budget_tokens": round(self.hedge_budget.tokens, 2)
+        }
+    
+    def structured_output_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per response shape: replies that validated directly, after repair, or not at all"""
+        stats: Dict[str, Dict[str, Any]] = {}
+        for counter in metrics.counters("gemini_structured_output_total"):
+            shape = stats.setdefault(
+                counter.labels["schema"], {"valid": 0, "repaired": 0, "invalid": 0}
+            )
+            shape[counter.labels["outcome"]] = counter.value
+        for shape in stats.values():
+            total = shape["valid"] + shape["repaired"] + shape["invalid"]
+            shape["success_rate"] = round((shape["valid"] + shape["repaired"]) / total, 4) if total else 0.0
+        return stats
+    
+    def executor_stats(self) -> Dict[str, int]:
+        """Upstream call concurrency, including calls waiting for a free thread"""
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": min(self.pending_calls, self.max_workers),
+            "queued": max(0, self.pending_calls - self.max_workers)
+        }
+    
+    def close(self) -> None:
+        """Shut down the executor used for upstream calls"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _run_in_executor(self, call: Callable[[], Any]) -> asyncio.Future:
+        """Submit a blocking call to the upstream executor, tracking queue depth"""
+        self.pending_calls += 1
+        future = asyncio.get_running_loop().run_in_executor(self._executor, call)
+        
+        def finished(_):
+            self.pending_calls -= 1
+        
+        future.add_done_callback(finished)
+        return future
+    
+    async def _generate(
+        self,
+        model: genai.GenerativeModel,
+        contents: Any,
+        operation: str = "text",
+        generation_config: Optional[genai.GenerationConfig] = None
+    ) -> Any:
+        """Upstream call with retries, timed as the operation's upstream stage"""
+        # Each call spends the request's quota, so fan-out cannot bypass the rate limits
+        await charge_upstream_call()
+        payload_bytes = _payload_bytes(contents)
+        metrics.counter(
+            "gemini_request_bytes_total", "Approximate bytes sent upstream", operation=operation
+        ).inc(payload_bytes)
+        with span("gemini.upstream", operation=operation, payload_bytes=payload_bytes):
+            with stage_histogram(operation, "upstream").time():
+                return await self._generate_with_retries(model, contents, operation, generation_config)
+    
+    async def _generate_with_retries(
+        self,
+        model: genai.GenerativeModel,
+        contents: Any,
+        operation: str,
+        generation_config: Optional[genai.GenerationConfig]
+    ) -> Any:
+        """
+        Run generate_content on the executor without blocking the event loop.
+        
+        Retryable upstream errors are retried with jittered backoff (or the
+        server's retry-after) until the operation's deadline; each attempt's
+        timeout is capped by what is left of it.
+        """
+        deadline = time.monotonic() + settings.GEMINI_DEADLINES.get(operation, self.timeout)
+        attempt = 0
+        while True:
+            attempt += 1
+            self._check_circuit()
+            attempt_timeout = min(self.timeout, max(0.0, deadline - time.monotonic()))
+            call = functools.partial(
+                model.generate_content,
+                contents,
+                generation_config=generation_config,
+                request_options={"timeout": attempt_timeout}
+            )
+            started = time.monotonic()
+            try:
+                with span("gemini.attempt", attempt=attempt, timeout_seconds=round(attempt_timeout, 3)):
+                    response = await asyncio.wait_for(self._run_in_executor(call), timeout=attempt_timeout)
+            except asyncio.CancelledError:
+                self.circuit_breaker.release()
+                raise
+            except Exception as e:
+                self._record_failure(e)
+                delay = self.retry_policy.delay(attempt, e) if is_retryable(e) else None
+                if (
+                    delay is None
+                    or attempt >= self.retry_policy.max_attempts
+                    or time.monotonic() + delay >= deadline
+                ):
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise AIServiceException(
+                            f"AI service timed out after {attempt_timeout:.0f}s", status_code=504
+                        )
+                    if delay is not None:
+                        # Overload or outage outlasted the retries: a 503 tells the client to come back later
+                        raise AIServiceException(f"AI service unavailable: {e}", status_code=503) from e
+                    raise
+                self.retries += 1
+                logger.warning(f"Gemini {operation} call failed ({e}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
             
-            response = self.text_model.generate_content(prompt)
-            return response.text
+            self.circuit_breaker.record_success()
+            self.last_success_at = time.monotonic()
+            self._latency_histogram(operation).observe(self.last_success_at - started)
+            return response
+    
+    async def _generate_structured(
+        self,
+        model: genai.GenerativeModel,
+        contents: Any,
+        schema: str,
+        operation: str
+    ) -> Any:
+        """Generate in JSON mode with the schema's response shape and parse the reply"""
+        _, config = self.STRUCTURED_OUTPUTS[schema]
+        response = await self._generate(model, contents, operation=operation, generation_config=config)
+        return self._parse_structured(response.text, schema, operation)
+    
+    async def _generate_hedged(self, model: genai.GenerativeModel, contents: Any, operation: str) -> Any:
+        """
+        Like _generate, but sends a duplicate request if the first one is slower
+        than the rolling latency percentile, and returns whichever succeeds first.
+        
+        The loser's task is cancelled; its executor thread is released when the
+        upstream answers or its request timeout expires.
+        """
+        self.hedge_calls += 1
+        self.hedge_budget.earn()
+        primary = asyncio.ensure_future(self._generate(model, contents, operation))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay(operation))
+            if done or not self.hedge_budget.try_spend():
+                return await primary
             
-        except Exception as e:
-            logger.error(f"Chat response failed: {e}")
-            raise AIServiceException(f"Chat response failed: {str(e)}")
+            self.hedges_sent += 1
+            hedge = asyncio.ensure_future(self._generate(model, contents, operation))
+            tasks.add(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+            # Both failed: report the original request's error
+            return primary.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    def _hedge_delay(self, operation: str) -> float:
+        """Rolling latency percentile, or a fixed default until enough calls are observed"""
+        histogram = self._latency_histogram(operation)
+        delay = settings.CHAT_HEDGE_DEFAULT_DELAY_SECONDS
+        if histogram.count >= settings.CHAT_HEDGE_MIN_SAMPLES:
+            delay = histogram.percentile(settings.CHAT_HEDGE_PERCENTILE)
+        return max(settings.CHAT_HEDGE_MIN_DELAY_SECONDS, delay)
+    
+    @staticmethod
+    def _latency_histogram(operation: str) -> Histogram:
+        return metrics.histogram(
+            "gemini_call_duration_seconds", "Successful upstream call latency", operation=operation
+        )
+    
+    def _check_circuit(self) -> None:
+        """Fail fast while the upstream is considered unhealthy"""
+        if not self.circuit_breaker.allow():
+            raise AIServiceException(
+                f"AI service temporarily unavailable. Retry in {self.circuit_breaker.retry_in():.0f}s",
+                status_code=503
+            )
+    
+    def _record_failure(self, error: BaseException) -> None:
+        # Only upstream faults count against the breaker; a rejected request proves it is reachable
+        if is_retryable(error):
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.release()
+    
+    def _parse_structured(self, response_text: str, schema: str, operation: str = "text") -> Any:
+        """
+        Validate a JSON-mode reply against its schema in a single pass.
+        
+        A reply cut off mid-document gets one cheap repair and a second
+        validation; anything else falls back to the lenient legacy parsers,
+        whose results are marked `schema_valid: False` so they are never cached.
+        """
+        adapter, _ = self.STRUCTURED_OUTPUTS[schema]
+        outcome = "valid"
+        with span("gemini.parse", schema=schema) as parse_span, stage_histogram(operation, "parsing").time():
+            try:
+                parsed = adapter.validate_json(response_text)
+            except ValidationError:
+                parsed = None
+                repaired = repair_truncated_json(response_text)
+                if repaired is not None:
+                    try:
+                        parsed = adapter.validate_json(repaired)
+                        outcome = "repaired"
+                    except ValidationError:
+                        pass
+        
+        if parsed is None:
+            outcome = "invalid"
+            logger.warning(f"Structured {schema} response failed validation")
+        if parse_span is not None:
+            parse_span.set(outcome=outcome)
+        metrics.counter(
+            "gemini_structured_output_total", "Structured replies by parse outcome", schema=schema, outcome=outcome
+        ).inc()
+        
+        if parsed is not None:
+            with stage_histogram(operation, "serialization").time():
+                return adapter.dump_python(parsed)
+        if schema == "images":
+            results = self._parse_json_array_response(response_text)
+            for result in results or []:
+                result["schema_valid"] = False
+            return results
+        result = self._parse_json_response(response_text)
+        if isinstance(result, dict):
+            result["schema_valid"] = False
+        return result
     
     def _parse_json_response(self, response_text: str) -> Dict[str, Any]:
         """Parse JSON from Gemini response"""
@@ -191,7 +729,7 @@ class GeminiService:
             
             json_str = response_text[start_idx:end_idx]
             return json.loads(json_str)
-            
+        
         except json.JSONDecodeError:
             logger.warning("Failed to parse JSON from Gemini response")
             return {
@@ -199,3 +737,21 @@ class GeminiService:
                 "parsed": False,
                 "error": "Invalid JSON format"
             }
+    
+    
+    def _parse_json_array_response(self, response_text: str) -> Optional[List[Dict[str, Any]]]:
+        """Parse a JSON array of objects from Gemini response"""
+        start_idx = response_text.find('[')
+        end_idx = response_text.rfind(']') + 1
+        if start_idx == -1 or end_idx == 0:
+            return None
+        
+        try:
+            parsed = json.loads(response_text[start_idx:end_idx])
+        except json.JSONDecodeError:
+            logger.warning("Failed to parse JSON array from Gemini response")
+            return None
+        
+        if not isinstance(parsed, list) or not all(isinstance(item, dict) for item in parsed):
+            return None
+        return parsed
\ No newline at end of file
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+from app.services.gemini_service import GeminiService
+from app.storage.base import AsyncConversationStore
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+class HealthMonitor:
+    """Refreshes dependency status in the background so health probes never wait on upstream"""
+    
+    def __init__(
+        self,
+        gemini_service: GeminiService,
+        conversation_store: AsyncConversationStore,
+        interval_seconds: float,
+        max_staleness_seconds: float,
+        lag_probe_seconds: float = 0.5
+    ):
+        self.gemini_service = gemini_service
+        self.conversation_store = conversation_store
+        self.interval_seconds = interval_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+        self.lag_probe_seconds = lag_probe_seconds
+        
+        self.gemini_connected: Optional[bool] = None
+        self.store_ok: Optional[bool] = None
+        self.checked_at: Optional[float] = None
+        self.event_loop_lag = 0.0
+        self._tasks = []
+    
+    async def start(self) -> None:
+        """Start the refresh and event-loop lag loops"""
+        self._tasks = [
+            asyncio.create_task(self._refresh_loop()),
+            asyncio.create_task(self._lag_loop())
+        ]
+    
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def refresh(self) -> None:
+        """Re-check upstream and store health"""
+        # A real call that succeeded recently proves connectivity without spending a probe
+        last_success_at = self.gemini_service.last_success_at
+        if last_success_at and time.monotonic() - last_success_at < self.interval_seconds:
+            self.gemini_connected = True
+        else:
+            self.gemini_connected = await self.gemini_service.test_connection()
+        
+        try:
+            self.store_ok = await self.conversation_store.ping()
+        except Exception as e:
+            logger.error(f"Conversation store health check failed: {e}")
+            self.store_ok = False
+        
+        self.checked_at = time.monotonic()
+    
+    @property
+    def age_seconds(self) -> Optional[float]:
+        if self.checked_at is None:
+            return None
+        return time.monotonic() - self.checked_at
+    
+    @property
+    def is_stale(self) -> bool:
+        age = self.age_seconds
+        return age is None or age > self.max_staleness_seconds
+    
+    @property
+    def is_ready(self) -> bool:
+        return bool(self.gemini_connected and self.store_ok and not self.is_stale)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Cached status, cheap enough to serve on every probe"""
+        age = self.age_seconds
+        resilience = self.gemini_service.resilience_stats()
+        gemini_api = self._status(self.gemini_connected, "connected", "disconnected")
+        if resilience["circuit_breaker"]["state"] != "closed":
+            # Reachable but failing real calls: requests are being shed
+            gemini_api = "degraded"
+        return {
+            "ready": self.is_ready,
+            "gemini_api": gemini_api,
+            "store": self._status(self.store_ok, "ok", "failing"),
+            "checked_seconds_ago": round(age, 3) if age is not None else None,
+            "stale": self.is_stale,
+            "event_loop_lag_seconds": round(self.event_loop_lag, 6),
+            "executor": self.gemini_service.executor_stats(),
+            "upstream": resilience,
+            "structured_output": self.gemini_service.structured_output_stats()
+        }
+    
+    @staticmethod
+    def _status(value: Optional[bool], ok: str, failed: str) -> str:
+        if value is None:
+            return "unknown"
+        return ok if value else failed
+    
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Health refresh failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+    
+    async def _lag_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(self.lag_probe_seconds)
+            # Anything beyond the requested sleep is time the loop was blocked
+            self.event_loop_lag = max(0.0, loop.time() - scheduled - self.lag_probe_seconds)
\ No newline at end of file
@@ -0,0 +1,55 @@
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+from app.utils import image_utils
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+class ImagePreprocessor:
+    """Downscales uploads in a process pool so image decoding never blocks the event loop"""
+    
+    def __init__(self, max_workers: int, max_dimension: int, output_format: str, quality: int):
+        self.max_workers = max_workers
+        self.max_dimension = max_dimension
+        self.output_format = output_format.upper()
+        self.quality = quality
+        # spawn rather than fork: the parent holds gRPC and executor threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    
+    @property
+    def cache_tag(self) -> str:
+        """Identifies preprocessing settings in cache keys"""
+        return f"{self.max_dimension}:{self.output_format}:{self.quality}"
+    
+    async def warm_up(self) -> None:
+        """Start worker processes ahead of traffic"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self._executor, image_utils.warm_up)
+            for _ in range(self.max_workers)
+        ])
+        logger.info("Image preprocessor warmed up")
+    
+    async def prepare(self, image_data: bytes) -> Tuple[bytes, str]:
+        """Return downscaled image bytes and their content type"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(
+                image_utils.downscale_image,
+                image_data,
+                max_dimension=self.max_dimension,
+                output_format=self.output_format,
+                quality=self.quality
+            )
+        )
+    
+    def close(self) -> None:
+        """Shut down worker processes"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file
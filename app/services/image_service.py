@@ -1,50 +1,64 @@
 from fastapi import UploadFile
 from app.services.gemini_service import GeminiService
+from app.services.image_preprocessor import ImagePreprocessor
+from app.services.single_flight import SingleFlight
 from app.models.responses import ImageAnalysisResponse
+from app.storage.response_cache import ResponseCache, make_cache_key, is_cacheable
+from app.core.config import settings
+from app.core.exceptions import AIServiceException, FileValidationException, RateLimitException
+from app.core.rate_limit import reserve_upstream_calls
+from app.core.metrics import stage_histogram
+from app.utils.file_utils import SpooledUpload, read_upload
 from app.core.logging import get_logger
+from app.core.tracing import traced
+from fastapi import HTTPException
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import time
 import json
 
 logger = get_logger(__name__)
 
 class ImageService:
-    def __init__(self):
-        self.gemini_service = GeminiService()
+    def __init__(
+        self,
+        gemini_service: GeminiService,
+        response_cache: Optional[ResponseCache] = None,
+        image_preprocessor: Optional[ImagePreprocessor] = None,
+        single_flight: Optional[SingleFlight] = None
+    ):
+        self.gemini_service = gemini_service
+        self.response_cache = response_cache
+        self.image_preprocessor = image_preprocessor
+        self.single_flight = single_flight or SingleFlight()
     
+    @traced()
     async def analyze_uploaded_image(self, file: UploadFile) -> ImageAnalysisResponse:
         """Process and analyze uploaded image (no file saving)"""
         start_time = time.time()
+        upload = None
         
         try:
-            # Validate file type
-            allowed_types = ["image/jpeg", "image/jpg", "image/png", "image/webp"]
-            if file.content_type not in allowed_types:
-                raise Exception("Invalid file type. Please upload JPEG, PNG, or WebP images.")
+            # Bounded chunked read, typed by magic bytes (no saving to disk)
+            upload = await read_upload(file)
             
-            # Validate file size (10MB max)
-            max_size = 10 * 1024 * 1024
-            if file.size and file.size > max_size:
-                raise Exception("File too large. Maximum size is 10MB.")
-            
-            # Read file content directly (no saving to disk)
-            await file.seek(0)
-            image_data = await file.read()
-            
-            # Analyze with Gemini Vision
-            analysis_result = await self.gemini_service.analyze_image_with_vision(
-                image_data, file.content_type
-            )
+            analysis_result, cached, sent_size = await self._analyze_upload(upload)
             
             processing_time = f"{time.time() - start_time:.2f}s"
             
             return ImageAnalysisResponse(
-                success=True,
+                success="error" not in analysis_result,
                 filename=file.filename or "unknown.jpg",
                 analysis=analysis_result,
                 processing_time=processing_time,
-                file_size=file.size
+                file_size=file.size,
+                cached=cached,
+                original_size=upload.size,
+                sent_size=sent_size
             )
-            
+        
+        except (AIServiceException, RateLimitException):
+            raise
         except Exception as e:
             logger.error(f"Image analysis failed: {e}")
             processing_time = f"{time.time() - start_time:.2f}s"
@@ -52,7 +66,190 @@ class ImageService:
             return ImageAnalysisResponse(
                 success=False,
                 filename=file.filename or "unknown.jpg",
-                analysis={"error": str(e)},
+                analysis={"error": e.detail if isinstance(e, FileValidationException) else str(e)},
                 processing_time=processing_time,
                 file_size=file.size
-            )
\ No newline at end of file
+            )
+        
+        finally:
+            if upload:
+                await upload.close()
+    
+    @traced()
+    async def analyze_uploaded_images(
+        self,
+        files: List[UploadFile],
+        max_concurrency: int,
+        pack_small: bool = False
+    ) -> List[ImageAnalysisResponse]:
+        """Analyze many uploads concurrently, optionally packing small images into shared prompts"""
+        start_time = time.time()
+        
+        # Reject the whole batch before spending any quota
+        if len(files) > settings.IMAGE_BATCH_MAX_FILES:
+            raise FileValidationException(
+                f"Too many files. Maximum per batch: {settings.IMAGE_BATCH_MAX_FILES}"
+            )
+        uploads: List[SpooledUpload] = []
+        try:
+            for file in files:
+                try:
+                    uploads.append(await read_upload(file))
+                except FileValidationException as e:
+                    raise FileValidationException(f"{file.filename or 'unknown'}: {e.detail}")
+            return await self._analyze_uploads(files, uploads, max_concurrency, pack_small, start_time)
+        finally:
+            for upload in uploads:
+                await upload.close()
+    
+    async def _analyze_uploads(
+        self,
+        files: List[UploadFile],
+        uploads: List[SpooledUpload],
+        max_concurrency: int,
+        pack_small: bool,
+        start_time: float
+    ) -> List[ImageAnalysisResponse]:
+        results: List[Optional[Tuple[Dict[str, Any], bool, int]]] = [None] * len(files)
+        cache_keys = [self._cache_key(upload) for upload in uploads]
+        if self.response_cache:
+            for index, cache_key in enumerate(cache_keys):
+                analysis_result = await self.response_cache.get(cache_key)
+                if analysis_result is not None:
+                    results[index] = (analysis_result, True, 0)
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def prepare(upload: SpooledUpload) -> Tuple[bytes, str]:
+            # Also bounds how many original images are read into memory at once
+            async with semaphore:
+                return await self._prepare(await upload.read_bytes(), upload.content_type)
+        
+        pending = [index for index, result in enumerate(results) if result is None]
+        prepared = await asyncio.gather(
+            *[prepare(uploads[index]) for index in pending],
+            return_exceptions=True
+        )
+        
+        ready: List[Tuple[int, bytes, str]] = []
+        for index, outcome in zip(pending, prepared):
+            if isinstance(outcome, Exception):
+                results[index] = ({"error": str(outcome)}, False, 0)
+            else:
+                ready.append((index, *outcome))
+        
+        async def analyze_one(index: int, image_data: bytes, content_type: str) -> None:
+            try:
+                async with semaphore:
+                    analysis_result, sent_size = await self.single_flight.do(
+                        cache_keys[index],
+                        lambda: self._analyze_prepared(cache_keys[index], image_data, content_type)
+                    )
+            except HTTPException as e:
+                results[index] = ({"error": e.detail}, False, 0)
+                return
+            results[index] = (analysis_result, False, sent_size)
+        
+        async def analyze_packed(group: List[Tuple[int, bytes, str]]) -> None:
+            try:
+                async with semaphore:
+                    packed = await self.gemini_service.analyze_images_with_vision(
+                        [(image_data, content_type) for _, image_data, content_type in group]
+                    )
+            except HTTPException as e:
+                for index, _, _ in group:
+                    results[index] = ({"error": e.detail}, False, 0)
+                return
+            if packed is None:
+                # Fall back to one request per image
+                await asyncio.gather(*[analyze_one(*item) for item in group])
+                return
+            for (index, image_data, _), analysis_result in zip(group, packed):
+                results[index] = (analysis_result, False, len(image_data))
+                if self.response_cache and is_cacheable(analysis_result):
+                    await self.response_cache.set(cache_keys[index], analysis_result)
+        
+        jobs = []
+        if pack_small:
+            small = [item for item in ready if len(item[1]) <= settings.IMAGE_PACK_MAX_BYTES]
+            ready = [item for item in ready if len(item[1]) > settings.IMAGE_PACK_MAX_BYTES]
+            group_size = settings.IMAGE_PACK_MAX_IMAGES
+            for offset in range(0, len(small), group_size):
+                group = small[offset:offset + group_size]
+                jobs.append(analyze_packed(group) if len(group) > 1 else analyze_one(*group[0]))
+        jobs.extend(analyze_one(*item) for item in ready)
+        # Each pack or single image is one upstream call; pay for all of them before making any,
+        # so a batch the quota cannot cover is rejected whole
+        try:
+            await reserve_upstream_calls(len(jobs))
+        except BaseException:
+            for job in jobs:
+                job.close()
+            raise
+        await asyncio.gather(*jobs)
+        
+        processing_time = f"{time.time() - start_time:.2f}s"
+        responses = []
+        for index, (file, upload) in enumerate(zip(files, uploads)):
+            analysis_result, cached, sent_size = results[index]
+            responses.append(ImageAnalysisResponse(
+                success="error" not in analysis_result,
+                filename=file.filename or "unknown.jpg",
+                analysis=analysis_result,
+                processing_time=processing_time,
+                file_size=file.size,
+                cached=cached,
+                original_size=upload.size,
+                sent_size=sent_size
+            ))
+        return responses
+    
+    def _cache_key(self, upload: SpooledUpload) -> str:
+        preprocessing = self.image_preprocessor.cache_tag if self.image_preprocessor else "raw"
+        return make_cache_key(
+            upload.digest, "image", upload.content_type, preprocessing, GeminiService.PROMPT_VERSION
+        )
+    
+    async def _prepare(self, image_data: bytes, content_type: str) -> Tuple[bytes, str]:
+        """Downscale for the vision model when preprocessing is enabled"""
+        with stage_histogram("image", "preprocessing").time():
+            if self.image_preprocessor:
+                return await self.image_preprocessor.prepare(image_data)
+            return image_data, content_type
+    
+    async def _analyze_upload(self, upload: SpooledUpload) -> Tuple[Dict[str, Any], bool, int]:
+        """Analyze an upload, returning (analysis, cached, bytes sent upstream)"""
+        cache_key = self._cache_key(upload)
+        if self.response_cache:
+            analysis_result = await self.response_cache.get(cache_key)
+            if analysis_result is not None:
+                return analysis_result, True, 0
+        
+        # Identical uploads arriving together share one preprocessing and upstream call. The shared
+        # task gets this caller's bytes, not its upload, which is closed when this request ends
+        image_data = await upload.read_bytes()
+        analysis_result, sent_size = await self.single_flight.do(
+            cache_key, lambda: self._analyze_uncached(cache_key, image_data, upload.content_type)
+        )
+        return analysis_result, False, sent_size
+    
+    async def _analyze_uncached(
+        self,
+        cache_key: str,
+        image_data: bytes,
+        content_type: str
+    ) -> Tuple[Dict[str, Any], int]:
+        image_data, content_type = await self._prepare(image_data, content_type)
+        return await self._analyze_prepared(cache_key, image_data, content_type)
+    
+    async def _analyze_prepared(
+        self,
+        cache_key: str,
+        image_data: bytes,
+        content_type: str
+    ) -> Tuple[Dict[str, Any], int]:
+        """Analyze with Gemini Vision and cache the result, returning (analysis, bytes sent upstream)"""
+        analysis_result = await self.gemini_service.analyze_image_with_vision(image_data, content_type)
+        if self.response_cache and is_cacheable(analysis_result):
+            await self.response_cache.set(cache_key, analysis_result)
+        return analysis_result, len(image_data)
\ No newline at end of file
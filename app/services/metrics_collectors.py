@@ -0,0 +1,74 @@
+from typing import Iterable, List, Optional
+from app.core.metrics import Sample, metrics
+from app.services.gemini_service import GeminiService
+from app.services.single_flight import SingleFlight
+from app.storage.base import AsyncConversationStore
+from app.storage.response_cache import ResponseCache
+
+# Store stats that only ever grow are exported as counters, the rest as gauges
+_STORE_COUNTER_PREFIXES = ("evicted", "trimmed")
+
+def _counter(name: str, description: str, value: float, **labels: str) -> Sample:
+    return Sample(name, "counter", description, labels, value)
+
+def _gauge(name: str, description: str, value: float, **labels: str) -> Sample:
+    return Sample(name, "gauge", description, labels, value)
+
+def register_collectors(
+    gemini_service: GeminiService,
+    conversation_store: AsyncConversationStore,
+    response_cache: Optional[ResponseCache],
+    single_flight: SingleFlight
+) -> None:
+    """Expose state the shared services already track on /metrics, read at scrape time"""
+    
+    def upstream() -> Iterable[Sample]:
+        executor = gemini_service.executor_stats()
+        breaker = gemini_service.circuit_breaker
+        return [
+            _gauge("gemini_calls_in_flight", "Upstream calls running on the executor", executor["in_flight"]),
+            _gauge("gemini_calls_queued", "Upstream calls waiting for an executor thread", executor["queued"]),
+            _counter("gemini_retries_total", "Upstream calls retried", gemini_service.retries),
+            _gauge("gemini_circuit_open", "1 unless the circuit breaker is closed", int(breaker.state != breaker.CLOSED)),
+            _counter("gemini_hedges_total", "Hedged chat requests sent", gemini_service.hedges_sent),
+        ]
+    
+    def coalescing() -> Iterable[Sample]:
+        stats = single_flight.stats()
+        return [
+            _counter("single_flight_calls_total", "Upstream calls started", stats["calls"]),
+            _counter("single_flight_coalesced_total", "Callers served by an in-flight call", stats["coalesced"]),
+            _gauge("single_flight_in_flight", "Distinct calls in flight", stats["in_flight"]),
+        ]
+    
+    def cache() -> Iterable[Sample]:
+        stats = response_cache.stats()
+        return [
+            _counter("response_cache_hits_total", "Analysis cache hits", stats["memory_hits"], tier="memory"),
+            _counter("response_cache_hits_total", "Analysis cache hits", stats["disk_hits"], tier="disk"),
+            _counter("response_cache_misses_total", "Analysis cache misses", stats["misses"]),
+            _counter("response_cache_evictions_total", "Entries evicted for space", stats["evictions"]),
+            _gauge("response_cache_entries", "Entries held in memory", stats["entries"]),
+            _gauge("response_cache_bytes", "Bytes held in memory", stats["bytes"]),
+            _gauge("response_cache_disk_bytes", "Bytes held on disk", stats["disk_bytes"]),
+            _counter("response_cache_disk_removed_total", "Disk entries removed", stats["disk_expired"], reason="ttl"),
+            _counter("response_cache_disk_removed_total", "Disk entries removed", stats["disk_evictions"], reason="size"),
+        ]
+    
+    def store() -> Iterable[Sample]:
+        samples: List[Sample] = []
+        # Backends may need I/O for stats, so /metrics fetches them before rendering
+        for key, value in conversation_store.last_stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key.startswith(_STORE_COUNTER_PREFIXES):
+                samples.append(_counter(f"conversation_store_{key}_total", "Conversation store counter", value))
+            else:
+                samples.append(_gauge(f"conversation_store_{key}", "Conversation store gauge", value))
+        return samples
+    
+    metrics.register_collector(upstream)
+    metrics.register_collector(coalescing)
+    if response_cache is not None:
+        metrics.register_collector(cache)
+    metrics.register_collector(store)
@@ -0,0 +1,143 @@
+import asyncio
+import random
+import time
+from typing import Any, Dict, Optional
+from google.api_core import exceptions as google_exceptions
+
+# Upstream errors worth another attempt: throttling, transient server faults and timeouts
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.BadGateway,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.Aborted,
+    asyncio.TimeoutError,
+)
+
+def is_retryable(error: BaseException) -> bool:
+    return isinstance(error, RETRYABLE_ERRORS)
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Server-requested delay from a RetryInfo detail or a Retry-After header, if any"""
+    for detail in getattr(error, "details", None) or ():
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            return retry_delay.seconds + retry_delay.nanos / 1e9
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers and headers.get("retry-after"):
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            return None
+    return None
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by the operation's deadline"""
+    
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def delay(self, attempt: int, error: BaseException) -> float:
+        """Wait before retry number `attempt` (1-based)"""
+        requested = retry_after_seconds(error)
+        if requested is not None:
+            return requested
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated upstream failures.
+    
+    closed: calls flow. After `failure_threshold` consecutive failures the
+    breaker opens and rejects calls for `reset_timeout_seconds`; it then goes
+    half-open and lets a single probe through, closing again if it succeeds.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int, reset_timeout_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self.times_opened = 0
+        self._probe_in_flight = False
+    
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout_seconds:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                return False
+            self._probe_in_flight = True
+        return True
+    
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+    
+    def release(self) -> None:
+        """Give up a half-open probe slot without an upstream verdict"""
+        self._probe_in_flight = False
+    
+    def retry_in(self) -> float:
+        """Seconds until an open breaker lets a probe through"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout_seconds - (time.monotonic() - self.opened_at))
+    
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_in_seconds": round(self.retry_in(), 3)
+        }
+
+class HedgeBudget:
+    """
+    Caps hedged requests to a fraction of primary calls.
+    
+    Every primary call earns `ratio` of a token, up to `burst`; a hedge spends
+    one. Over time hedges cannot exceed `ratio` of traffic, however slow the
+    upstream gets.
+    """
+    
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+    
+    def earn(self) -> None:
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+    
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
@@ -0,0 +1,31 @@
+import asyncio
+from app.storage.base import AsyncConversationStore
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+class StoreSweeper:
+    """Periodically enforces the conversation store's retention limits"""
+    
+    def __init__(self, conversation_store: AsyncConversationStore, interval_seconds: float):
+        self.conversation_store = conversation_store
+        self.interval_seconds = interval_seconds
+        self._task = None
+    
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._sweep_loop())
+    
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+    
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                evicted = await self.conversation_store.sweep()
+                if evicted:
+                    logger.info(f"Store sweep evicted {evicted} conversations")
+            except Exception as e:
+                logger.error(f"Store sweep failed: {e}")
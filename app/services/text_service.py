@@ -1,38 +1,350 @@
 from app.services.gemini_service import GeminiService
-from app.models.requests import TextAnalysisRequest, AnalysisType
-from app.models.responses import TextAnalysisResponse
+from app.services.single_flight import SingleFlight
+from app.models.requests import TextAnalysisRequest, LongTextAnalysisRequest, AnalysisType
+from app.models.responses import TextAnalysisResponse, LongTextAnalysisResponse, BatchTextAnalysisItemResult
+from app.storage.response_cache import ResponseCache, make_cache_key, normalize_text, is_cacheable
+from app.utils.chunking import iter_chunks
 from app.utils.validators import validate_text_length
+from app.core.config import settings
+from app.core.exceptions import AIServiceException
+from app.core.rate_limit import reserve_upstream_calls
 from app.core.logging import get_logger
+from app.core.tracing import traced
+from fastapi import HTTPException
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
 import time
 
 logger = get_logger(__name__)
 
 class TextService:
-    def __init__(self):
-        self.gemini_service = GeminiService()
+    def __init__(
+        self,
+        gemini_service: GeminiService,
+        response_cache: Optional[ResponseCache] = None,
+        single_flight: Optional[SingleFlight] = None
+    ):
+        self.gemini_service = gemini_service
+        self.response_cache = response_cache
+        self.single_flight = single_flight or SingleFlight()
     
+    @traced()
     async def analyze_text(self, request: TextAnalysisRequest) -> TextAnalysisResponse:
-        """Analyze text based on analysis type"""
+        """Analyze text based on analysis type, or several types at once"""
         start_time = time.time()
         
         # Validate input
         validate_text_length(request.text)
         
-        # Perform analysis based on type
-        if request.analysis_type == AnalysisType.SENTIMENT:
-            analysis_result = await self.gemini_service.analyze_text_sentiment(request.text)
-        elif request.analysis_type == AnalysisType.SUMMARY:
-            analysis_result = await self.gemini_service.summarize_text(request.text)
-        else:  # COMPREHENSIVE
-            analysis_result = await self.gemini_service.comprehensive_text_analysis(request.text)
+        analysis_types = request.requested_types()
+        results, cached = await self._analyze(request.text, analysis_types)
         
         processing_time = f"{time.time() - start_time:.2f}s"
         
+        if request.analysis_types is None:
+            analysis_type, analysis, types = analysis_types[0].value, results[analysis_types[0].value], None
+        else:
+            analysis_type, analysis, types = "multi", results, [t.value for t in analysis_types]
+        
         return TextAnalysisResponse(
             success=True,
-            analysis_type=request.analysis_type.value,
-            analysis=analysis_result,
+            analysis_type=analysis_type,
+            analysis=analysis,
+            analysis_types=types,
             word_count=len(request.text.split()),
             character_count=len(request.text),
-            processing_time=processing_time
-        )
\ No newline at end of file
+            processing_time=processing_time,
+            cached=cached
+        )
+    
+    @traced()
+    async def analyze_long_text(self, request: LongTextAnalysisRequest) -> LongTextAnalysisResponse:
+        """
+        Analyze a document of any length by map-reduce.
+        
+        Chunks from the sentence-aware chunker are analyzed concurrently, each
+        cached by its own content, so an edited document only re-analyzes the
+        chunks that changed. Sentiment and entities are merged locally; one
+        final call summarizes the chunk summaries.
+        """
+        start_time = time.time()
+        validate_text_length(request.text, settings.LONG_TEXT_MAX_CHARS)
+        
+        chunks = list(iter_chunks(request.text, settings.LONG_TEXT_CHUNK_CHARS))
+        cache_keys = [self._chunk_cache_key(chunk) for chunk in chunks]
+        chunk_results: List[Optional[Tuple[str, Dict[str, Any], bool]]] = [None] * len(chunks)
+        if self.response_cache:
+            for index, cache_key in enumerate(cache_keys):
+                cached_result = await self.response_cache.get(cache_key)
+                if cached_result is not None:
+                    chunk_results[index] = (cache_key, cached_result, True)
+        
+        # Every uncached chunk and the reduce step is an upstream call; pay for all of them before
+        # making any, so a document the quota cannot cover is rejected whole
+        pending = [index for index, result in enumerate(chunk_results) if result is None]
+        await reserve_upstream_calls(len(pending) + (1 if len(chunks) > 1 else 0))
+        
+        semaphore = asyncio.Semaphore(settings.LONG_TEXT_MAX_CONCURRENCY)
+        
+        async def analyze(index: int) -> None:
+            async with semaphore:
+                result = await self._analyze_chunk(chunks[index], cache_keys[index])
+            chunk_results[index] = (cache_keys[index], result, False)
+        
+        tasks = [asyncio.ensure_future(analyze(index)) for index in pending]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # One failed chunk fails the document; stop the rest
+            for task in tasks:
+                task.cancel()
+        
+        # (cache key, analysis, weight) of chunks that produced a usable analysis
+        usable = [
+            (cache_key, result, len(chunk))
+            for chunk, (cache_key, result, _) in zip(chunks, chunk_results)
+            if self._is_usable_chunk(result)
+        ]
+        if not usable:
+            raise AIServiceException("Text analysis failed: no part of the document could be analyzed")
+        
+        document, document_cached = await self._summarize_document(usable)
+        analysis = {
+            **document,
+            "sentiment": self._merge_sentiment(usable),
+            "entities": self._merge_entities(usable)
+        }
+        chunks_cached = sum(1 for _, _, cached in chunk_results if cached)
+        
+        return LongTextAnalysisResponse(
+            success=True,
+            analysis=analysis,
+            chunk_count=len(chunk_results),
+            chunks_cached=chunks_cached,
+            chunks_failed=len(chunk_results) - len(usable),
+            word_count=len(request.text.split()),
+            character_count=len(request.text),
+            processing_time=f"{time.time() - start_time:.2f}s",
+            cached=document_cached and chunks_cached == len(chunk_results)
+        )
+    
+    async def analyze_batch(
+        self,
+        requests: List[TextAnalysisRequest],
+        max_concurrency: int
+    ) -> AsyncIterator[BatchTextAnalysisItemResult]:
+        """
+        Pay for a batch and return its per-item results, yielded in completion order.
+        
+        Every distinct uncached item is an upstream call, paid for before any
+        is made, so a batch the quota cannot cover is rejected whole instead
+        of failing item by item.
+        """
+        # Identical (text, analysis types) items are analyzed once and fanned back out
+        groups: Dict[Tuple[str, bool], List[int]] = {}
+        for index, request in enumerate(requests):
+            # Single and multi requests for the same type differ in response shape
+            group = (self._cache_key(request.text, request.requested_types()), request.analysis_types is None)
+            groups.setdefault(group, []).append(index)
+        
+        uncached = 0
+        for indices in groups.values():
+            request = requests[indices[0]]
+            if not await self._is_cached(request.text, request.requested_types()):
+                uncached += 1
+        await reserve_upstream_calls(uncached)
+        return self._run_batch(requests, list(groups.values()), max_concurrency)
+    
+    async def _run_batch(
+        self,
+        requests: List[TextAnalysisRequest],
+        groups: List[List[int]],
+        max_concurrency: int
+    ) -> AsyncIterator[BatchTextAnalysisItemResult]:
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run(indices: List[int]):
+            async with semaphore:
+                try:
+                    return indices, await self.analyze_text(requests[indices[0]]), None
+                except HTTPException as e:
+                    return indices, None, e.detail
+                except Exception as e:
+                    return indices, None, str(e)
+        
+        tasks = [asyncio.ensure_future(run(indices)) for indices in groups]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indices, result, error = await next_done
+                for index in indices:
+                    yield BatchTextAnalysisItemResult(
+                        index=index,
+                        success=error is None,
+                        result=result,
+                        error=error
+                    )
+        finally:
+            # Client disconnects stop any remaining work
+            for task in tasks:
+                task.cancel()
+    
+    def _cache_key(self, text: str, analysis_types: List[AnalysisType]) -> str:
+        # A single type keys its own cache entry; several types only key a shared in-flight call
+        return make_cache_key(
+            normalize_text(text).encode("utf-8"),
+            "text",
+            "+".join(analysis_type.value for analysis_type in analysis_types),
+            GeminiService.PROMPT_VERSION
+        )
+    
+    async def _is_cached(self, text: str, analysis_types: List[AnalysisType]) -> bool:
+        if not self.response_cache:
+            return False
+        for analysis_type in analysis_types:
+            if await self.response_cache.get(self._cache_key(text, [analysis_type])) is None:
+                return False
+        return True
+    
+    async def _analyze(
+        self,
+        text: str,
+        analysis_types: List[AnalysisType]
+    ) -> Tuple[Dict[str, Dict[str, Any]], bool]:
+        """Results keyed by type, each served from cache when possible, and whether all were"""
+        results: Dict[str, Dict[str, Any]] = {}
+        if self.response_cache:
+            for analysis_type in analysis_types:
+                cached_result = await self.response_cache.get(self._cache_key(text, [analysis_type]))
+                if cached_result is not None:
+                    results[analysis_type.value] = cached_result
+        
+        missing = [analysis_type for analysis_type in analysis_types if analysis_type.value not in results]
+        if missing:
+            # Identical requests arriving together share one upstream call
+            results.update(await self.single_flight.do(
+                self._cache_key(text, missing), lambda: self._analyze_uncached(text, missing)
+            ))
+        return {analysis_type.value: results[analysis_type.value] for analysis_type in analysis_types}, not missing
+    
+    async def _analyze_uncached(
+        self,
+        text: str,
+        analysis_types: List[AnalysisType]
+    ) -> Dict[str, Dict[str, Any]]:
+        if len(analysis_types) == 1:
+            results = {analysis_types[0].value: await self._run_analysis(text, analysis_types[0])}
+        else:
+            results = await self.gemini_service.multi_text_analysis(
+                text, [analysis_type.value for analysis_type in analysis_types]
+            )
+            # Sections the combined reply did not deliver are fetched one by one
+            leftover = [analysis_type for analysis_type in analysis_types if analysis_type.value not in results]
+            if leftover:
+                logger.warning(f"Combined analysis missed {[t.value for t in leftover]}, analyzing separately")
+                filled = await asyncio.gather(*[self._run_analysis(text, t) for t in leftover])
+                results.update(zip([t.value for t in leftover], filled))
+        
+        # Sections are cached individually, so later single-type requests reuse them
+        if self.response_cache:
+            for analysis_type in analysis_types:
+                result = results[analysis_type.value]
+                if is_cacheable(result):
+                    await self.response_cache.set(self._cache_key(text, [analysis_type]), result)
+        return results
+    
+    @staticmethod
+    def _chunk_cache_key(chunk: str) -> str:
+        return make_cache_key(normalize_text(chunk).encode("utf-8"), "text", "chunk", GeminiService.PROMPT_VERSION)
+    
+    @staticmethod
+    def _is_usable_chunk(result: Dict[str, Any]) -> bool:
+        """A chunk analysis worth merging: cacheable, with a sentiment label the vote can count"""
+        return is_cacheable(result) and isinstance(result.get("sentiment"), str)
+    
+    async def _analyze_chunk(self, chunk: str, cache_key: str) -> Dict[str, Any]:
+        """Map step for one uncached chunk"""
+        async def analyze() -> Dict[str, Any]:
+            result = await self.gemini_service.analyze_text_chunk(chunk)
+            if self.response_cache and is_cacheable(result):
+                await self.response_cache.set(cache_key, result)
+            return result
+        
+        # Documents sharing boilerplate sections share the chunk's upstream call
+        return await self.single_flight.do(cache_key, analyze)
+    
+    async def _summarize_document(
+        self,
+        chunks: List[Tuple[str, Dict[str, Any], int]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Reduce step: document summary from the chunk analyses, and whether it was cached"""
+        if len(chunks) == 1:
+            _, result, _ = chunks[0]
+            return {
+                "summary": result.get("summary", ""),
+                "key_points": result.get("key_points", []),
+                "themes": []
+            }, True
+        
+        # Keyed by the chunk keys, so it is reused exactly when every chunk is unchanged
+        cache_key = make_cache_key(
+            "\n".join(key for key, _, _ in chunks).encode("utf-8"), "text", "document", GeminiService.PROMPT_VERSION
+        )
+        if self.response_cache:
+            cached_result = await self.response_cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result, True
+        
+        async def summarize() -> Dict[str, Any]:
+            result = await self.gemini_service.summarize_chunk_analyses([result for _, result, _ in chunks])
+            if self.response_cache and is_cacheable(result):
+                await self.response_cache.set(cache_key, result)
+            return result
+        
+        return await self.single_flight.do(cache_key, summarize), False
+    
+    @staticmethod
+    def _merge_sentiment(chunks: List[Tuple[str, Dict[str, Any], int]]) -> Dict[str, Any]:
+        """Document sentiment as a vote of the chunks, weighted by length and confidence"""
+        scores = {"positive": 0.0, "negative": 0.0, "neutral": 0.0}
+        for _, result, weight in chunks:
+            label = result.get("sentiment")
+            confidence = result.get("sentiment_confidence")
+            if not isinstance(confidence, (int, float)) or confidence <= 0:
+                confidence = 0.5  # Unparsed or missing confidence counts as a coin flip
+            if isinstance(label, str) and label in scores:
+                scores[label] += weight * confidence
+        
+        total = sum(scores.values())
+        if not total:
+            return {"overall": "neutral", "confidence": 0.0, "distribution": scores}
+        overall = max(scores, key=scores.get)
+        return {
+            "overall": overall,
+            "confidence": round(scores[overall] / total, 4),
+            "distribution": {label: round(score / total, 4) for label, score in scores.items()}
+        }
+    
+    @staticmethod
+    def _merge_entities(chunks: List[Tuple[str, Dict[str, Any], int]]) -> List[str]:
+        """Entities ranked by how many chunks mention them, first spelling kept"""
+        counts: Dict[str, int] = {}
+        names: Dict[str, str] = {}
+        for _, result, _ in chunks:
+            seen = set()
+            for entity in result.get("entities") or []:
+                key = str(entity).strip().casefold()
+                if key and key not in seen:
+                    seen.add(key)
+                    names.setdefault(key, str(entity).strip())
+                    counts[key] = counts.get(key, 0) + 1
+        ranked = sorted(counts, key=counts.get, reverse=True)  # Stable: ties keep first-seen order
+        return [names[key] for key in ranked[:settings.LONG_TEXT_MAX_ENTITIES]]
+    
+    async def _run_analysis(self, text: str, analysis_type: AnalysisType) -> Dict[str, Any]:
+        """Perform analysis based on type"""
+        if analysis_type == AnalysisType.SENTIMENT:
+            return await self.gemini_service.analyze_text_sentiment(text)
+        elif analysis_type == AnalysisType.SUMMARY:
+            return await self.gemini_service.summarize_text(text)
+        else:  # COMPREHENSIVE
+            return await self.gemini_service.comprehensive_text_analysis(text)
\ No newline at end of file
@@ -0,0 +1,47 @@
+import asyncio
+import requests
+from app.core.tracing import TraceBuffer
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+class TraceExporter:
+    """Periodically posts finished traces to a Zipkin v2 compatible collector"""
+    
+    def __init__(self, trace_buffer: TraceBuffer, url: str, service_name: str, interval_seconds: float):
+        self.trace_buffer = trace_buffer
+        self.url = url
+        self.service_name = service_name
+        self.interval_seconds = interval_seconds
+        self.exported = 0
+        self.failed = 0
+        self._task = None
+    
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._export_loop())
+    
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        # Flush what finished since the last export
+        await self.export()
+    
+    async def export(self) -> None:
+        traces = self.trace_buffer.drain_export()
+        if not traces:
+            return
+        spans = [span for trace in traces for span in trace.to_zipkin(self.service_name)]
+        try:
+            # The collector is an optional side channel; a blocking post must not stall the loop
+            response = await asyncio.to_thread(requests.post, self.url, json=spans, timeout=5)
+            response.raise_for_status()
+            self.exported += len(traces)
+        except Exception as e:
+            self.failed += len(traces)
+            logger.warning(f"Trace export of {len(traces)} traces failed: {e}")
+    
+    async def _export_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self.export()
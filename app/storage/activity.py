@@ -0,0 +1,67 @@
+import time
+from typing import Dict, Optional
+
+class ActivityWindows:
+    """
+    Counts distinct conversations by the time bucket of their last activity.
+    
+    Each conversation is counted in exactly one bucket, so "active in the last
+    N minutes" is a sum over N buckets regardless of how many conversations exist.
+    Buckets older than the horizon collapse into a single overflow count.
+    """
+    
+    def __init__(self, bucket_seconds: int = 60, horizon_buckets: int = 1440):
+        self.bucket_seconds = bucket_seconds
+        self.horizon_buckets = horizon_buckets
+        self._buckets: Dict[int, int] = {}
+        self._last_bucket: Dict[str, int] = {}
+        self._floor = 0  # Oldest bucket still tracked individually
+        self._overflow = 0
+    
+    def touch(self, conversation_id: str, now: Optional[float] = None) -> None:
+        """Record activity for a conversation, at `now` if it happened earlier"""
+        bucket = self._bucket(now)
+        previous = self._last_bucket.get(conversation_id)
+        if previous == bucket:
+            return
+        if previous is not None:
+            self._decrement(previous)
+        if bucket < self._floor:
+            self._overflow += 1
+        else:
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self._last_bucket[conversation_id] = bucket
+        self._collapse(bucket)
+    
+    def remove(self, conversation_id: str) -> None:
+        """Forget a deleted conversation"""
+        previous = self._last_bucket.pop(conversation_id, None)
+        if previous is not None:
+            self._decrement(previous)
+    
+    def count_active(self, window_seconds: int, now: Optional[float] = None) -> int:
+        """Conversations with activity in the last `window_seconds` (bucket granularity)"""
+        current = self._bucket(now)
+        buckets = max(1, min(self.horizon_buckets, window_seconds // self.bucket_seconds))
+        return sum(self._buckets.get(bucket, 0) for bucket in range(current - buckets + 1, current + 1))
+    
+    def _bucket(self, now: Optional[float]) -> int:
+        return int((now if now is not None else time.time()) // self.bucket_seconds)
+    
+    def _decrement(self, bucket: int) -> None:
+        if bucket < self._floor:
+            self._overflow -= 1
+            return
+        remaining = self._buckets[bucket] - 1
+        if remaining:
+            self._buckets[bucket] = remaining
+        else:
+            del self._buckets[bucket]
+    
+    def _collapse(self, current: int) -> None:
+        floor = current - self.horizon_buckets + 1
+        if floor <= self._floor:
+            return
+        for bucket in [b for b in self._buckets if b < floor]:
+            self._overflow += self._buckets.pop(bucket)
+        self._floor = floor
\ No newline at end of file
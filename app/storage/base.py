@@ -0,0 +1,190 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, List, Tuple
+from app.models.chat import ChatMessage, Conversation, ConversationSummary
+from app.storage.records import ConversationRecord
+from app.core.tracing import traced
+import asyncio
+import base64
+import binascii
+import contextvars
+import functools
+import json
+
+PREVIEW_LENGTH = 50
+# Activity windows reported by get_stats; "active_conversations" is the hourly one
+ACTIVITY_WINDOWS = {"active_last_5m": 300, "active_last_1h": 3600, "active_last_24h": 86400}
+ACTIVE_WINDOW = "active_last_1h"
+# Store operations that show up as spans in request traces, for every backend
+TRACED_METHODS = (
+    "create_conversation", "get_conversation", "get_record", "add_message", "save_conversation", "update_summary",
+    "list_conversations_page", "delete_conversation", "get_stats"
+)
+
+def build_preview(first_message: str) -> str:
+    """Shorten the first user message for conversation listings"""
+    if len(first_message) > PREVIEW_LENGTH:
+        return first_message[:PREVIEW_LENGTH] + "..."
+    return first_message
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """Opaque pagination cursor for a backend-specific position"""
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode()
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Reverse encode_cursor, raising ValueError for malformed cursors"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    return position
+
+class BaseConversationStore(ABC):
+    """Interface implemented by every conversation storage backend"""
+    
+    # Threads AsyncConversationStore runs calls on; 0 for backends that never block on I/O
+    io_workers = 0
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Wrap each backend's own implementations, so no backend can forget to
+        for name in TRACED_METHODS:
+            if name in cls.__dict__:
+                setattr(cls, name, traced()(cls.__dict__[name]))
+    
+    @abstractmethod
+    def create_conversation(self, conversation_id: str) -> Conversation:
+        """Create a new conversation"""
+    
+    @abstractmethod
+    def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """Get conversation by ID"""
+    
+    def get_record(self, conversation_id: str) -> Optional[ConversationRecord]:
+        """
+        Get a conversation in stored form, for services that only read its history.
+        
+        The record is a snapshot the caller may extend; backends that keep records
+        override this to skip building the pydantic models.
+        """
+        conversation = self.get_conversation(conversation_id)
+        return ConversationRecord.from_conversation(conversation) if conversation else None
+    
+    @abstractmethod
+    def add_message(self, conversation_id: str, message: ChatMessage) -> None:
+        """Add message to conversation, creating it if needed"""
+    
+    @abstractmethod
+    def save_conversation(self, conversation: Conversation) -> None:
+        """Insert or replace a whole conversation, e.g. when spilling it from another store"""
+    
+    @abstractmethod
+    def update_summary(self, conversation_id: str, summary: str, message_count: int) -> None:
+        """Store the rolling summary covering the first `message_count` messages"""
+    
+    @abstractmethod
+    def list_conversations_page(
+        self,
+        limit: Optional[int],
+        cursor: Optional[str] = None
+    ) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """
+        List conversations ordered by most recent activity, starting after `cursor`.
+        
+        Returns up to `limit` summaries (all when None) and the cursor for the
+        next page, or None when there are no more.
+        """
+    
+    def list_conversations(self) -> List[ConversationSummary]:
+        """List all conversations ordered by most recent activity"""
+        summaries, _ = self.list_conversations_page(limit=None)
+        return summaries
+    
+    @abstractmethod
+    def delete_conversation(self, conversation_id: str) -> bool:
+        """Delete conversation, returning False if it did not exist"""
+    
+    @abstractmethod
+    def get_stats(self) -> Dict[str, int]:
+        """Get storage statistics"""
+    
+    def sweep(self) -> int:
+        """Enforce retention limits, returning how many conversations were evicted"""
+        return 0
+    
+    def ping(self) -> bool:
+        """Cheap liveness check of the backend"""
+        return True
+    
+    def close(self) -> None:
+        """Release backend resources"""
+
+class AsyncConversationStore:
+    """
+    Awaitable front for a conversation store backend, used from request handlers.
+    
+    Backends that block on disk or network I/O declare `io_workers` and are called
+    on a dedicated pool of that many threads, so a slow query or a lock held by
+    another worker stalls only the request that waits for it. Others are called
+    inline, as a thread hop would cost more than the call.
+    """
+    
+    def __init__(self, store: BaseConversationStore):
+        self.store = store
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if store.io_workers:
+            self._executor = ThreadPoolExecutor(max_workers=store.io_workers, thread_name_prefix="store")
+        # Most recent get_stats result, for readers that cannot await (metrics collectors)
+        self.last_stats: Dict[str, int] = {}
+    
+    async def create_conversation(self, conversation_id: str) -> Conversation:
+        return await self._call(self.store.create_conversation, conversation_id)
+    
+    async def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        return await self._call(self.store.get_conversation, conversation_id)
+    
+    async def get_record(self, conversation_id: str) -> Optional[ConversationRecord]:
+        return await self._call(self.store.get_record, conversation_id)
+    
+    async def add_message(self, conversation_id: str, message: ChatMessage) -> None:
+        await self._call(self.store.add_message, conversation_id, message)
+    
+    async def save_conversation(self, conversation: Conversation) -> None:
+        await self._call(self.store.save_conversation, conversation)
+    
+    async def update_summary(self, conversation_id: str, summary: str, message_count: int) -> None:
+        await self._call(self.store.update_summary, conversation_id, summary, message_count)
+    
+    async def list_conversations_page(
+        self,
+        limit: Optional[int],
+        cursor: Optional[str] = None
+    ) -> Tuple[List[ConversationSummary], Optional[str]]:
+        return await self._call(self.store.list_conversations_page, limit, cursor)
+    
+    async def delete_conversation(self, conversation_id: str) -> bool:
+        return await self._call(self.store.delete_conversation, conversation_id)
+    
+    async def get_stats(self) -> Dict[str, int]:
+        self.last_stats = await self._call(self.store.get_stats)
+        return self.last_stats
+    
+    async def sweep(self) -> int:
+        return await self._call(self.store.sweep)
+    
+    async def ping(self) -> bool:
+        return await self._call(self.store.ping)
+    
+    def close(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=True)
+        self.store.close()
+    
+    async def _call(self, method: Callable, *args: Any) -> Any:
+        if self._executor is None:
+            return method(*args)
+        # Run in a copy of the caller's context so store spans join the request's trace
+        call = functools.partial(contextvars.copy_context().run, method, *args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
@@ -0,0 +1,68 @@
+from pathlib import Path
+from typing import Optional
+from app.core.config import settings
+from app.core.rate_limit import RateLimiter, InMemoryRateLimitBackend, RedisRateLimitBackend, build_limits
+from app.storage.base import BaseConversationStore
+from app.storage.memory_store import ConversationStore
+from app.storage.redis_store import RedisConversationStore
+from app.storage.response_cache import ResponseCache
+from app.storage.sqlite_store import SQLiteConversationStore
+
+def create_conversation_store() -> BaseConversationStore:
+    """Build the conversation store selected by CONVERSATION_STORE_BACKEND"""
+    backend = settings.CONVERSATION_STORE_BACKEND.lower()
+    if backend == "memory":
+        spill_store = None
+        if settings.CONVERSATION_SPILL_ENABLED:
+            spill_store = SQLiteConversationStore(settings.CONVERSATION_DB_PATH)
+        return ConversationStore(
+            max_conversations=settings.CONVERSATION_MAX_COUNT,
+            max_messages=settings.CONVERSATION_MAX_MESSAGES,
+            max_bytes=settings.CONVERSATION_MAX_BYTES,
+            idle_ttl_seconds=settings.CONVERSATION_IDLE_TTL_SECONDS,
+            spill_store=spill_store,
+            compress_min_bytes=settings.CONVERSATION_COMPRESS_MIN_BYTES
+        )
+    if backend == "sqlite":
+        return SQLiteConversationStore(settings.CONVERSATION_DB_PATH)
+    if backend == "redis":
+        return RedisConversationStore.from_url(
+            settings.REDIS_URL, settings.REDIS_MAX_CONNECTIONS, prefix=settings.REDIS_KEY_PREFIX
+        )
+    raise ValueError(f"Unknown conversation store backend: {settings.CONVERSATION_STORE_BACKEND}")
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Build the analysis response cache, or None when caching is disabled"""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    disk_dir = None
+    if settings.RESPONSE_CACHE_DISK_ENABLED:
+        disk_dir = str(Path(settings.UPLOAD_DIR) / "cache")
+    return ResponseCache(
+        max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+        ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+        disk_dir=disk_dir,
+        disk_max_bytes=settings.RESPONSE_CACHE_DISK_MAX_BYTES,
+        disk_sweep_interval_seconds=settings.RESPONSE_CACHE_DISK_SWEEP_INTERVAL_SECONDS
+    )
+
+def create_rate_limiter() -> Optional[RateLimiter]:
+    """Build the admission-control limiter, or None when rate limiting is disabled"""
+    if not settings.RATE_LIMIT_ENABLED:
+        return None
+    limits = build_limits(
+        settings.REQUESTS_PER_MINUTE,
+        settings.REQUESTS_PER_DAY,
+        settings.RATE_LIMIT_CLIENT_PER_MINUTE
+    )
+    backend = settings.RATE_LIMIT_BACKEND.lower()
+    if backend == "memory":
+        rate_limit_backend = InMemoryRateLimitBackend()
+    elif backend == "redis":
+        rate_limit_backend = RedisRateLimitBackend.from_url(
+            settings.REDIS_URL, settings.REDIS_MAX_CONNECTIONS, prefix=settings.REDIS_KEY_PREFIX
+        )
+    else:
+        raise ValueError(f"Unknown rate limit backend: {settings.RATE_LIMIT_BACKEND}")
+    return RateLimiter(rate_limit_backend, limits, settings.RATE_LIMIT_MAX_WAIT_SECONDS)
\ No newline at end of file
@@ -1,81 +1,391 @@
-from typing import Dict, Optional, List
+import bisect
+import itertools
+import time
+from typing import Dict, Optional, List, Tuple
 from app.models.chat import ChatMessage, Conversation, ConversationSummary
-from app.utils.time_utils import get_current_timestamp
+from app.utils.time_utils import get_current_micros, micros_to_timestamp
+from app.storage.base import (
+    ACTIVE_WINDOW, ACTIVITY_WINDOWS, BaseConversationStore, build_preview, encode_cursor, decode_cursor
+)
+from app.storage.activity import ActivityWindows
+from app.storage.records import ConversationRecord, MessageRecord
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
-class ConversationStore:
-    """In-memory storage for conversations (use Redis/DB in production)"""
+# Rough per-conversation overhead of the record, index entries and bookkeeping dicts
+CONVERSATION_OVERHEAD_BYTES = 640
+
+class ConversationStore(BaseConversationStore):
+    """
+    In-memory storage for conversations, shared by all requests in a process.
+    
+    Optional limits bound its footprint: conversations beyond `max_conversations`
+    or `max_bytes` are evicted least recently active first, idle ones expire after
+    `idle_ttl_seconds` when `sweep()` runs, and only the newest `max_messages`
+    turns are kept. Evicted conversations are handed to `spill_store` if given and
+    transparently restored from it on the next access, still as the least
+    recently active until written to; until then they are still listed (after
+    every in-memory one, as they were the least recently active) and counted in
+    the stats.
+    
+    History is held as compact records and only converted to the public models
+    when read; AI replies of at least `compress_min_bytes` are stored compressed.
+    """
     
-    def __init__(self):
-        self._conversations: Dict[str, Conversation] = {}
+    def __init__(
+        self,
+        max_conversations: Optional[int] = None,
+        max_messages: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        idle_ttl_seconds: Optional[float] = None,
+        spill_store: Optional[BaseConversationStore] = None,
+        compress_min_bytes: int = 0
+    ):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.spill_store = spill_store
+        self.compress_min_bytes = compress_min_bytes
+        # Spilling and restoring do the spill store's I/O; one thread keeps access serialized
+        self.io_workers = 1 if spill_store and spill_store.io_workers else 0
+        self._conversations: Dict[str, ConversationRecord] = {}
+        # Recency index: every touch appends (sequence, id), so the list stays sorted
+        # without re-sorting. Superseded entries are skipped on read and compacted away.
+        # Restored conversations are prepended with negative sequences.
+        self._sequence = itertools.count()
+        self._restored_sequence = itertools.count(-1, -1)
+        self._activity: Dict[str, int] = {}
+        self._activity_index: List[Tuple[int, str]] = []
+        self._index_head = 0  # Entries before this are known to be superseded
+        self._touched_at: Dict[str, float] = {}
+        self._summaries: Dict[str, ConversationSummary] = {}
+        # Stats are maintained on write so polling them never walks the store
+        self._total_messages = 0
+        self._activity_windows = ActivityWindows()
+        self._sizes: Dict[str, int] = {}
+        self._memory_bytes = 0
+        self._evictions = {"idle": 0, "count": 0, "bytes": 0}
+        self._trimmed_messages = 0
     
     def create_conversation(self, conversation_id: str) -> Conversation:
         """Create a new conversation"""
-        timestamp = get_current_timestamp()
-        conversation = Conversation(
-            conversation_id=conversation_id,
-            messages=[],
-            created_at=timestamp,
-            last_activity=timestamp
-        )
-        self._conversations[conversation_id] = conversation
+        now = get_current_micros()
+        record = ConversationRecord(conversation_id, created_at=now, last_activity=now)
+        self._insert(record)
+        self._enforce_limits(keep=conversation_id)
         logger.info(f"Created new conversation: {conversation_id}")
-        return conversation
+        return record.to_conversation()
     
     def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
         """Get conversation by ID"""
-        return self._conversations.get(conversation_id)
+        record = self._record(conversation_id)
+        return record.to_conversation() if record else None
+    
+    def get_record(self, conversation_id: str) -> Optional[ConversationRecord]:
+        """Get conversation history without decompressing it"""
+        record = self._record(conversation_id)
+        return record.snapshot() if record else None
     
     def add_message(self, conversation_id: str, message: ChatMessage) -> None:
         """Add message to conversation"""
-        if conversation_id not in self._conversations:
+        if self._record(conversation_id) is None:
             self.create_conversation(conversation_id)
         
-        conversation = self._conversations[conversation_id]
-        conversation.messages.append(message)
-        conversation.last_activity = get_current_timestamp()
+        record = self._conversations[conversation_id]
+        message_record = MessageRecord.from_message(message, self.compress_min_bytes)
+        record.messages.append(message_record)
+        record.last_activity = get_current_micros()
+        self._total_messages += 1
+        self._resize(conversation_id, message_record.size())
+        if self.max_messages and len(record.messages) > self.max_messages:
+            self._trim(record, len(record.messages) - self.max_messages)
+        self._touch(conversation_id)
+        self._enforce_limits(keep=conversation_id)
         
         logger.info(f"Added message to conversation {conversation_id}")
     
-    def list_conversations(self) -> List[ConversationSummary]:
-        """List all conversations with summaries"""
+    def save_conversation(self, conversation: Conversation) -> None:
+        """Insert or replace a whole conversation"""
+        self._save_record(ConversationRecord.from_conversation(conversation, self.compress_min_bytes))
+    
+    def update_summary(self, conversation_id: str, summary: str, message_count: int) -> None:
+        """Store rolling summary of older messages"""
+        record = self._conversations.get(conversation_id)
+        if record:
+            record.summary = summary
+            record.summary_message_count = message_count
+        elif self.spill_store:
+            # Evicted while the summary was generated; a summary is not activity, so write through
+            self.spill_store.update_summary(conversation_id, summary, message_count)
+    
+    def list_conversations_page(
+        self,
+        limit: Optional[int],
+        cursor: Optional[str] = None
+    ) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """List conversations by most recent activity, one page at a time, spilled ones last"""
+        position = decode_cursor(cursor) if cursor else {}
+        if "spill" in position:
+            # Past every in-memory conversation; the spill store's own cursor continues from here
+            if not self.spill_store or not isinstance(position["spill"], (str, type(None))):
+                raise ValueError("Invalid cursor")
+            return self._list_spilled(limit, position["spill"], [])
+        
+        end = len(self._activity_index)
+        if cursor:
+            before = position.get("seq")
+            if not isinstance(before, int):
+                raise ValueError("Invalid cursor")
+            end = bisect.bisect_left(self._activity_index, (before, ""))
+        
         summaries = []
-        for conv_id, conversation in self._conversations.items():
-            preview = ""
-            if conversation.messages:
-                first_message = conversation.messages[0].user
-                preview = first_message[:50] + "..." if len(first_message) > 50 else first_message
-            
-            summary = ConversationSummary(
-                conversation_id=conv_id,
-                message_count=len(conversation.messages),
-                created_at=conversation.created_at,
-                last_activity=conversation.last_activity,
-                preview=preview
-            )
-            summaries.append(summary)
+        index = end - 1
+        while index >= 0 and (limit is None or len(summaries) < limit):
+            sequence, conversation_id = self._activity_index[index]
+            if self._activity.get(conversation_id) == sequence:
+                summaries.append(self._summary(conversation_id))
+            index -= 1
         
-        # Sort by last activity (most recent first)
-        summaries.sort(key=lambda x: x.last_activity, reverse=True)
-        return summaries
+        if limit is not None and len(summaries) == limit:
+            if self._has_live_entry(index):
+                return summaries, encode_cursor({"seq": self._activity[summaries[-1].conversation_id]})
+            if self.spill_store and self.spill_store.list_conversations_page(1)[0]:
+                return summaries, encode_cursor({"spill": None})
+            return summaries, None
+        return self._list_spilled(limit, None, summaries)
     
     def delete_conversation(self, conversation_id: str) -> bool:
         """Delete conversation"""
+        spilled = bool(self.spill_store and self.spill_store.delete_conversation(conversation_id))
         if conversation_id in self._conversations:
-            del self._conversations[conversation_id]
+            self._remove(conversation_id)
             logger.info(f"Deleted conversation: {conversation_id}")
             return True
-        return False
+        return spilled
     
     def get_stats(self) -> Dict[str, int]:
         """Get storage statistics"""
-        total_conversations = len(self._conversations)
-        total_messages = sum(len(conv.messages) for conv in self._conversations.values())
-        
-        return {
-            "total_conversations": total_conversations,
-            "total_messages": total_messages,
-            "active_conversations": total_conversations  # All are active in memory
-        }
\ No newline at end of file
+        stats = {
+            "total_conversations": len(self._conversations),
+            "total_messages": self._total_messages
+        }
+        for name, seconds in ACTIVITY_WINDOWS.items():
+            stats[name] = self._activity_windows.count_active(seconds)
+        if self.spill_store:
+            try:
+                spilled = self.spill_store.get_stats()
+            except Exception as e:
+                logger.error(f"Failed to read spill store stats: {e}")
+            else:
+                stats["spilled_conversations"] = spilled["total_conversations"]
+                for name in ("total_conversations", "total_messages", *ACTIVITY_WINDOWS):
+                    stats[name] += spilled[name]
+        stats["active_conversations"] = stats[ACTIVE_WINDOW]
+        stats["memory_bytes"] = self._memory_bytes
+        for reason, count in self._evictions.items():
+            stats[f"evicted_{reason}"] = count
+        stats["trimmed_messages"] = self._trimmed_messages
+        return stats
+    
+    def sweep(self) -> int:
+        """Expire idle conversations and re-check the size limits"""
+        evicted = 0
+        if self.idle_ttl_seconds:
+            cutoff = time.monotonic() - self.idle_ttl_seconds
+            # The recency index is in touch order, so idle conversations are all at its head
+            while True:
+                oldest = self._oldest()
+                if oldest is None or self._touched_at[oldest] > cutoff:
+                    break
+                self._evict(oldest, "idle")
+                evicted += 1
+        return evicted + self._enforce_limits()
+    
+    def close(self) -> None:
+        if self.spill_store:
+            self.spill_store.close()
+    
+    def _list_spilled(
+        self,
+        limit: Optional[int],
+        cursor: Optional[str],
+        summaries: List[ConversationSummary]
+    ) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """Fill the rest of a page from the spill store"""
+        if not self.spill_store:
+            return summaries, None
+        remaining = None if limit is None else limit - len(summaries)
+        spilled, spill_cursor = self.spill_store.list_conversations_page(remaining, cursor)
+        next_cursor = encode_cursor({"spill": spill_cursor}) if spill_cursor else None
+        return summaries + spilled, next_cursor
+    
+    def _record(self, conversation_id: str) -> Optional[ConversationRecord]:
+        record = self._conversations.get(conversation_id)
+        if record is None:
+            record = self._restore_spilled(conversation_id)
+        return record
+    
+    def _save_record(self, record: ConversationRecord) -> None:
+        if record.conversation_id in self._conversations:
+            self._remove(record.conversation_id)
+        self._insert(record)
+        if self.max_messages and len(record.messages) > self.max_messages:
+            self._trim(record, len(record.messages) - self.max_messages)
+        self._enforce_limits(keep=record.conversation_id)
+    
+    def _insert(self, record: ConversationRecord, restored: bool = False) -> None:
+        conversation_id = record.conversation_id
+        self._conversations[conversation_id] = record
+        self._total_messages += len(record.messages)
+        self._sizes[conversation_id] = 0
+        self._resize(
+            conversation_id,
+            CONVERSATION_OVERHEAD_BYTES + sum(message.size() for message in record.messages)
+        )
+        if restored:
+            self._index_restored(record)
+        else:
+            self._touch(conversation_id)
+    
+    def _remove(self, conversation_id: str) -> ConversationRecord:
+        record = self._conversations.pop(conversation_id)
+        self._total_messages -= len(record.messages)
+        self._memory_bytes -= self._sizes.pop(conversation_id)
+        self._activity_windows.remove(conversation_id)
+        del self._activity[conversation_id]
+        del self._touched_at[conversation_id]
+        self._summaries.pop(conversation_id, None)
+        self._compact_index()
+        return record
+    
+    def _resize(self, conversation_id: str, delta: int) -> None:
+        self._sizes[conversation_id] += delta
+        self._memory_bytes += delta
+    
+    def _trim(self, record: ConversationRecord, count: int) -> None:
+        """Drop the oldest `count` messages"""
+        dropped = record.messages[:count]
+        del record.messages[:count]
+        record.summary_message_count = max(0, record.summary_message_count - count)
+        self._total_messages -= count
+        self._trimmed_messages += count
+        self._resize(record.conversation_id, -sum(message.size() for message in dropped))
+    
+    def _enforce_limits(self, keep: Optional[str] = None) -> int:
+        """Evict least recently active conversations until within the limits"""
+        evicted = 0
+        while True:
+            if self.max_conversations and len(self._conversations) > self.max_conversations:
+                reason = "count"
+            elif self.max_bytes and self._memory_bytes > self.max_bytes:
+                reason = "bytes"
+            else:
+                break
+            oldest = self._oldest(skip=keep)
+            if oldest is None:
+                break
+            self._evict(oldest, reason)
+            evicted += 1
+        return evicted
+    
+    def _evict(self, conversation_id: str, reason: str) -> None:
+        record = self._remove(conversation_id)
+        self._evictions[reason] += 1
+        if self.spill_store:
+            try:
+                self.spill_store.save_conversation(record.to_conversation())
+            except Exception as e:
+                logger.error(f"Failed to spill conversation {conversation_id}: {e}")
+        logger.info(f"Evicted conversation {conversation_id} ({reason})")
+    
+    def _restore_spilled(self, conversation_id: str) -> Optional[ConversationRecord]:
+        """Move a previously evicted conversation back into memory"""
+        if not self.spill_store:
+            return None
+        try:
+            conversation = self.spill_store.get_conversation(conversation_id)
+            if conversation is not None:
+                self.spill_store.delete_conversation(conversation_id)
+        except Exception as e:
+            logger.error(f"Failed to restore spilled conversation {conversation_id}: {e}")
+            return None
+        if conversation is None:
+            return None
+        # Reading is not activity: the conversation comes back as the least recently active,
+        # as of its own last activity, and only a write moves it to the front
+        record = ConversationRecord.from_conversation(conversation, self.compress_min_bytes)
+        self._insert(record, restored=True)
+        self._enforce_limits(keep=conversation_id)
+        return record
+    
+    def _oldest(self, skip: Optional[str] = None) -> Optional[str]:
+        """Least recently active conversation, other than `skip`"""
+        while self._index_head < len(self._activity_index):
+            sequence, conversation_id = self._activity_index[self._index_head]
+            if self._activity.get(conversation_id) == sequence:
+                break
+            self._index_head += 1
+        for sequence, conversation_id in itertools.islice(self._activity_index, self._index_head, None):
+            if self._activity.get(conversation_id) == sequence and conversation_id != skip:
+                return conversation_id
+        return None
+    
+    def _index_restored(self, record: ConversationRecord) -> None:
+        """Index a restored conversation behind every other one, idle since its last activity"""
+        conversation_id = record.conversation_id
+        sequence = next(self._restored_sequence)
+        self._activity[conversation_id] = sequence
+        self._activity_index.insert(0, (sequence, conversation_id))
+        self._index_head = 0
+        idle_seconds = max(0.0, (get_current_micros() - record.last_activity) / 1e6)
+        self._touched_at[conversation_id] = time.monotonic() - idle_seconds
+        self._activity_windows.touch(conversation_id, now=time.time() - idle_seconds)
+        self._compact_index()
+    
+    def _touch(self, conversation_id: str) -> None:
+        """Move conversation to the front of the recency index"""
+        sequence = next(self._sequence)
+        self._activity[conversation_id] = sequence
+        self._activity_index.append((sequence, conversation_id))
+        self._touched_at[conversation_id] = time.monotonic()
+        self._activity_windows.touch(conversation_id)
+        self._summaries.pop(conversation_id, None)
+        self._compact_index()
+    
+    def _compact_index(self) -> None:
+        """Drop superseded index entries once they outnumber live ones"""
+        if len(self._activity_index) > 2 * len(self._activity) + 64:
+            self._activity_index = [
+                entry for entry in self._activity_index
+                if self._activity.get(entry[1]) == entry[0]
+            ]
+            self._index_head = 0
+    
+    def _has_live_entry(self, position: int) -> bool:
+        while position >= 0:
+            sequence, conversation_id = self._activity_index[position]
+            if self._activity.get(conversation_id) == sequence:
+                return True
+            position -= 1
+        return False
+    
+    def _summary(self, conversation_id: str) -> ConversationSummary:
+        """Cached listing entry, rebuilt only after the conversation changes"""
+        summary = self._summaries.get(conversation_id)
+        if summary is None:
+            record = self._conversations[conversation_id]
+            preview = ""
+            if record.messages:
+                preview = build_preview(record.messages[0].user)
+            
+            summary = ConversationSummary(
+                conversation_id=conversation_id,
+                message_count=len(record.messages),
+                created_at=micros_to_timestamp(record.created_at),
+                last_activity=micros_to_timestamp(record.last_activity),
+                preview=preview
+            )
+            self._summaries[conversation_id] = summary
+        return summary
\ No newline at end of file
@@ -0,0 +1,110 @@
+import sys
+import zlib
+from typing import List, Optional, Union
+from app.models.chat import ChatMessage, Conversation
+from app.utils.time_utils import timestamp_to_micros, micros_to_timestamp
+
+class MessageRecord:
+    """
+    Compact stored form of a ChatMessage.
+    
+    Timestamps are integer microseconds since the epoch and long AI replies are
+    kept zlib-compressed, so a turn costs a fraction of the pydantic model.
+    """
+    
+    __slots__ = ("user", "ai", "timestamp")
+    
+    def __init__(self, user: str, ai: Union[str, bytes], timestamp: Union[int, str]):
+        self.user = user
+        self.ai = ai
+        self.timestamp = timestamp
+    
+    @classmethod
+    def from_message(cls, message: ChatMessage, compress_min_bytes: int = 0) -> "MessageRecord":
+        ai: Union[str, bytes] = message.ai
+        if compress_min_bytes and len(ai) >= compress_min_bytes:
+            compressed = zlib.compress(ai.encode("utf-8"))
+            # Short or already dense replies can grow; keep whichever is smaller
+            if len(compressed) < len(ai):
+                ai = compressed
+        try:
+            timestamp: Union[int, str] = timestamp_to_micros(message.timestamp)
+        except ValueError:
+            timestamp = message.timestamp
+        return cls(message.user, ai, timestamp)
+    
+    def ai_text(self) -> str:
+        """The AI reply, decompressed if needed"""
+        return self.ai if isinstance(self.ai, str) else zlib.decompress(self.ai).decode("utf-8")
+    
+    def to_message(self) -> ChatMessage:
+        timestamp = self.timestamp if isinstance(self.timestamp, str) else micros_to_timestamp(self.timestamp)
+        return ChatMessage(user=self.user, ai=self.ai_text(), timestamp=timestamp)
+    
+    def size(self) -> int:
+        """Approximate resident bytes, including the list slot that holds the record"""
+        return (
+            sys.getsizeof(self) + sys.getsizeof(self.user) + sys.getsizeof(self.ai)
+            + sys.getsizeof(self.timestamp) + 8
+        )
+
+class ConversationRecord:
+    """
+    Compact stored form of a Conversation.
+    
+    Like messages, `created_at` and `last_activity` are integer microseconds
+    since the epoch. Services read history through records and only the
+    conversation endpoints convert them to the public model.
+    """
+    
+    __slots__ = (
+        "conversation_id", "messages", "created_at", "last_activity", "summary", "summary_message_count"
+    )
+    
+    def __init__(
+        self,
+        conversation_id: str,
+        created_at: int,
+        last_activity: int,
+        messages: Optional[List[MessageRecord]] = None,
+        summary: Optional[str] = None,
+        summary_message_count: int = 0
+    ):
+        self.conversation_id = conversation_id
+        self.messages = messages if messages is not None else []
+        self.created_at = created_at
+        self.last_activity = last_activity
+        self.summary = summary
+        self.summary_message_count = summary_message_count
+    
+    @classmethod
+    def from_conversation(cls, conversation: Conversation, compress_min_bytes: int = 0) -> "ConversationRecord":
+        return cls(
+            conversation_id=conversation.conversation_id,
+            created_at=timestamp_to_micros(conversation.created_at),
+            last_activity=timestamp_to_micros(conversation.last_activity),
+            messages=[MessageRecord.from_message(message, compress_min_bytes) for message in conversation.messages],
+            summary=conversation.summary,
+            summary_message_count=conversation.summary_message_count
+        )
+    
+    def to_conversation(self) -> Conversation:
+        return Conversation(
+            conversation_id=self.conversation_id,
+            messages=[record.to_message() for record in self.messages],
+            created_at=micros_to_timestamp(self.created_at),
+            last_activity=micros_to_timestamp(self.last_activity),
+            summary=self.summary,
+            summary_message_count=self.summary_message_count
+        )
+    
+    def snapshot(self) -> "ConversationRecord":
+        """Copy that callers may hold and extend; message records are shared, not copied"""
+        return ConversationRecord(
+            self.conversation_id,
+            self.created_at,
+            self.last_activity,
+            list(self.messages),
+            self.summary,
+            self.summary_message_count
+        )
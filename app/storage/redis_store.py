@@ -0,0 +1,280 @@
+import json
+import time
+from typing import Dict, Optional, List, Tuple
+import redis
+from app.models.chat import ChatMessage, Conversation, ConversationSummary
+from app.storage.base import (
+    ACTIVE_WINDOW, ACTIVITY_WINDOWS, BaseConversationStore, build_preview, encode_cursor, decode_cursor
+)
+from app.storage.records import ConversationRecord, MessageRecord
+from app.utils.time_utils import get_current_timestamp, timestamp_to_micros
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+class RedisConversationStore(BaseConversationStore):
+    """
+    Conversation storage in Redis, shared by every worker and instance.
+    
+    Layout under `prefix`:
+      conv:<id>            hash of conversation metadata
+      conv:<id>:messages   list of JSON-encoded messages, appended with RPUSH
+      activity             sorted set of ids scored by a global activity sequence
+      last_active          sorted set of ids scored by epoch seconds, for activity windows
+      counters             hash of total conversations and messages
+    
+    Writes that depend on whether the conversation exists (creating it,
+    counting it, summarizing it) read and write under WATCH/MULTI, so the
+    counters change in the same transaction as the data and a concurrent
+    delete makes the write retry instead of resurrecting the conversation.
+    Other operations are a single pipelined round trip. Calls block on the
+    network, so AsyncConversationStore runs them on `io_workers` threads, one
+    per pooled connection by default.
+    """
+    
+    def __init__(self, client: redis.Redis, prefix: str = "", io_workers: int = 4):
+        self._redis = client
+        self._prefix = prefix
+        self.io_workers = io_workers
+    
+    @classmethod
+    def from_url(cls, url: str, max_connections: int, prefix: str = "") -> "RedisConversationStore":
+        pool = redis.ConnectionPool.from_url(url, max_connections=max_connections, decode_responses=True)
+        logger.info(f"Redis conversation store using {pool.connection_kwargs.get('host')}")
+        return cls(redis.Redis(connection_pool=pool), prefix, io_workers=max_connections)
+    
+    def create_conversation(self, conversation_id: str) -> Conversation:
+        """Create a new conversation"""
+        timestamp = get_current_timestamp()
+        sequence = self._redis.incr(self._key("sequence"))
+        conversation_key = self._conversation_key(conversation_id)
+        
+        def create(pipe) -> None:
+            self._queue_create(pipe, conversation_key, timestamp)
+            pipe.hset(conversation_key, "last_activity", timestamp)
+            self._queue_touch(pipe, conversation_id, sequence)
+        
+        self._redis.transaction(create, conversation_key)
+        logger.info(f"Created new conversation: {conversation_id}")
+        return Conversation(
+            conversation_id=conversation_id,
+            messages=[],
+            created_at=timestamp,
+            last_activity=timestamp
+        )
+    
+    def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """Get conversation by ID"""
+        fields, messages = self._fetch(conversation_id)
+        if not fields:
+            return None
+        
+        return Conversation(
+            conversation_id=conversation_id,
+            messages=[self._decode_message(message) for message in messages],
+            created_at=fields["created_at"],
+            last_activity=fields["last_activity"],
+            summary=fields.get("summary"),
+            summary_message_count=int(fields.get("summary_message_count", 0))
+        )
+    
+    def get_record(self, conversation_id: str) -> Optional[ConversationRecord]:
+        """Get conversation history without building the pydantic models"""
+        fields, messages = self._fetch(conversation_id)
+        if not fields:
+            return None
+        
+        return ConversationRecord(
+            conversation_id=conversation_id,
+            created_at=timestamp_to_micros(fields["created_at"]),
+            last_activity=timestamp_to_micros(fields["last_activity"]),
+            messages=[MessageRecord(*json.loads(message)) for message in messages],
+            summary=fields.get("summary"),
+            summary_message_count=int(fields.get("summary_message_count", 0))
+        )
+    
+    def add_message(self, conversation_id: str, message: ChatMessage) -> None:
+        """Add message to conversation"""
+        timestamp = get_current_timestamp()
+        sequence = self._redis.incr(self._key("sequence"))
+        conversation_key = self._conversation_key(conversation_id)
+        
+        def add(pipe) -> None:
+            self._queue_create(pipe, conversation_key, timestamp)
+            pipe.hsetnx(conversation_key, "preview", build_preview(message.user))
+            pipe.hset(conversation_key, "last_activity", timestamp)
+            pipe.rpush(self._messages_key(conversation_id), self._encode_message(message))
+            pipe.hincrby(self._key("counters"), "messages", 1)
+            self._queue_touch(pipe, conversation_id, sequence)
+        
+        self._redis.transaction(add, conversation_key)
+        logger.info(f"Added message to conversation {conversation_id}")
+    
+    def save_conversation(self, conversation: Conversation) -> None:
+        """Insert or replace a whole conversation"""
+        conversation_id = conversation.conversation_id
+        self.delete_conversation(conversation_id)
+        sequence = self._redis.incr(self._key("sequence"))
+        
+        fields = {
+            "created_at": conversation.created_at,
+            "last_activity": conversation.last_activity,
+            "summary_message_count": conversation.summary_message_count,
+            "preview": build_preview(conversation.messages[0].user) if conversation.messages else ""
+        }
+        if conversation.summary is not None:
+            fields["summary"] = conversation.summary
+        
+        pipe = self._redis.pipeline()
+        pipe.hset(self._conversation_key(conversation_id), mapping=fields)
+        if conversation.messages:
+            pipe.rpush(
+                self._messages_key(conversation_id),
+                *[self._encode_message(message) for message in conversation.messages]
+            )
+        pipe.hincrby(self._key("counters"), "conversations", 1)
+        pipe.hincrby(self._key("counters"), "messages", len(conversation.messages))
+        self._queue_touch(pipe, conversation_id, sequence)
+        pipe.execute()
+    
+    def update_summary(self, conversation_id: str, summary: str, message_count: int) -> None:
+        """Store rolling summary of older messages"""
+        conversation_key = self._conversation_key(conversation_id)
+        
+        def update(pipe) -> None:
+            # Never recreate a conversation that was deleted while its summary was generated
+            if pipe.exists(conversation_key):
+                pipe.multi()
+                pipe.hset(conversation_key, mapping={"summary": summary, "summary_message_count": message_count})
+        
+        self._redis.transaction(update, conversation_key)
+    
+    def list_conversations_page(
+        self,
+        limit: Optional[int],
+        cursor: Optional[str] = None
+    ) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """List conversations by most recent activity using the activity sorted set"""
+        max_score = "+inf"
+        if cursor:
+            before = decode_cursor(cursor).get("seq")
+            if not isinstance(before, int):
+                raise ValueError("Invalid cursor")
+            max_score = f"({before}"
+        
+        # One extra entry tells us whether another page exists
+        entries = self._redis.zrevrangebyscore(
+            self._key("activity"),
+            max_score,
+            "-inf",
+            start=0 if limit is not None else None,
+            num=limit + 1 if limit is not None else None,
+            withscores=True
+        )
+        page = entries[:limit] if limit is not None else entries
+        
+        pipe = self._redis.pipeline(transaction=False)
+        for conversation_id, _ in page:
+            pipe.hmget(self._conversation_key(conversation_id), "created_at", "last_activity", "preview")
+            pipe.llen(self._messages_key(conversation_id))
+        results = pipe.execute()
+        
+        summaries = []
+        for index, (conversation_id, _) in enumerate(page):
+            (created_at, last_activity, preview), message_count = results[2 * index], results[2 * index + 1]
+            if created_at is None:
+                continue  # Deleted between the two round trips
+            summaries.append(ConversationSummary(
+                conversation_id=conversation_id,
+                message_count=message_count,
+                created_at=created_at,
+                last_activity=last_activity,
+                preview=preview or ""
+            ))
+        
+        next_cursor = None
+        if limit is not None and len(entries) > limit:
+            next_cursor = encode_cursor({"seq": int(page[-1][1])})
+        return summaries, next_cursor
+    
+    def delete_conversation(self, conversation_id: str) -> bool:
+        """Delete conversation"""
+        conversation_key = self._conversation_key(conversation_id)
+        messages_key = self._messages_key(conversation_id)
+        
+        def delete(pipe) -> bool:
+            existed = bool(pipe.exists(conversation_key))
+            message_count = pipe.llen(messages_key)
+            pipe.multi()
+            pipe.delete(conversation_key, messages_key)
+            pipe.zrem(self._key("activity"), conversation_id)
+            pipe.zrem(self._key("last_active"), conversation_id)
+            if existed:
+                pipe.hincrby(self._key("counters"), "conversations", -1)
+                pipe.hincrby(self._key("counters"), "messages", -message_count)
+            return existed
+        
+        if not self._redis.transaction(delete, conversation_key, messages_key, value_from_callable=True):
+            return False
+        logger.info(f"Deleted conversation: {conversation_id}")
+        return True
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get storage statistics"""
+        now = time.time()
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hmget(self._key("counters"), "conversations", "messages")
+        for seconds in ACTIVITY_WINDOWS.values():
+            pipe.zcount(self._key("last_active"), now - seconds, "+inf")
+        (conversations, messages), *windows = pipe.execute()
+        
+        stats = {
+            "total_conversations": int(conversations or 0),
+            "total_messages": int(messages or 0)
+        }
+        stats.update(zip(ACTIVITY_WINDOWS, windows))
+        stats["active_conversations"] = stats[ACTIVE_WINDOW]
+        return stats
+    
+    def ping(self) -> bool:
+        return bool(self._redis.ping())
+    
+    def close(self) -> None:
+        self._redis.connection_pool.disconnect()
+    
+    def _queue_create(self, pipe, conversation_key: str, timestamp: str) -> None:
+        """Start the transaction of a watched `pipe`, creating the conversation if it is missing"""
+        created = not pipe.exists(conversation_key)
+        pipe.multi()
+        if created:
+            pipe.hset(conversation_key, "created_at", timestamp)
+            pipe.hincrby(self._key("counters"), "conversations", 1)
+    
+    def _queue_touch(self, pipe, conversation_id: str, sequence: int) -> None:
+        pipe.zadd(self._key("activity"), {conversation_id: sequence})
+        pipe.zadd(self._key("last_active"), {conversation_id: time.time()})
+    
+    def _key(self, name: str) -> str:
+        return f"{self._prefix}{name}"
+    
+    def _conversation_key(self, conversation_id: str) -> str:
+        return f"{self._prefix}conv:{conversation_id}"
+    
+    def _messages_key(self, conversation_id: str) -> str:
+        return f"{self._prefix}conv:{conversation_id}:messages"
+    
+    def _fetch(self, conversation_id: str) -> Tuple[Dict[str, str], List[str]]:
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hgetall(self._conversation_key(conversation_id))
+        pipe.lrange(self._messages_key(conversation_id), 0, -1)
+        fields, messages = pipe.execute()
+        return fields, messages
+    
+    @staticmethod
+    def _encode_message(message: ChatMessage) -> str:
+        return json.dumps([message.user, message.ai, message.timestamp])
+    
+    @staticmethod
+    def _decode_message(encoded: str) -> ChatMessage:
+        user, ai, timestamp = json.loads(encoded)
+        return ChatMessage(user=user, ai=ai, timestamp=timestamp)
@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import aiofiles
+from cachetools import TTLCache
+from app.core.logging import get_logger
+from app.core.tracing import traced
+
+logger = get_logger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different submissions share a cache entry"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def make_cache_key(payload: bytes, *parts: str) -> str:
+    """Content-addressed key from payload bytes plus analysis type, prompt version etc."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    digest.update(payload)
+    return digest.hexdigest()
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """Only successful analyses that parsed and matched their schema are worth caching"""
+    return (
+        "error" not in result
+        and result.get("parsed", True) is not False
+        and result.get("schema_valid", True) is not False
+    )
+
+class _SizedTTLCache(TTLCache):
+    """TTLCache that counts evictions"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.evictions = 0
+    
+    def popitem(self):
+        self.evictions += 1
+        return super().popitem()
+
+class ResponseCache:
+    """
+    In-memory LRU/TTL cache for analysis results with an optional disk tier.
+    
+    Disk entries expire on read, and a background sweep started with `start()`
+    deletes expired ones and keeps the tier under `disk_max_bytes`, removing the
+    least recently used first (disk hits refresh an entry's mtime).
+    """
+    
+    # A sweep over the size cap trims down to this fraction of it, so writes do not re-trigger it at once
+    DISK_LOW_WATER = 0.9
+    
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl_seconds: float,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 0,
+        disk_sweep_interval_seconds: float = 300.0
+    ):
+        # Values are stored as serialized JSON so entry size is exact and
+        # callers can never mutate a cached result in place
+        self._memory = _SizedTTLCache(maxsize=max_bytes, ttl=ttl_seconds, getsizeof=len)
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_sweep_interval_seconds = disk_sweep_interval_seconds
+        self._disk_bytes = 0  # Exact after each sweep, estimated from writes in between
+        self._disk_entries = 0
+        self._sweep_wanted = asyncio.Event()
+        self._sweep_task = None
+        
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_expired = 0
+        self.disk_evictions = 0
+    
+    async def start(self) -> None:
+        """Start sweeping the disk tier; a no-op without one"""
+        if self.disk_dir:
+            self._sweep_task = asyncio.create_task(self._sweep_loop())
+    
+    async def stop(self) -> None:
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            await asyncio.gather(self._sweep_task, return_exceptions=True)
+    
+    @traced()
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached result, promoting disk hits into memory"""
+        payload = self._memory.get(key)
+        if payload is not None:
+            self.memory_hits += 1
+            return json.loads(payload)
+        
+        if self.disk_dir:
+            payload = await self._read_disk(key)
+            if payload is not None:
+                self.disk_hits += 1
+                self._store_memory(key, payload)
+                return json.loads(payload)
+        
+        self.misses += 1
+        return None
+    
+    @traced()
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Cache a result in memory and, if enabled, on disk"""
+        payload = json.dumps(value, separators=(",", ":"))
+        self._store_memory(key, payload)
+        if self.disk_dir:
+            await self._write_disk(key, payload)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current footprint"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._memory),
+            "bytes": self._memory.currsize,
+            "max_bytes": self._memory.maxsize,
+            "evictions": self._memory.evictions,
+            "disk_enabled": self.disk_dir is not None,
+            "disk_entries": self._disk_entries,
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes,
+            "disk_expired": self.disk_expired,
+            "disk_evictions": self.disk_evictions
+        }
+    
+    def sweep_disk(self) -> int:
+        """
+        Delete expired disk entries, then the least recently used ones while over
+        the size cap. Blocking; returns how many entries were removed.
+        """
+        now = time.time()
+        entries: List[Tuple[float, int, Path]] = []
+        removed = 0
+        for path in self.disk_dir.glob("*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            # Entries expire ttl_seconds after they were written; mtime is a cheap upper bound
+            # (hits refresh it, and they re-check expires_at on read). Leftover temp files expire too.
+            if stat.st_mtime + self.ttl_seconds < now:
+                path.unlink(missing_ok=True)
+                removed += 1
+                self.disk_expired += 1
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in entries)
+        if self.disk_max_bytes and total > self.disk_max_bytes:
+            target = self.disk_max_bytes * self.DISK_LOW_WATER
+            entries.sort(key=lambda entry: entry[0])
+            while entries and total > target:
+                _, size, path = entries.pop(0)
+                path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+                self.disk_evictions += 1
+        
+        self._disk_bytes = total
+        self._disk_entries = len(entries)
+        return removed
+    
+    def _store_memory(self, key: str, payload: str) -> None:
+        if len(payload) > self._memory.maxsize:
+            return
+        self._memory[key] = payload
+    
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+    
+    async def _read_disk(self, key: str) -> Optional[str]:
+        path = self._disk_path(key)
+        try:
+            async with aiofiles.open(path, "r") as f:
+                entry = json.loads(await f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        
+        if entry["expires_at"] < time.time():
+            path.unlink(missing_ok=True)
+            self.disk_expired += 1
+            return None
+        try:
+            # Recency for the size-capped sweep
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["payload"]
+    
+    async def _write_disk(self, key: str, payload: str) -> None:
+        path = self._disk_path(key)
+        entry = json.dumps({"expires_at": time.time() + self.ttl_seconds, "payload": payload})
+        try:
+            path.parent.mkdir(exist_ok=True)
+            # Write then rename so concurrent readers never see a partial entry
+            tmp_path = path.with_suffix(".tmp")
+            async with aiofiles.open(tmp_path, "w") as f:
+                await f.write(entry)
+            tmp_path.replace(path)
+        except OSError as e:
+            logger.warning(f"Failed to write cache entry {key}: {e}")
+            return
+        self._disk_bytes += len(entry)
+        self._disk_entries += 1
+        if self.disk_max_bytes and self._disk_bytes > self.disk_max_bytes:
+            self._sweep_wanted.set()
+    
+    async def _sweep_loop(self) -> None:
+        while True:
+            try:
+                # Directory walks and unlinks block, so they run on a worker thread
+                removed = await asyncio.to_thread(self.sweep_disk)
+                if removed:
+                    logger.info(f"Cache sweep removed {removed} disk entries")
+            except Exception as e:
+                logger.error(f"Cache sweep failed: {e}")
+            self._sweep_wanted.clear()
+            try:
+                await asyncio.wait_for(self._sweep_wanted.wait(), timeout=self.disk_sweep_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
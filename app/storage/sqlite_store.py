@@ -0,0 +1,300 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional, List, Tuple
+from app.models.chat import ChatMessage, Conversation, ConversationSummary
+from app.storage.base import (
+    ACTIVE_WINDOW, ACTIVITY_WINDOWS, BaseConversationStore, build_preview, encode_cursor, decode_cursor
+)
+from app.storage.records import ConversationRecord, MessageRecord
+from app.utils.time_utils import get_current_timestamp, timestamp_to_micros
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    conversation_id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    last_activity TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    preview TEXT NOT NULL DEFAULT '',
+    summary TEXT,
+    summary_message_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_activity
+    ON conversations (last_activity, conversation_id);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL
+        REFERENCES conversations (conversation_id) ON DELETE CASCADE,
+    user TEXT NOT NULL,
+    ai TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_id
+    ON messages (conversation_id, id);
+CREATE TABLE IF NOT EXISTS store_counters (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    conversations INTEGER NOT NULL,
+    messages INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trg_conversations_insert AFTER INSERT ON conversations
+BEGIN
+    UPDATE store_counters SET conversations = conversations + 1 WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_conversations_delete AFTER DELETE ON conversations
+BEGIN
+    UPDATE store_counters
+        SET conversations = conversations - 1, messages = messages - OLD.message_count
+        WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_messages_insert AFTER INSERT ON messages
+BEGIN
+    UPDATE store_counters SET messages = messages + 1 WHERE id = 0;
+END;
+"""
+
+class SQLiteConversationStore(BaseConversationStore):
+    """Durable conversation storage that several uvicorn workers can share"""
+    
+    # Queries can wait up to busy_timeout on another worker's write lock, so they run off
+    # the event loop; one connection behind a lock means a second thread would only queue
+    io_workers = 1
+    
+    def __init__(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        # WAL lets readers in other workers proceed while one worker writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        logger.info(f"SQLite conversation store opened at {db_path}")
+    
+    def create_conversation(self, conversation_id: str) -> Conversation:
+        """Create a new conversation"""
+        timestamp = get_current_timestamp()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO conversations (conversation_id, created_at, last_activity) "
+                "VALUES (?, ?, ?)",
+                (conversation_id, timestamp, timestamp)
+            )
+        logger.info(f"Created new conversation: {conversation_id}")
+        return Conversation(
+            conversation_id=conversation_id,
+            messages=[],
+            created_at=timestamp,
+            last_activity=timestamp
+        )
+    
+    def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """Get conversation by ID"""
+        row, message_rows = self._fetch(conversation_id)
+        if row is None:
+            return None
+        
+        return Conversation(
+            conversation_id=conversation_id,
+            messages=[ChatMessage(**dict(message)) for message in message_rows],
+            created_at=row["created_at"],
+            last_activity=row["last_activity"],
+            summary=row["summary"],
+            summary_message_count=row["summary_message_count"]
+        )
+    
+    def get_record(self, conversation_id: str) -> Optional[ConversationRecord]:
+        """Get conversation history straight from the rows"""
+        row, message_rows = self._fetch(conversation_id)
+        if row is None:
+            return None
+        
+        return ConversationRecord(
+            conversation_id=conversation_id,
+            created_at=timestamp_to_micros(row["created_at"]),
+            last_activity=timestamp_to_micros(row["last_activity"]),
+            messages=[MessageRecord(message["user"], message["ai"], message["timestamp"]) for message in message_rows],
+            summary=row["summary"],
+            summary_message_count=row["summary_message_count"]
+        )
+    
+    def add_message(self, conversation_id: str, message: ChatMessage) -> None:
+        """Add message to conversation"""
+        timestamp = get_current_timestamp()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO conversations "
+                    "(conversation_id, created_at, last_activity, preview) VALUES (?, ?, ?, ?)",
+                    (conversation_id, timestamp, timestamp, build_preview(message.user))
+                )
+                self._conn.execute(
+                    "INSERT INTO messages (conversation_id, user, ai, timestamp) VALUES (?, ?, ?, ?)",
+                    (conversation_id, message.user, message.ai, message.timestamp)
+                )
+                self._conn.execute(
+                    "UPDATE conversations SET last_activity = ?, message_count = message_count + 1, "
+                    "preview = CASE WHEN message_count = 0 THEN ? ELSE preview END "
+                    "WHERE conversation_id = ?",
+                    (timestamp, build_preview(message.user), conversation_id)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        
+        logger.info(f"Added message to conversation {conversation_id}")
+    
+    def save_conversation(self, conversation: Conversation) -> None:
+        """Insert or replace a whole conversation"""
+        preview = build_preview(conversation.messages[0].user) if conversation.messages else ""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM conversations WHERE conversation_id = ?", (conversation.conversation_id,)
+                )
+                self._conn.execute(
+                    "INSERT INTO conversations (conversation_id, created_at, last_activity, message_count, "
+                    "preview, summary, summary_message_count) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        conversation.conversation_id,
+                        conversation.created_at,
+                        conversation.last_activity,
+                        len(conversation.messages),
+                        preview,
+                        conversation.summary,
+                        conversation.summary_message_count
+                    )
+                )
+                self._conn.executemany(
+                    "INSERT INTO messages (conversation_id, user, ai, timestamp) VALUES (?, ?, ?, ?)",
+                    [
+                        (conversation.conversation_id, message.user, message.ai, message.timestamp)
+                        for message in conversation.messages
+                    ]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def update_summary(self, conversation_id: str, summary: str, message_count: int) -> None:
+        """Store rolling summary of older messages"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE conversations SET summary = ?, summary_message_count = ? WHERE conversation_id = ?",
+                (summary, message_count, conversation_id)
+            )
+    
+    def list_conversations_page(
+        self,
+        limit: Optional[int],
+        cursor: Optional[str] = None
+    ) -> Tuple[List[ConversationSummary], Optional[str]]:
+        """List conversations by most recent activity using the activity index"""
+        query = (
+            "SELECT conversation_id, message_count, created_at, last_activity, preview "
+            "FROM conversations"
+        )
+        params: list = []
+        if cursor:
+            position = decode_cursor(cursor)
+            if not isinstance(position.get("last_activity"), str) or not isinstance(position.get("id"), str):
+                raise ValueError("Invalid cursor")
+            query += " WHERE last_activity < ? OR (last_activity = ? AND conversation_id < ?)"
+            params += [position["last_activity"], position["last_activity"], position["id"]]
+        query += " ORDER BY last_activity DESC, conversation_id DESC"
+        if limit is not None:
+            # One extra row tells us whether another page exists
+            query += " LIMIT ?"
+            params.append(limit + 1)
+        
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        
+        summaries = [ConversationSummary(**dict(row)) for row in rows[:limit]]
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            last = summaries[-1]
+            next_cursor = encode_cursor({"last_activity": last.last_activity, "id": last.conversation_id})
+        return summaries, next_cursor
+    
+    def delete_conversation(self, conversation_id: str) -> bool:
+        """Delete conversation"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM conversations WHERE conversation_id = ?", (conversation_id,)
+            )
+        if cursor.rowcount:
+            logger.info(f"Deleted conversation: {conversation_id}")
+            return True
+        return False
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Get storage statistics"""
+        now = datetime.utcnow()
+        with self._lock:
+            # Totals are kept by triggers; windows are range scans on the activity index
+            row = self._conn.execute(
+                "SELECT conversations, messages FROM store_counters WHERE id = 0"
+            ).fetchone()
+            stats = {
+                "total_conversations": row["conversations"],
+                "total_messages": row["messages"]
+            }
+            for name, seconds in ACTIVITY_WINDOWS.items():
+                since = (now - timedelta(seconds=seconds)).isoformat() + "Z"
+                stats[name] = self._conn.execute(
+                    "SELECT COUNT(*) FROM conversations WHERE last_activity >= ?", (since,)
+                ).fetchone()[0]
+        stats["active_conversations"] = stats[ACTIVE_WINDOW]
+        return stats
+    
+    def _fetch(self, conversation_id: str) -> Tuple[Optional[sqlite3.Row], List[sqlite3.Row]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, last_activity, summary, summary_message_count "
+                "FROM conversations WHERE conversation_id = ?",
+                (conversation_id,)
+            ).fetchone()
+            if row is None:
+                return None, []
+            message_rows = self._conn.execute(
+                "SELECT user, ai, timestamp FROM messages WHERE conversation_id = ? ORDER BY id",
+                (conversation_id,)
+            ).fetchall()
+        return row, message_rows
+    
+    def _migrate(self) -> None:
+        """Add columns introduced after a database file was first created"""
+        self._conn.execute("DROP INDEX IF EXISTS idx_conversations_last_activity")
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(conversations)")}
+        if "summary" not in columns:
+            self._conn.execute("ALTER TABLE conversations ADD COLUMN summary TEXT")
+        if "summary_message_count" not in columns:
+            self._conn.execute(
+                "ALTER TABLE conversations ADD COLUMN summary_message_count INTEGER NOT NULL DEFAULT 0"
+            )
+        # Seed the counters once from existing rows; the triggers keep them current afterwards
+        self._conn.execute(
+            "INSERT OR IGNORE INTO store_counters (id, conversations, messages) "
+            "SELECT 0, COUNT(*), COALESCE(SUM(message_count), 0) FROM conversations"
+        )
+    
+    def ping(self) -> bool:
+        """Check the database answers queries"""
+        with self._lock:
+            return self._conn.execute("SELECT 1").fetchone()[0] == 1
+    
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
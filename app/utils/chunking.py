@@ -0,0 +1,53 @@
+import re
+import zlib
+from typing import Iterator
+
+# Sentence ends (with any closing quotes or brackets) followed by whitespace, or paragraph breaks
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*\n")
+
+def iter_sentences(text: str) -> Iterator[str]:
+    """Sentences in order, each with its trailing whitespace, so they join back to the text"""
+    start = 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        yield text[start:match.end()]
+        start = match.end()
+    if start < len(text):
+        yield text[start:]
+
+def iter_chunks(text: str, target_chars: int) -> Iterator[str]:
+    """
+    Split text into chunks of whole sentences, roughly `target_chars` long.
+    
+    Boundaries are content-defined: past half the target, a chunk ends after
+    a sentence whose hash says so, with odds proportional to its length. An
+    edit therefore only moves the boundaries near it, and the chunks before
+    and after it come out identical (and hit the cache). Chunks never exceed
+    twice the target; longer sentences are split at whitespace.
+    """
+    min_chars = max(1, target_chars // 2)
+    max_chars = max(2, target_chars * 2)
+    span = max(1, target_chars - min_chars)
+    buffer = []
+    size = 0
+    
+    for sentence in iter_sentences(text):
+        for piece in _split_long(sentence, max_chars):
+            if buffer and size + len(piece) > max_chars:
+                yield "".join(buffer)
+                buffer, size = [], 0
+            buffer.append(piece)
+            size += len(piece)
+            if size >= min_chars and zlib.crc32(piece.strip().encode("utf-8")) % span < len(piece):
+                yield "".join(buffer)
+                buffer, size = [], 0
+    
+    if buffer:
+        yield "".join(buffer)
+
+def _split_long(sentence: str, max_chars: int) -> Iterator[str]:
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars) + 1 or max_chars
+        yield sentence[:cut]
+        sentence = sentence[cut:]
+    if sentence:
+        yield sentence
@@ -1,18 +1,109 @@
 import aiofiles
+import hashlib
 import uuid
 from pathlib import Path
+from typing import List, Optional
 from fastapi import UploadFile
 from app.core.config import settings
+from app.core.exceptions import FileValidationException
 
-async def save_upload_file(file: UploadFile) -> str:
-    """Save uploaded file and return file path"""
+# Leading bytes of each accepted image format
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+]
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Detect the image type from its first bytes, ignoring the client's content type"""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+class SpooledUpload:
+    """
+    A validated upload, left in the file Starlette spooled it to.
+    
+    The multipart parser already holds each part in memory up to 1MB and in a
+    temporary file beyond that, so the upload is read from there when needed
+    rather than copied into a second spool. Validation reads it in chunks;
+    analysis reads it whole (at most MAX_FILE_SIZE), since the preprocessor
+    and the vision model both take bytes.
+    """
+    
+    def __init__(self, file: UploadFile, content_type: str, size: int, digest: bytes):
+        self.file = file
+        self.filename = file.filename or "unknown.jpg"
+        self.content_type = content_type
+        self.size = size
+        self.digest = digest
+    
+    async def read_bytes(self) -> bytes:
+        """Whole body, for consumers that need it in memory"""
+        await self.file.seek(0)
+        return await self.file.read()
+    
+    async def close(self) -> None:
+        await self.file.close()
+
+async def read_upload(
+    file: UploadFile,
+    max_size: int = settings.MAX_FILE_SIZE,
+    allowed_types: List[str] = settings.ALLOWED_IMAGE_TYPES
+) -> SpooledUpload:
+    """
+    Validate an image upload in chunks, hashing it as it goes.
+    
+    The type comes from the file's magic bytes and the size from the bytes
+    actually read, whatever the client declared. BodySizeLimitMiddleware has
+    already bounded the request body before it was spooled.
+    """
+    if file.size and file.size > max_size:
+        raise FileValidationException(f"File too large. Maximum size: {max_size / (1024*1024):.1f}MB")
+    
+    await file.seek(0)
+    head = await file.read(settings.UPLOAD_CHUNK_SIZE)
+    content_type = sniff_image_type(head)
+    if content_type not in allowed_types:
+        raise FileValidationException(
+            f"Invalid file type. Allowed types: {', '.join(allowed_types)}"
+        )
+    
+    sha256 = hashlib.sha256()
+    size = 0
+    chunk = head
+    while chunk:
+        size += len(chunk)
+        if size > max_size:
+            raise FileValidationException(
+                f"File too large. Maximum size: {max_size / (1024*1024):.1f}MB"
+            )
+        sha256.update(chunk)
+        chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+    return SpooledUpload(file, content_type, size, sha256.digest())
+
+async def save_upload_file(file: UploadFile, max_size: int = settings.MAX_FILE_SIZE) -> str:
+    """Save uploaded file in chunks and return file path"""
     file_id = str(uuid.uuid4())
     file_extension = file.filename.split(".")[-1] if file.filename else "jpg"
     file_path = Path(settings.UPLOAD_DIR) / f"{file_id}.{file_extension}"
+    file_path.parent.mkdir(parents=True, exist_ok=True)
     
-    async with aiofiles.open(file_path, 'wb') as f:
-        content = await file.read()
-        await f.write(content)
+    size = 0
+    try:
+        async with aiofiles.open(file_path, 'wb') as f:
+            while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise FileValidationException(
+                        f"File too large. Maximum size: {max_size / (1024*1024):.1f}MB"
+                    )
+                await f.write(chunk)
+    except BaseException:
+        cleanup_file(str(file_path))
+        raise
     
     return str(file_path)
 
@@ -21,4 +112,4 @@ def cleanup_file(file_path: str) -> None:
     try:
         Path(file_path).unlink(missing_ok=True)
     except Exception:
-        pass  # Log error in production
\ No newline at end of file
+        pass  # Log error in production
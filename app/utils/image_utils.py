@@ -1,25 +1,45 @@
-from PIL import Image
+from PIL import Image, ImageOps
 import io
+from pathlib import Path
 from typing import Tuple
 
-def prepare_image_for_gemini(image_path: str) -> bytes:
-    """Prepare image for Gemini Vision API"""
-    with Image.open(image_path) as img:
+def downscale_image(
+    image_data: bytes,
+    max_dimension: int = 1024,
+    output_format: str = "JPEG",
+    quality: int = 85
+) -> Tuple[bytes, str]:
+    """Downscale and re-encode an image for the vision model, dropping EXIF metadata"""
+    with Image.open(io.BytesIO(image_data)) as img:
+        # For JPEGs the decoder scales by 1/2-1/8 while decoding, far cheaper than a full decode
+        img.draft("RGB", (max_dimension, max_dimension))
+        
+        # Bake in the orientation before EXIF is dropped
+        img = ImageOps.exif_transpose(img)
+        
         # Convert to RGB if necessary
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+        if output_format.upper() == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
         
         # Resize if too large
-        max_size = (1024, 1024)
+        max_size = (max_dimension, max_dimension)
         if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
             img.thumbnail(max_size, Image.Resampling.LANCZOS)
         
-        # Convert to bytes
+        # Convert to bytes (no exif passed, so metadata is stripped)
         img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='JPEG', quality=85)
-        img_byte_arr.seek(0)
+        img.save(img_byte_arr, format=output_format, quality=quality)
         
-        return img_byte_arr.getvalue()
+        return img_byte_arr.getvalue(), Image.MIME[output_format.upper()]
+
+def warm_up() -> None:
+    """Load Pillow codec plugins, used to prime worker processes"""
+    Image.init()
+
+def prepare_image_for_gemini(image_path: str) -> bytes:
+    """Prepare image for Gemini Vision API"""
+    image_data, _ = downscale_image(Path(image_path).read_bytes())
+    return image_data
 
 def get_image_info(image_path: str) -> dict:
     """Get basic image information"""
@@ -0,0 +1,100 @@
+from typing import Any, Dict, List, Optional, Type
+from pydantic import BaseModel
+
+# JSON Schema keywords the Gemini response schema (an OpenAPI subset) understands
+_SCHEMA_KEYS = ("description", "enum", "nullable")
+
+def response_schema(model: Type[BaseModel], many: bool = False) -> Dict[str, Any]:
+    """
+    Gemini response schema generated from a pydantic model.
+    
+    The SDK rejects pydantic's own output (defaults, titles, $refs), so the
+    JSON Schema is reduced to the supported subset with references inlined.
+    Every property is marked required so the model always fills the shape.
+    """
+    schema = model.model_json_schema()
+    converted = _convert(schema, schema.get("$defs", {}))
+    return {"type": "ARRAY", "items": converted} if many else converted
+
+def _convert(node: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    if "$ref" in node:
+        return _convert(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+    if "anyOf" in node:
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        converted = _convert(options[0], defs)
+        converted["nullable"] = True
+        return converted
+    
+    converted = {"type": node["type"].upper()}
+    converted.update((key, node[key]) for key in _SCHEMA_KEYS if key in node)
+    if "enum" in node:
+        converted["format"] = "enum"
+    if "items" in node:
+        converted["items"] = _convert(node["items"], defs)
+    if "properties" in node:
+        converted["properties"] = {
+            name: _convert(prop, defs) for name, prop in node["properties"].items()
+        }
+        converted["required"] = list(node["properties"])
+    return converted
+
+def repair_truncated_json(text: str) -> Optional[str]:
+    """
+    Close a JSON document cut off mid-way (e.g. at the output token limit).
+    
+    One linear scan tracks open strings and containers. A string value cut
+    short is kept and closed; otherwise the text is cut back to the last
+    complete value. Open containers are then closed. Returns None when there
+    is nothing to repair.
+    """
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    value_string = False
+    previous = ""
+    # Cut points where everything before is complete: (offset, open containers)
+    last_complete: Optional[tuple] = None
+    start = None
+    
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                previous = char
+            continue
+        if char.isspace():
+            continue
+        if char == '"':
+            in_string = True
+            # Strings after a colon, or anywhere in an array, are values rather than keys
+            value_string = previous == ":" or (stack[-1:] == ["]"] and previous in "[,")
+        elif char in "{[":
+            if start is None:
+                start = index
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if not stack:
+                return None
+            stack.pop()
+            if not stack:
+                return None  # The document is already closed; truncation is not the problem
+            last_complete = (index + 1, len(stack))
+        elif char == "," and stack:
+            last_complete = (index, len(stack))
+        previous = char
+    
+    if start is None or not stack:
+        return None
+    if in_string and value_string:
+        text = text[:-1] if escaped else text
+        return text[start:] + '"' + "".join(reversed(stack))
+    
+    # Drop the trailing partial member, then close whatever was still open at that point
+    if last_complete is None:
+        return text[start:start + 1] + stack[0]
+    cut, depth = last_complete
+    return text[start:cut].rstrip().rstrip(",") + "".join(reversed(stack[:depth]))
@@ -1,27 +1,45 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+import functools
+import inspect
 import time
 from typing import Any, Callable
 
+EPOCH = datetime(1970, 1, 1)
+
 def get_current_timestamp() -> str:
     """Get current timestamp in ISO format"""
     return datetime.utcnow().isoformat() + "Z"
 
+def get_current_micros() -> int:
+    """Get current time as integer microseconds since the epoch, the stored form of timestamps"""
+    return (datetime.utcnow() - EPOCH) // timedelta(microseconds=1)
+
+def timestamp_to_micros(timestamp: str) -> int:
+    """Convert a get_current_timestamp() string to integer microseconds since the epoch"""
+    parsed = datetime.fromisoformat(timestamp.rstrip("Z"))
+    return (parsed - EPOCH) // timedelta(microseconds=1)
+
+def micros_to_timestamp(micros: int) -> str:
+    """Inverse of timestamp_to_micros, in the same format as get_current_timestamp()"""
+    return (EPOCH + timedelta(microseconds=micros)).isoformat() + "Z"
+
 def time_function(func: Callable) -> Callable:
-    """Decorator to time function execution"""
+    """Decorator to time function execution; the wrapped function returns (result, "1.23s")"""
+    if inspect.iscoroutinefunction(func):
+        return async_time_function(func)
+    
+    @functools.wraps(func)
     def wrapper(*args, **kwargs) -> Any:
-        start_time = time.time()
+        start_time = time.perf_counter()
         result = func(*args, **kwargs)
-        end_time = time.time()
-        execution_time = end_time - start_time
-        return result, f"{execution_time:.2f}s"
+        return result, f"{time.perf_counter() - start_time:.2f}s"
     return wrapper
 
-async def async_time_function(func: Callable) -> Callable:
-    """Decorator to time async function execution"""
+def async_time_function(func: Callable) -> Callable:
+    """Decorator to time async function execution; the wrapped coroutine returns (result, "1.23s")"""
+    @functools.wraps(func)
     async def wrapper(*args, **kwargs) -> Any:
-        start_time = time.time()
+        start_time = time.perf_counter()
         result = await func(*args, **kwargs)
-        end_time = time.time()
-        execution_time = end_time - start_time
-        return result, f"{execution_time:.2f}s"
-    return wrapper
\ No newline at end of file
+        return result, f"{time.perf_counter() - start_time:.2f}s"
+    return wrapper
@@ -0,0 +1,26 @@
+import math
+import re
+
+# Words, numbers and single punctuation marks
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_CHARS_PER_TOKEN = 4
+
+def count_tokens(text: str) -> int:
+    """Estimate model tokens locally (subword tokenizers split long words into ~4-char pieces)"""
+    if not text:
+        return 0
+    return sum(
+        max(1, math.ceil(len(piece) / _CHARS_PER_TOKEN))
+        for piece in _TOKEN_PATTERN.findall(text)
+    )
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Trim text so count_tokens(result) <= max_tokens, cutting at a token boundary"""
+    if max_tokens <= 0:
+        return ""
+    used = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        used += max(1, math.ceil(len(match.group()) / _CHARS_PER_TOKEN))
+        if used > max_tokens:
+            return text[:match.start()].rstrip()
+    return text
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""
+Per-request latency benchmark for the shared GeminiService.
+
+Compares building a GeminiService for every request (genai.configure, two
+GenerativeModel objects and an executor, as the endpoints used to) with
+reusing the one built in the application lifespan. The stub model looks up
+the SDK's default client like generate_content does, so a configure() that
+resets it is paid for on the next call. Upstream latency adds the same to
+both columns and defaults to zero.
+
+    python bench_latency.py [requests] [latency_ms]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from google.generativeai import client as genai_client
+from app.services.gemini_service import GeminiService
+
+class StubResponse:
+    text = "Hello there"
+
+class StubModel:
+    def __init__(self, latency: float):
+        self.latency = latency
+    
+    def generate_content(self, contents, **kwargs):
+        genai_client.get_default_generative_client()
+        if self.latency:
+            time.sleep(self.latency)
+        return StubResponse()
+
+async def per_request(model: StubModel) -> None:
+    service = GeminiService()
+    service.text_model = model
+    try:
+        await service.chat_response("Hello")
+    finally:
+        service.close()
+
+async def measure(requests: int, call) -> list:
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+def report(label: str, latencies: list) -> None:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"  {label:<22} p50 {statistics.median(ordered):7.3f}ms  p99 {p99:7.3f}ms")
+
+async def main(requests: int, latency: float) -> None:
+    model = StubModel(latency)
+    shared = GeminiService()
+    shared.text_model = model
+    await shared.warm_up()
+    try:
+        # One untimed call each so imports and first-use costs are not counted
+        await per_request(model)
+        await shared.chat_response("Hello")
+        
+        print(f"{requests} sequential chat calls, stub latency {latency * 1000:.0f}ms")
+        report("GeminiService/request", await measure(requests, lambda: per_request(model)))
+        report("shared GeminiService", await measure(requests, lambda: shared.chat_response("Hello")))
+    finally:
+        shared.close()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    asyncio.run(main(count, latency_ms / 1000))
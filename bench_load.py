@@ -0,0 +1,57 @@
+"""
+Load benchmark for GeminiService against a local stub model.
+
+The stub's generate_content sleeps for a fixed upstream latency, like a
+network round-trip. Calling it inline on the event loop (what the service
+used to do) serialises requests; the service's executor lets them overlap
+up to GEMINI_MAX_WORKERS.
+
+    python bench_load.py [latency_ms] [concurrency ...]
+"""
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from app.services.gemini_service import GeminiService
+
+class StubResponse:
+    text = '{"summary": "ok", "key_points": [], "themes": [], "reading_time_minutes": 1, "complexity": "simple"}'
+
+class StubModel:
+    def __init__(self, latency: float):
+        self.latency = latency
+    
+    def generate_content(self, contents, **kwargs):
+        time.sleep(self.latency)
+        return StubResponse()
+
+async def blocking_call(model: StubModel) -> None:
+    # The pre-executor code path: the call blocks the loop for the whole round-trip
+    model.generate_content("Summarize this text")
+
+async def measure(concurrency: int, call) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*[call() for _ in range(concurrency)])
+    return concurrency / (time.perf_counter() - started)
+
+async def main(latency: float, levels) -> None:
+    model = StubModel(latency)
+    service = GeminiService()
+    service.text_model = model
+    try:
+        print(f"Stub latency {latency * 1000:.0f}ms, executor size {service.max_workers}")
+        print(f"  {'concurrency':>11} {'inline req/s':>13} {'executor req/s':>15}")
+        for concurrency in levels:
+            inline = await measure(concurrency, lambda: blocking_call(model))
+            executor = await measure(concurrency, lambda: service.summarize_text("Some text to summarize."))
+            print(f"  {concurrency:>11} {inline:>13.1f} {executor:>15.1f}")
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    latency_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 200
+    levels = [int(level) for level in sys.argv[2:]] or [1, 8, 32]
+    asyncio.run(main(latency_ms / 1000, levels))
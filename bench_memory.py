@@ -0,0 +1,66 @@
+"""
+Memory benchmark for stored chat history.
+
+Compares bytes per message of the public pydantic ChatMessage model against the
+compact records the in-memory conversation store keeps.
+
+    python bench_memory.py [messages] [ai_reply_chars]
+"""
+import random
+import string
+import sys
+import tracemalloc
+from app.models.chat import ChatMessage
+from app.storage.records import MessageRecord
+from app.utils.time_utils import get_current_timestamp
+
+COMPRESS_MIN_BYTES = 1024
+
+def make_reply(length: int) -> str:
+    # Word-like text compresses roughly like real model output; random letters would not
+    words = ["".join(random.choices(string.ascii_lowercase, k=random.randint(2, 9))) for _ in range(300)]
+    reply = []
+    while sum(len(word) + 1 for word in reply) < length:
+        reply.append(random.choice(words))
+    return " ".join(reply)[:length]
+
+def measure(build) -> float:
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    stored = build()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return used / len(stored)
+
+def run(label: str, users, replies, timestamps) -> None:
+    def fresh(i: int) -> ChatMessage:
+        # New string copies per message, as a request body would produce
+        return ChatMessage(
+            user="".join(users[i]),
+            ai="".join(replies[i % len(replies)]),
+            timestamp="".join(timestamps[i])
+        )
+    
+    # The temporary models are freed, so only what each format retains is counted
+    results = {
+        "pydantic ChatMessage": measure(lambda: [fresh(i) for i in range(len(users))]),
+        "MessageRecord": measure(lambda: [MessageRecord.from_message(fresh(i)) for i in range(len(users))]),
+        "MessageRecord + zlib": measure(
+            lambda: [MessageRecord.from_message(fresh(i), COMPRESS_MIN_BYTES) for i in range(len(users))]
+        ),
+    }
+    print(label)
+    for name, per_message in results.items():
+        print(f"  {name:<22} {per_message:>8.0f} bytes/message")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    reply_length = int(sys.argv[2]) if len(sys.argv) > 2 else 1500
+    
+    users = [f"Question number {i} about the uploaded document?" for i in range(count)]
+    timestamps = [get_current_timestamp() for _ in range(count)]
+    replies = [make_reply(reply_length) for _ in range(200)]
+    
+    run(f"{count} messages, {reply_length}-char AI replies", users, replies, timestamps)
+    # Short turns, where per-object overhead dominates
+    run(f"{count} messages, short AI replies", users, ["Sure, here you go."], timestamps)
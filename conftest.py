@@ -0,0 +1,2 @@
+# test_gemini.py is a manual connectivity check against the live API, not a test module
+collect_ignore = ["test_gemini.py"]
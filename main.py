@@ -1,11 +1,113 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api.v1.api import api_router
+from app.core.body_limit import BodySizeLimitMiddleware
 from app.core.config import settings
-from app.core.logging import setup_logging
+from app.core.logging import setup_logging, get_logger
+from app.core.metrics import RequestMetricsMiddleware, metrics
+from app.core.rate_limit import RateLimitMiddleware
+from app.core.tracing import TraceBuffer, TracingMiddleware
+from app.services.context_builder import ConversationContextBuilder
+from app.services.gemini_service import GeminiService
+from app.services.health_monitor import HealthMonitor
+from app.services.image_preprocessor import ImagePreprocessor
+from app.services.metrics_collectors import register_collectors
+from app.services.single_flight import SingleFlight
+from app.services.store_sweeper import StoreSweeper
+from app.services.trace_exporter import TraceExporter
+from app.storage.base import AsyncConversationStore
+from app.storage.factory import create_conversation_store, create_response_cache, create_rate_limiter
 
 # Setup logging
 setup_logging()
+logger = get_logger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build shared clients once per process and release them on shutdown"""
+    gemini_service = GeminiService()
+    await gemini_service.warm_up()
+    app.state.gemini_service = gemini_service
+    app.state.conversation_store = AsyncConversationStore(create_conversation_store())
+    app.state.response_cache = create_response_cache()
+    if app.state.response_cache:
+        await app.state.response_cache.start()
+    app.state.rate_limiter = create_rate_limiter()
+    app.state.single_flight = SingleFlight()
+    app.state.trace_buffer = None
+    trace_exporter = None
+    if settings.TRACING_ENABLED:
+        app.state.trace_buffer = TraceBuffer(
+            capacity=settings.TRACE_BUFFER_SIZE,
+            slowest_kept=settings.TRACE_SLOWEST_KEPT,
+            export=bool(settings.TRACE_EXPORT_URL)
+        )
+        if settings.TRACE_EXPORT_URL:
+            trace_exporter = TraceExporter(
+                app.state.trace_buffer,
+                url=settings.TRACE_EXPORT_URL,
+                service_name=settings.TRACE_SERVICE_NAME,
+                interval_seconds=settings.TRACE_EXPORT_INTERVAL_SECONDS
+            )
+            await trace_exporter.start()
+    app.state.context_builder = ConversationContextBuilder(
+        gemini_service,
+        app.state.conversation_store,
+        token_budget=settings.CHAT_CONTEXT_TOKEN_BUDGET,
+        additional_context_max_tokens=settings.CHAT_ADDITIONAL_CONTEXT_MAX_TOKENS,
+        summary_max_tokens=settings.CHAT_SUMMARY_MAX_TOKENS,
+        summary_refresh_messages=settings.CHAT_SUMMARY_REFRESH_MESSAGES
+    )
+    
+    image_preprocessor = None
+    if settings.IMAGE_PREPROCESS_ENABLED:
+        image_preprocessor = ImagePreprocessor(
+            max_workers=settings.IMAGE_PREPROCESS_WORKERS,
+            max_dimension=settings.IMAGE_MAX_DIMENSION,
+            output_format=settings.IMAGE_OUTPUT_FORMAT,
+            quality=settings.IMAGE_OUTPUT_QUALITY
+        )
+        await image_preprocessor.warm_up()
+    app.state.image_preprocessor = image_preprocessor
+    
+    health_monitor = HealthMonitor(
+        gemini_service,
+        app.state.conversation_store,
+        interval_seconds=settings.HEALTH_CHECK_INTERVAL_SECONDS,
+        max_staleness_seconds=settings.HEALTH_MAX_STALENESS_SECONDS
+    )
+    await health_monitor.start()
+    app.state.health_monitor = health_monitor
+    
+    store_sweeper = StoreSweeper(
+        app.state.conversation_store,
+        interval_seconds=settings.CONVERSATION_SWEEP_INTERVAL_SECONDS
+    )
+    await store_sweeper.start()
+    
+    register_collectors(
+        gemini_service, app.state.conversation_store, app.state.response_cache, app.state.single_flight
+    )
+    
+    yield
+    
+    metrics.clear_collectors()
+    if trace_exporter:
+        await trace_exporter.stop()
+    await store_sweeper.stop()
+    if app.state.response_cache:
+        await app.state.response_cache.stop()
+    await health_monitor.stop()
+    await app.state.context_builder.close()
+    if image_preprocessor:
+        image_preprocessor.close()
+    app.state.conversation_store.close()
+    if app.state.rate_limiter:
+        await app.state.rate_limiter.backend.close()
+    gemini_service.close()
+    logger.info("Shared services closed")
 
 # Create FastAPI app
 app = FastAPI(
@@ -13,7 +115,35 @@ app = FastAPI(
     description="Multi-modal AI analysis platform with real-time chat capabilities",
     version=settings.VERSION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
+)
+
+# Refuse oversized uploads before the multipart parser spools them
+upload_limit = settings.MAX_FILE_SIZE + settings.MULTIPART_OVERHEAD_BYTES
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        f"{settings.API_V1_STR}/images/analyze": upload_limit,
+        f"{settings.API_V1_STR}/images/analyze/batch": settings.IMAGE_BATCH_MAX_FILES * upload_limit
+    }
+)
+
+# Admission control for upstream-bound routes (added first so CORS wraps 429s)
+app.add_middleware(
+    RateLimitMiddleware,
+    path_prefixes=settings.RATE_LIMITED_PATHS,
+    trusted_proxies=settings.RATE_LIMIT_TRUSTED_PROXIES
+)
+
+# Per-endpoint latency, wrapping admission control so rate-limit waits are counted
+app.add_middleware(RequestMetricsMiddleware)
+
+# Request ID and span tracing around everything below, including rate-limit waits
+app.add_middleware(
+    TracingMiddleware,
+    excluded_prefixes=settings.TRACE_EXCLUDED_PATHS,
+    max_spans=settings.TRACE_MAX_SPANS
 )
 
 # Configure CORS
@@ -47,6 +177,16 @@ async def root():
         }
     }
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    # Refresh the store stats its collector reads; they may need I/O the collector cannot await
+    try:
+        await request.app.state.conversation_store.get_stats()
+    except Exception as e:
+        logger.warning(f"Conversation store stats unavailable for /metrics: {e}")
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # For development only
 if __name__ == "__main__":
     import uvicorn
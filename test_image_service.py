@@ -0,0 +1,87 @@
+"""
+Image analysis outcomes: failures reported as failures, upstream outages as 503.
+
+    pip install -r requirements-dev.txt
+    python -m pytest test_image_service.py
+"""
+import asyncio
+import io
+import os
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import pytest
+from fastapi import UploadFile
+from google.api_core import exceptions as google_exceptions
+from PIL import Image
+from starlette.datastructures import Headers
+from app.core.exceptions import AIServiceException
+from app.services.gemini_service import GeminiService
+from app.services.image_service import ImageService
+from app.services.resilience import RetryPolicy
+
+class FakeGemini:
+    def __init__(self, analysis):
+        self.analysis = analysis
+    
+    async def analyze_image_with_vision(self, image_data, content_type):
+        return dict(self.analysis)
+
+class FailingModel:
+    """Stands in for genai.GenerativeModel, failing every call with `error`"""
+    
+    def __init__(self, error: Exception):
+        self.error = error
+        self.calls = 0
+    
+    def generate_content(self, *args, **kwargs):
+        self.calls += 1
+        raise self.error
+
+def upload() -> UploadFile:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (0, 128, 0)).save(buffer, format="PNG")
+    size = buffer.tell()
+    buffer.seek(0)
+    return UploadFile(buffer, size=size, filename="green.png", headers=Headers({"content-type": "image/png"}))
+
+@pytest.fixture
+def gemini():
+    service = GeminiService()
+    service.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0)
+    yield service
+    service.close()
+
+@pytest.mark.parametrize("analysis, success", [
+    ({"description": "a green square"}, True),
+    ({"description": "Analysis failed: bad image", "error": "bad image"}, False)
+])
+def test_single_and_batch_report_success_alike(analysis, success):
+    service = ImageService(FakeGemini(analysis))
+    
+    async def run():
+        single = await service.analyze_uploaded_image(upload())
+        batch = await service.analyze_uploaded_images([upload()], max_concurrency=1)
+        return single, batch[0]
+    
+    single, batched = asyncio.run(run())
+    assert single.success is batched.success is success
+    assert single.analysis == batched.analysis
+
+def test_exhausted_retries_are_503(gemini):
+    model = FailingModel(google_exceptions.ServiceUnavailable("overloaded"))
+    gemini.vision_model = model
+    
+    with pytest.raises(AIServiceException) as error:
+        asyncio.run(ImageService(gemini).analyze_uploaded_image(upload()))
+    assert error.value.status_code == 503
+    assert model.calls == 3
+
+def test_rejected_request_is_not_retried(gemini):
+    model = FailingModel(google_exceptions.InvalidArgument("unsupported image"))
+    gemini.vision_model = model
+    
+    response = asyncio.run(ImageService(gemini).analyze_uploaded_image(upload()))
+    assert not response.success
+    assert "unsupported image" in response.analysis["error"]
+    assert model.calls == 1
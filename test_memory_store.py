@@ -0,0 +1,110 @@
+"""
+In-memory conversation store limits, eviction and spilling.
+    
+    pip install -r requirements-dev.txt
+    python -m pytest test_memory_store.py
+"""
+import os
+from datetime import timedelta
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import pytest
+from app.models.chat import ChatMessage, Conversation
+from app.storage.activity import ActivityWindows
+from app.storage.memory_store import ConversationStore
+from app.storage.sqlite_store import SQLiteConversationStore
+from app.utils.time_utils import get_current_micros, get_current_timestamp, micros_to_timestamp
+
+@pytest.fixture
+def spill_store(tmp_path):
+    store = SQLiteConversationStore(str(tmp_path / "spill.db"))
+    yield store
+    store.close()
+
+def message(text: str) -> ChatMessage:
+    return ChatMessage(user=text, ai=f"reply to {text}", timestamp=get_current_timestamp())
+
+def listed(store: ConversationStore):
+    return [summary.conversation_id for summary in store.list_conversations()]
+
+def test_evicts_least_recently_active_and_spills(spill_store):
+    store = ConversationStore(max_conversations=2, spill_store=spill_store)
+    for conversation_id in ("a", "b", "c"):
+        store.add_message(conversation_id, message(conversation_id))
+    
+    assert listed(store) == ["c", "b", "a"]
+    assert spill_store.get_conversation("a") is not None
+    stats = store.get_stats()
+    assert stats["evicted_count"] == 1
+    assert stats["spilled_conversations"] == 1
+    assert stats["total_conversations"] == 3
+    assert stats["total_messages"] == 3
+    
+    # Writing to a spilled conversation brings it back as the most recently active
+    store.add_message("a", message("again"))
+    assert listed(store) == ["a", "c", "b"]
+    assert [turn.user for turn in store.get_conversation("a").messages] == ["a", "again"]
+    assert store.get_stats()["total_conversations"] == 3
+
+def test_reading_a_spilled_conversation_is_not_activity(spill_store):
+    hours_ago = get_current_micros() - timedelta(hours=2) // timedelta(microseconds=1)
+    spill_store.save_conversation(Conversation(
+        conversation_id="old",
+        messages=[message("long ago")],
+        created_at=micros_to_timestamp(hours_ago),
+        last_activity=micros_to_timestamp(hours_ago)
+    ))
+    store = ConversationStore(max_conversations=2, spill_store=spill_store)
+    store.add_message("recent", message("hello"))
+    
+    record = store.get_record("old")
+    assert record.last_activity == hours_ago
+    assert spill_store.get_conversation("old") is None
+    stats = store.get_stats()
+    assert stats["total_conversations"] == 2
+    assert stats["active_last_5m"] == 1
+    assert stats["active_last_24h"] == 2
+    # Still the least recently active, so listed last and evicted first
+    assert listed(store) == ["recent", "old"]
+    assert store.get_conversation("old").last_activity == micros_to_timestamp(hours_ago)
+    store.add_message("new", message("hi"))
+    assert "old" not in store._conversations
+    assert listed(store) == ["new", "recent", "old"]
+
+def test_restoring_into_a_full_store_keeps_the_restored_conversation(spill_store):
+    store = ConversationStore(max_conversations=2, spill_store=spill_store)
+    for conversation_id in ("a", "b", "c"):
+        store.add_message(conversation_id, message(conversation_id))
+    
+    store.add_message("a", message("again"))
+    assert set(store._conversations) == {"a", "c"}
+    assert store.get_stats()["total_messages"] == 4
+
+def test_idle_conversations_expire_on_sweep(spill_store):
+    store = ConversationStore(idle_ttl_seconds=3600, spill_store=spill_store)
+    store.add_message("a", message("a"))
+    store._touched_at["a"] -= 7200
+    assert store.sweep() == 1
+    assert store.get_stats()["evicted_idle"] == 1
+    assert store.get_conversation("a").messages[0].user == "a"
+
+def test_keeps_only_the_newest_messages():
+    store = ConversationStore(max_messages=2)
+    for index in range(5):
+        store.add_message("a", message(str(index)))
+    assert [turn.user for turn in store.get_conversation("a").messages] == ["3", "4"]
+    stats = store.get_stats()
+    assert stats["total_messages"] == 2
+    assert stats["trimmed_messages"] == 3
+
+def test_activity_windows_accept_activity_past_the_horizon():
+    windows = ActivityWindows(bucket_seconds=60, horizon_buckets=60)
+    now = 1_000_000.0
+    windows.touch("recent", now=now)
+    windows.touch("old", now=now - 7200)
+    assert windows.count_active(3600, now=now) == 1
+    windows.remove("old")
+    windows.touch("old", now=now)
+    assert windows.count_active(3600, now=now) == 2
+    assert windows._overflow == 0
@@ -0,0 +1,166 @@
+"""
+Rate limit reservations for requests that fan out into many upstream calls.
+    
+    pip install -r requirements-dev.txt
+    python -m pytest test_rate_limit.py
+"""
+import asyncio
+import io
+import os
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import pytest
+from fastapi import UploadFile
+from PIL import Image
+from starlette.datastructures import Headers
+from app.core.config import settings
+from app.core.exceptions import PayloadTooLargeException, RateLimitException
+from app.core.rate_limit import RequestQuota, _request_quota, charge_upstream_call
+from app.models.requests import BatchTextAnalysisRequest, LongTextAnalysisRequest, TextAnalysisRequest
+from app.services.gemini_service import GeminiService
+from app.services.image_service import ImageService
+from app.services.text_service import TextService
+from app.storage.factory import create_rate_limiter
+
+class FakeGemini:
+    """Charges the request's quota for every call, the way GeminiService does"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    async def _call(self) -> None:
+        await charge_upstream_call()
+        self.calls += 1
+    
+    async def analyze_text_chunk(self, chunk):
+        await self._call()
+        return {"summary": chunk[:40], "key_points": [], "sentiment": "positive", "entities": ["Acme"]}
+    
+    async def summarize_chunk_analyses(self, chunks):
+        await self._call()
+        return {"summary": f"{len(chunks)} parts", "key_points": [], "themes": []}
+    
+    async def comprehensive_text_analysis(self, text):
+        await self._call()
+        return {"summary": text, "sentiment": "neutral"}
+    
+    async def analyze_image_with_vision(self, image_data, content_type):
+        await self._call()
+        return {"description": f"{len(image_data)} bytes of {content_type}"}
+
+class StreamingModel:
+    """Stands in for genai.GenerativeModel, streaming a fixed reply"""
+    
+    class Chunk:
+        def __init__(self, text):
+            self.text = text
+    
+    def generate_content(self, prompt, stream=False, **kwargs):
+        return iter([self.Chunk("Hel"), self.Chunk("lo")])
+
+async def admit(client_id: str = "client"):
+    """What RateLimitMiddleware does before the endpoint runs"""
+    limiter = create_rate_limiter()
+    await limiter.acquire(client_id)
+    _request_quota.set(RequestQuota(limiter, client_id))
+    return limiter
+
+def document(length: int) -> str:
+    sentences = []
+    while sum(map(len, sentences)) < length:
+        sentences.append(f"Clause {len(sentences)} of the agreement binds both parties to the terms above. ")
+    return "".join(sentences)[:length]
+
+def upload(shade: int) -> UploadFile:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), (shade, 0, 0)).save(buffer, format="PNG")
+    size = buffer.tell()
+    buffer.seek(0)
+    return UploadFile(buffer, size=size, filename=f"{shade}.png", headers=Headers({"content-type": "image/png"}))
+
+def test_reservation_beyond_the_smallest_bucket_is_413():
+    async def run():
+        limiter = await admit()
+        assert limiter.max_calls == settings.RATE_LIMIT_CLIENT_PER_MINUTE
+        quota = _request_quota.get()
+        with pytest.raises(PayloadTooLargeException) as error:
+            await quota.reserve(limiter.max_calls + 1)
+        assert error.value.status_code == 413
+        # The largest reservation is granted from full buckets
+        await quota.reserve(limiter.max_calls)
+        # and waits for a refill are still a 429 with Retry-After
+        with pytest.raises(RateLimitException) as error:
+            await RequestQuota(limiter, "client").reserve(limiter.max_calls)
+        assert "Retry-After" in error.value.headers
+    
+    asyncio.run(run())
+
+def test_long_document_at_the_advertised_maximum_is_accepted():
+    assert settings.RATE_LIMIT_ENABLED
+    gemini = FakeGemini()
+    
+    async def run():
+        await admit()
+        text = document(settings.LONG_TEXT_MAX_CHARS)
+        return await TextService(gemini).analyze_long_text(LongTextAnalysisRequest(text=text))
+    
+    response = asyncio.run(run())
+    assert response.success
+    assert response.character_count == settings.LONG_TEXT_MAX_CHARS
+    assert response.chunk_count > 1
+    assert gemini.calls == response.chunk_count + 1 <= settings.RATE_LIMIT_CLIENT_PER_MINUTE
+
+def test_image_batch_at_the_maximum_size_is_accepted():
+    gemini = FakeGemini()
+    
+    async def run():
+        await admit()
+        files = [upload(shade) for shade in range(settings.IMAGE_BATCH_MAX_FILES)]
+        return await ImageService(gemini).analyze_uploaded_images(files, settings.BATCH_MAX_CONCURRENCY)
+    
+    responses = asyncio.run(run())
+    assert [response.success for response in responses] == [True] * settings.IMAGE_BATCH_MAX_FILES
+    assert gemini.calls == settings.IMAGE_BATCH_MAX_FILES <= settings.RATE_LIMIT_CLIENT_PER_MINUTE
+
+def test_text_batch_is_paid_for_up_front():
+    gemini = FakeGemini()
+    
+    async def run():
+        limiter = await admit()
+        service = TextService(gemini)
+        items = [TextAnalysisRequest(text=f"item {index}") for index in range(settings.TEXT_BATCH_MAX_ITEMS)]
+        # Duplicates share their item's call
+        batch = BatchTextAnalysisRequest(items=items[:-1] + [items[0]])
+        results = [result async for result in await service.analyze_batch(batch.items, 4)]
+        assert all(result.success for result in results)
+        assert gemini.calls == settings.TEXT_BATCH_MAX_ITEMS - 1
+        
+        # The next batch is refused whole while the buckets refill, before any call
+        _request_quota.set(RequestQuota(limiter, "client"))
+        with pytest.raises(RateLimitException) as error:
+            await service.analyze_batch(items, 4)
+        assert "Retry-After" in error.value.headers
+        assert gemini.calls == settings.TEXT_BATCH_MAX_ITEMS - 1
+    
+    asyncio.run(run())
+
+def test_streamed_chat_replies_are_charged():
+    gemini = GeminiService()
+    gemini.text_model = StreamingModel()
+    
+    async def run():
+        limiter = await admit()
+        quota = _request_quota.get()
+        reply = [chunk async for chunk in gemini.stream_chat_response("hi")]
+        # The admission slot paid for the first stream, the second buys its own
+        assert quota.available == 0
+        reply += [chunk async for chunk in gemini.stream_chat_response("again")]
+        assert quota.available == 0
+        assert limiter.admitted == 2
+        return reply
+    
+    try:
+        assert "".join(asyncio.run(run())) == "HelloHello"
+    finally:
+        gemini.close()
@@ -0,0 +1,191 @@
+"""
+Redis conversation store and shared rate limiter against fakeredis.
+
+    pip install -r requirements-dev.txt
+    python -m pytest test_redis_store.py
+"""
+import asyncio
+import os
+import threading
+import uuid
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import fakeredis
+import pytest
+from app.core.exceptions import PayloadTooLargeException, RateLimitException
+from app.core.rate_limit import BucketLimit, RateLimiter, RedisRateLimitBackend
+from app.models.chat import ChatMessage, Conversation
+from app.storage.base import AsyncConversationStore
+from app.storage.redis_store import RedisConversationStore
+from app.utils.time_utils import get_current_timestamp
+
+@pytest.fixture
+def store():
+    client = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    return RedisConversationStore(client, prefix="test:")
+
+def message(text: str) -> ChatMessage:
+    return ChatMessage(user=text, ai=f"reply to {text}", timestamp=get_current_timestamp())
+
+def test_crud(store):
+    conversation_id = str(uuid.uuid4())
+    created = store.create_conversation(conversation_id)
+    assert created.messages == []
+    
+    store.add_message(conversation_id, message("hello"))
+    store.add_message(conversation_id, message("again"))
+    conversation = store.get_conversation(conversation_id)
+    assert [turn.user for turn in conversation.messages] == ["hello", "again"]
+    assert conversation.messages[1].ai == "reply to again"
+    
+    store.update_summary(conversation_id, "they said hello", 1)
+    record = store.get_record(conversation_id)
+    assert record.summary == "they said hello"
+    assert record.summary_message_count == 1
+    assert [turn.ai_text() for turn in record.messages] == ["reply to hello", "reply to again"]
+    
+    stats = store.get_stats()
+    assert stats["total_conversations"] == 1
+    assert stats["total_messages"] == 2
+    assert stats["active_conversations"] == 1
+    
+    assert store.delete_conversation(conversation_id)
+    assert not store.delete_conversation(conversation_id)
+    assert store.get_conversation(conversation_id) is None
+    assert store.get_stats()["total_messages"] == 0
+
+def test_update_summary_does_not_recreate_deleted(store):
+    conversation_id = str(uuid.uuid4())
+    store.add_message(conversation_id, message("hello"))
+    store.delete_conversation(conversation_id)
+    store.update_summary(conversation_id, "too late", 1)
+    assert store.get_conversation(conversation_id) is None
+
+def test_update_summary_retries_when_deleted_mid_update():
+    server = fakeredis.FakeServer()
+    store, other_worker = [
+        RedisConversationStore(fakeredis.FakeRedis(server=server, decode_responses=True), prefix="test:")
+        for _ in range(2)
+    ]
+    conversation_id = str(uuid.uuid4())
+    store.add_message(conversation_id, message("hello"))
+    transaction = store._redis.transaction
+    attempts = []
+    
+    def racing_transaction(func, *watches, **kwargs):
+        def racing(pipe):
+            result = func(pipe)
+            if not attempts:
+                # Another worker deletes the conversation after it was seen to exist
+                other_worker.delete_conversation(conversation_id)
+            attempts.append(result)
+            return result
+        return transaction(racing, *watches, **kwargs)
+    
+    store._redis.transaction = racing_transaction
+    store.update_summary(conversation_id, "too late", 1)
+    assert len(attempts) == 2
+    assert store.get_conversation(conversation_id) is None
+    assert not store._redis.exists(store._conversation_key(conversation_id))
+
+def test_concurrent_first_messages_count_one_conversation(store):
+    conversation_id = str(uuid.uuid4())
+    threads = [
+        threading.Thread(target=store.add_message, args=(conversation_id, message(f"hello {index}")))
+        for index in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = store.get_stats()
+    assert stats["total_conversations"] == 1
+    assert stats["total_messages"] == 8
+
+def test_save_conversation_replaces(store):
+    conversation_id = str(uuid.uuid4())
+    store.add_message(conversation_id, message("old"))
+    timestamp = get_current_timestamp()
+    store.save_conversation(Conversation(
+        conversation_id=conversation_id,
+        messages=[message("new"), message("newer")],
+        created_at=timestamp,
+        last_activity=timestamp,
+        summary="saved",
+        summary_message_count=1
+    ))
+    conversation = store.get_conversation(conversation_id)
+    assert [turn.user for turn in conversation.messages] == ["new", "newer"]
+    assert conversation.summary == "saved"
+    assert store.get_stats()["total_messages"] == 2
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7])
+def test_pagination(store, page_size):
+    conversation_ids = [str(uuid.uuid4()) for _ in range(7)]
+    for conversation_id in conversation_ids:
+        store.add_message(conversation_id, message(conversation_id))
+    # Activity moves a conversation to the front
+    store.add_message(conversation_ids[0], message("bump"))
+    expected = [conversation_ids[0]] + conversation_ids[:0:-1]
+    
+    listed, cursor = [], None
+    while True:
+        page, cursor = store.list_conversations_page(page_size, cursor)
+        assert len(page) <= page_size
+        listed += [summary.conversation_id for summary in page]
+        if cursor is None:
+            break
+    assert listed == expected
+    assert [summary.conversation_id for summary in store.list_conversations()] == expected
+    
+    with pytest.raises(ValueError):
+        store.list_conversations_page(page_size, "not-a-cursor")
+
+def test_async_facade_runs_off_the_loop(store):
+    threads = set()
+    original = store.get_record
+    
+    def get_record(conversation_id):
+        threads.add(threading.get_ident())
+        return original(conversation_id)
+    store.get_record = get_record
+    
+    async def run():
+        facade = AsyncConversationStore(store)
+        try:
+            await facade.add_message("conversation", message("hello"))
+            record = await facade.get_record("conversation")
+            assert record.messages[0].user == "hello"
+        finally:
+            facade.close()
+    
+    asyncio.run(run())
+    assert threads and threading.get_ident() not in threads
+
+def test_limiter_is_shared_between_workers():
+    server = fakeredis.FakeServer()
+    limits = [BucketLimit("client_minute", 3, 60, per_client=True), BucketLimit("global_minute", 5, 60)]
+    
+    def worker() -> RateLimiter:
+        backend = RedisRateLimitBackend(fakeredis.FakeAsyncRedis(server=server, decode_responses=True), "test:")
+        return RateLimiter(backend, limits, max_wait_seconds=0)
+    
+    async def run():
+        first, second = worker(), worker()
+        await first.acquire("alice", 2)
+        await second.acquire("alice")
+        # alice's bucket is empty on every worker
+        with pytest.raises(RateLimitException):
+            await first.acquire("alice")
+        await second.acquire("bob", 2)
+        # Both workers drew from the same global bucket
+        with pytest.raises(RateLimitException):
+            await first.acquire("bob")
+        assert first.rejected == 2 and second.admitted == 2
+        
+        # More than a bucket ever holds is refused outright
+        with pytest.raises(PayloadTooLargeException):
+            await first.acquire("carol", 6)
+    
+    asyncio.run(run())
@@ -0,0 +1,162 @@
+"""
+Upstream resilience: coalescing, circuit breaking, hedging and structured reply parsing.
+
+    pip install -r requirements-dev.txt
+    python -m pytest test_resilience.py
+"""
+import asyncio
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+from app.core.config import settings
+from app.core.exceptions import AIServiceException
+from app.services.gemini_service import GeminiService
+from app.services.resilience import CircuitBreaker, RetryPolicy
+from app.services.single_flight import SingleFlight
+from app.storage.response_cache import is_cacheable
+
+class Reply:
+    def __init__(self, text: str):
+        self.text = text
+
+class ScriptedModel:
+    """Stands in for genai.GenerativeModel: each call sleeps, then returns or raises its step"""
+    
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+    
+    def generate_content(self, *args, **kwargs):
+        delay, outcome = self.steps[min(self.calls, len(self.steps) - 1)]
+        self.calls += 1
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Reply(outcome)
+
+@pytest.fixture
+def gemini():
+    service = GeminiService()
+    service.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0)
+    yield service
+    service.close()
+
+def test_single_flight_coalesces_and_survives_a_cancelled_leader():
+    flight = SingleFlight()
+    started = []
+    
+    async def work():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+    
+    async def run():
+        leader = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == "result"
+        assert leader.cancelled()
+    
+    asyncio.run(run())
+    assert started == [1]
+    assert flight.stats() == {"calls": 1, "coalesced": 1, "in_flight": 0}
+
+def test_single_flight_shares_failures_then_forgets_them():
+    flight = SingleFlight()
+    
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream said no")
+    
+    async def succeed():
+        return "second try"
+    
+    async def run():
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        assert [str(result) for result in results] == ["upstream said no"] * 2
+        # A failed flight is not reused
+        assert await flight.do("key", succeed) == "second try"
+    
+    asyncio.run(run())
+    assert flight.stats() == {"calls": 2, "coalesced": 1, "in_flight": 0}
+
+def test_circuit_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=0.05)
+    assert breaker.allow()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    
+    time.sleep(0.06)
+    # One probe at a time while half-open
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()["rejected"] == 2
+
+def test_open_breaker_fails_fast_without_calling_upstream(gemini):
+    model = ScriptedModel((0, google_exceptions.ServiceUnavailable("overloaded")))
+    gemini.text_model = model
+    gemini.circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout_seconds=60)
+    
+    with pytest.raises(AIServiceException) as error:
+        asyncio.run(gemini.analyze_text_sentiment("hello"))
+    assert error.value.status_code == 503
+    assert model.calls == 2
+    
+    with pytest.raises(AIServiceException) as error:
+        asyncio.run(gemini.analyze_text_sentiment("hello"))
+    assert error.value.status_code == 503
+    assert "temporarily unavailable" in error.value.detail
+    assert model.calls == 2
+
+def test_transient_failure_is_retried(gemini):
+    model = ScriptedModel(
+        (0, google_exceptions.ServiceUnavailable("blip")),
+        (0, '{"overall_sentiment": "positive", "confidence_score": 0.9}')
+    )
+    gemini.text_model = model
+    result = asyncio.run(gemini.analyze_text_sentiment("great"))
+    assert result["overall_sentiment"] == "positive"
+    assert model.calls == 2
+    assert gemini.retries == 1
+
+def test_slow_call_is_hedged(gemini, monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HEDGE_DEFAULT_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "CHAT_HEDGE_MIN_DELAY_SECONDS", 0.01)
+    model = ScriptedModel((0.5, "slow"), (0, "fast"))
+    
+    reply = asyncio.run(gemini._generate_hedged(model, "hi", "chat"))
+    assert reply.text == "fast"
+    assert (gemini.hedges_sent, gemini.hedge_wins) == (1, 1)
+
+def test_hedges_stop_when_the_budget_runs_out(gemini, monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_HEDGE_DEFAULT_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "CHAT_HEDGE_MIN_DELAY_SECONDS", 0.01)
+    gemini.hedge_budget.tokens = 0
+    model = ScriptedModel((0.05, "only"))
+    
+    reply = asyncio.run(gemini._generate_hedged(model, "hi", "chat"))
+    assert reply.text == "only"
+    assert gemini.hedges_sent == 0
+    assert model.calls == 1
+
+def test_structured_replies_are_validated_repaired_or_marked(gemini):
+    valid = gemini._parse_structured('{"overall_sentiment": "negative", "confidence_score": 0.7}', "sentiment")
+    assert valid["overall_sentiment"] == "negative" and is_cacheable(valid)
+    
+    truncated = gemini._parse_structured('{"overall_sentiment": "neutral", "emotions": ["calm", "bor', "sentiment")
+    assert truncated["emotions"] == ["calm", "bor"] and is_cacheable(truncated)
+    
+    # Off-schema replies fall back to the lenient parser and are never cached
+    invalid = gemini._parse_structured('Sure! {"overall_sentiment": "ecstatic"}', "sentiment")
+    assert invalid["overall_sentiment"] == "ecstatic"
+    assert invalid["schema_valid"] is False and not is_cacheable(invalid)
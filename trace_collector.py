@@ -0,0 +1,45 @@
+"""
+Local stand-in for a Zipkin collector.
+
+Accepts Zipkin v2 JSON spans on POST /api/v2/spans, prints one line per span
+and optionally appends them to a JSON-lines file. Point the API at it with
+TRACE_EXPORT_URL=http://localhost:9411/api/v2/spans.
+
+    python trace_collector.py [port] [output.jsonl]
+"""
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+OUTPUT_PATH = sys.argv[2] if len(sys.argv) > 2 else None
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != "/api/v2/spans":
+            self.send_error(404)
+            return
+        try:
+            spans = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError:
+            self.send_error(400, "Invalid JSON")
+            return
+        
+        for span in sorted(spans, key=lambda span: (span["traceId"], span["timestamp"])):
+            marker = "*" if "parentId" not in span else " "
+            print(f"{span['traceId'][:8]} {marker} {span['duration'] / 1000:9.2f}ms  {span['name']}")
+        if OUTPUT_PATH:
+            with open(OUTPUT_PATH, "a") as output:
+                for span in spans:
+                    output.write(json.dumps(span) + "\n")
+        
+        # Zipkin answers 202 Accepted with an empty body
+        self.send_response(202)
+        self.end_headers()
+    
+    def log_message(self, format, *args):
+        pass
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9411
+    print(f"Collecting spans on http://localhost:{port}/api/v2/spans")
+    HTTPServer(("", port), CollectorHandler).serve_forever()